@@ -1,12 +1,10 @@
-from flask import Flask, render_template, request, jsonify
-from youtube_search import search_videos as search_youtube_videos, download_audio as download_youtube_audio, get_video_dir as get_youtube_video_dir, save_video_data
-from tiktok_search import search_videos as search_tiktok_videos, download_audio as download_tiktok_audio, get_video_dir as get_tiktok_video_dir
-from transcribing_utils import transcribe_audio
-from review_generator import process_query_directory
-from reviews import get_product_reviews, get_review_summary
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context, url_for
+from werkzeug.serving import is_running_from_reloader
+from suggestions import suggest as get_suggestions
+from job_queue import enqueue, get_job, wait_for_job, stream_job, start_workers, DONE, FAILED
 import logging
 import json
-from utils import get_query_dir
+import os
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +12,25 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Seconds a non-AJAX /search request waits for its job before giving up
+PAGE_TIMEOUT = int(os.getenv('SEARCH_PAGE_TIMEOUT', '600'))
+# Whether server hooks (asgi_app's lifespan) start job workers; off by default, so
+# each server process doesn't fork its own pool and workers run from job_queue.py
+START_JOB_WORKERS = os.getenv('START_JOB_WORKERS', 'false').lower() in ('1', 'true', 'yes')
+
+_workers = None
+
+def ensure_workers():
+    """
+    Start this process's job workers, once.
+
+    Only called from entry points: the __main__ block below and server
+    hooks that check START_JOB_WORKERS. Importing the app starts nothing.
+    """
+    global _workers
+    if _workers is None:
+        _workers = start_workers()
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -28,158 +45,133 @@ def search():
             return jsonify(error_response)
         return render_template('results.html', query='', results=error_response)
     
-    try:
-        # Get product reviews from existing sources
-        logger.info(f'Searching for product: {query}')
-        results = get_product_reviews(query)
-        
-        # Process image URLs
-        if results.get('img_urls'):
-            logger.info(f'Found {len(results["img_urls"])} images')
-            valid_urls = [url for url in results['img_urls'] if url.startswith(('http://', 'https://'))] 
-            results['img_urls'] = valid_urls
-            logger.info(f'Found {len(valid_urls)} valid images')
-
-        summary_result = get_review_summary(query, results)
-        if summary_result['error']:
-            logger.warning(f'Error getting review summary: {summary_result["error"]}')
-        else:
-            logger.info('Successfully retrieved review summary')
-            logger.info(f'Review summary: {summary_result["summary"]}')
-            results['summary'] = summary_result["summary"]
-        
-        # Create directory for this search query
-        query_dir = get_query_dir(query)
+    job_id = enqueue(query)
+    
+    # For AJAX requests, hand back the job and let the client poll for the result
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({
+            'status': 'queued',
+            'job_id': job_id,
+            'status_url': url_for('job_status', job_id=job_id),
+            'result_url': url_for('job_result', job_id=job_id)
+        }), 202
+    
+    # For direct browser requests, wait for the worker and render the template
+    job = wait_for_job(job_id, timeout=PAGE_TIMEOUT)
+    if job is None or job['status'] != DONE:
+        error_msg = job['error'] if job and job['error'] else 'Search is still running, please try again shortly'
+        return render_template('results.html', query=query, results={'error': error_msg})
+    return render_template('results.html', query=query, results=job['result'])
+
+def results_payload(results):
+    """
+    Build the JSON body returned for a finished search.
+    
+    Args:
+        results (dict): Search results
         
-        # Start the YouTube search process
-        youtube_videos = search_youtube_videos(query, max_results=4, query_dir=query_dir)
-        youtube_reviews = []
+    Returns:
+        dict: JSON-serializable response body
+    """
+    return {
+        'status': 'success', 
+        'reviews': results.get('reviews', []),
+        'weighted_avg_rating': results.get('weighted_avg_rating', 0),
+        'total_reviews': results.get('total_reviews', 0),
+        'summary': results.get('summary'),
+        'img_urls': results.get('img_urls', []),
+        'missing': results.get('missing', [])
+    }
+
+@app.route('/suggest')
+def suggest():
+    prefix = request.args.get('q', '')
+    return jsonify({'query': prefix, 'suggestions': get_suggestions(prefix)})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'job_id': job['id'],
+        'query': job['query'],
+        'status': job['status'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at'],
+        'result_url': url_for('job_result', job_id=job['id'])
+    })
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == FAILED:
+        return jsonify({'status': 'failed', 'error': job['error']}), 500
+    if job['status'] != DONE:
+        return jsonify({'status': job['status'], 'job_id': job['id']}), 202
+    return jsonify(results_payload(job['result']))
+
+def format_sse(event, data):
+    """
+    Format a server-sent event.
+    
+    Args:
+        event (str): Event name
+        data: JSON-serializable event payload
         
-        # Start the TikTok search process
-        tiktok_videos = search_tiktok_videos(query, max_results=8, query_dir=query_dir)
-        tiktok_reviews = []
+    Returns:
+        str: Event in text/event-stream wire format
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def format_search_event(event, data):
+    """
+    Format an iter_search event for the /search/stream client.
+    
+    Args:
+        event (str): Event name from iter_search
+        data: Event payload from iter_search
         
-        # Process YouTube videos
-        if youtube_videos:
-            for video in youtube_videos:
-                try:
-                    logger.info(f'Processing YouTube video: {video["title"]} (ID: {video["video_id"]})')
-                    # Download audio and transcribe with Whisper
-                    audio_path = download_youtube_audio(video['video_url'], video['video_id'], video['title'], query_dir)
-                    logger.info(f'Audio download result: {"Success" if audio_path else "Failed"}')
-                    
-                    if audio_path:
-                        logger.info(f'Audio downloaded successfully: {audio_path}')
-                        whisper_result = transcribe_audio(audio_path)
-                        
-                        if whisper_result['available']:
-                            logger.info('Whisper transcription successful')
-                            
-                            # Save video data
-                            video_dir = get_youtube_video_dir(video['video_id'], video['title'], query_dir)
-                            save_video_data(
-                                video_dir=video_dir,
-                                video_info={
-                                    'title': video['title'],
-                                    'description': video.get('description', ''),
-                                    'channel': video['channel'],
-                                    'publishedAt': video.get('published_at', ''),
-                                    'platform': 'youtube',
-                                    'statistics': {
-                                        'viewCount': str(video.get('view_count', 0)),
-                                        'likeCount': str(video.get('like_count', 0)),
-                                        'commentCount': str(video.get('comment_count', 0))
-                                    },
-                                    'video_url': video.get('video_url', ''),
-                                },
-                                transcript=whisper_result['transcript']
-                            )
-                            
-                            youtube_reviews.append({
-                                'title': video['title'],
-                                'url': video['video_url'],
-                                'transcript': whisper_result['transcript'],
-                                'platform': 'youtube',
-                                'channel': video['channel']
-                            })
-                except Exception as e:
-                    logger.error(f'Error processing YouTube video: {str(e)}')
-                    
-        # Process TikTok videos
-        if tiktok_videos:
-            for video in tiktok_videos:
-                try:
-                    logger.info(f'Processing TikTok video: {video["title"]} (ID: {video["video_id"]})')
-                    # Download audio and transcribe with Whisper
-                    audio_path = download_tiktok_audio(video['video_url'], video['video_id'], video['title'], query_dir)
-                    logger.info(f'Audio download result: {"Success" if audio_path else "Failed"}')
-                    
-                    if audio_path:
-                        logger.info(f'Audio downloaded successfully: {audio_path}')
-                        whisper_result = transcribe_audio(audio_path)
-                        
-                        if whisper_result['available']:
-                            logger.info('Whisper transcription successful')
-                            
-                            # Save video data
-                            video_dir = get_tiktok_video_dir(video['video_id'], video['title'], query_dir)
-                            save_video_data(
-                                video_dir=video_dir,
-                                video_info={
-                                    'title': video['title'],
-                                    'channel': video['channel'],
-                                    'platform': 'tiktok',
-                                    'description': video.get('caption', ''),
-                                    'statistics': {
-                                        'viewCount': str(video.get('view_count', 0))
-                                    },
-                                    'video_url': video.get('video_url', ''),
-                                },
-                                transcript=whisper_result['transcript']
-                            )
-                            
-                            tiktok_reviews.append({
-                                'title': video['title'],
-                                'url': video['video_url'],
-                                'transcript': whisper_result['transcript'],
-                                'platform': 'tiktok',
-                                'channel': video['channel']
-                            })
-                except Exception as e:
-                    logger.error(f'Error processing TikTok video: {str(e)}')
-                    
-        # Generate reviews from all videos
-        all_reviews = youtube_reviews + tiktok_reviews
-        if all_reviews:
-            logger.info('Generating reviews from transcripts...')
-            generated_reviews = process_query_directory(str(query_dir))
-            if generated_reviews:
-                logger.info(f'Generated {len(generated_reviews)} reviews')
-                results['reviews'] = generated_reviews
-            else:
-                logger.warning('No reviews were generated from the transcript')
-                results['reviews'] = all_reviews
-                
-    except Exception as e:
-        logger.error(f'Error processing search: {str(e)}')
-        error_msg = f'Error processing search: {str(e)}'
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return jsonify({'error': error_msg})
-        return render_template('results.html', query=query, results={'error': error_msg})
+    Returns:
+        str: Event in text/event-stream wire format
+    """
+    if event == 'ratings':
+        data = {
+            'weighted_avg_rating': data.get('weighted_avg_rating') or 0,
+            'total_reviews': data.get('total_reviews', 0),
+            'img_urls': data.get('img_urls', []),
+        }
+    elif event == 'summary':
+        data = {'summary': data}
+    return format_sse(event, data)
 
-    # For AJAX requests, return JSON response
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return jsonify({
-            'status': 'success', 
-            'reviews': results.get('reviews', []),
-            'weighted_avg_rating': results.get('weighted_avg_rating', 0),
-            'total_reviews': results.get('total_reviews', 0),
-            'summary': results.get('summary'),
-            'img_urls': results.get('img_urls', [])
-        })
+@app.route('/search/stream')
+def search_stream():
+    query = request.args.get('product')
+    if not query:
+        logger.warning('No product query provided')
+        return Response(format_sse('error', {'error': 'No product query provided'}), mimetype='text/event-stream')
+    
+    def generate():
+        try:
+            # The search runs as a job, so identical concurrent searches share one worker
+            for event, data in stream_job(enqueue(query)):
+                yield format_search_event(event, data)
+        except Exception as e:
+            logger.error(f'Error processing search stream: {str(e)}')
+            yield format_sse('error', {'error': f'Error processing search: {str(e)}'})
     
-    # For direct browser requests, render the template
-    return render_template('results.html', query=query, results=results)
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 if __name__ == '__main__':
+    # The reloader's watcher process re-runs this file as the server, so only the server starts workers
+    if is_running_from_reloader():
+        ensure_workers()
     app.run(debug=True)
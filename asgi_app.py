@@ -0,0 +1,95 @@
+"""
+ASGI entry point: the Flask app plus an asyncio /search/stream.
+
+/search/stream is served by async_pipeline, so each open stream is a
+coroutine rather than a thread. Every other route is handed to the Flask
+app unchanged. Run with:
+
+    uvicorn asgi_app:app --port 5000
+"""
+
+import asyncio
+import logging
+from urllib.parse import parse_qs
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from app import app as flask_app, ensure_workers, format_sse, format_search_event, START_JOB_WORKERS
+from async_pipeline import iter_search
+from clients import close_async_clients
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+async def search_stream(scope, receive, send):
+    """
+    Stream search results as server-sent events, like app.search_stream.
+    """
+    params = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    query = (params.get('product') or [''])[0]
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+
+    async def send_event(text):
+        await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+
+    async def stream():
+        if not query:
+            logger.warning('No product query provided')
+            await send_event(format_sse('error', {'error': 'No product query provided'}))
+            return
+        try:
+            async for event, data in iter_search(query):
+                await send_event(format_search_event(event, data))
+        except Exception as e:
+            logger.error(f'Error processing search stream: {str(e)}')
+            await send_event(format_sse('error', {'error': f'Error processing search: {str(e)}'}))
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    # Stop working on the search as soon as the client goes away
+    streaming = asyncio.create_task(stream())
+    disconnect = asyncio.create_task(watch_disconnect())
+    done, _ = await asyncio.wait({streaming, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    for task in (streaming, disconnect):
+        if task not in done:
+            task.cancel()
+
+    if streaming in done:
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Opt-in, since every server process runs its own lifespan
+            if START_JOB_WORKERS:
+                ensure_workers()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/search/stream':
+        await search_stream(scope, receive, send)
+    else:
+        # WsgiToAsgi runs Flask thread-sensitively, which without a context
+        # means one shared thread: a /search blocked in wait_for_job would
+        # stall every other route. Each request gets its own context, and so
+        # its own thread.
+        async with ThreadSensitiveContext():
+            await wsgi_app(scope, receive, send)
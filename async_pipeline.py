@@ -0,0 +1,295 @@
+"""
+asyncio variant of the search pipeline, served by asgi_app.py.
+
+Outbound API calls (Oxylabs, the OpenAI summary and the TikTok search)
+are awaited on shared async clients, so an idle search costs a coroutine
+rather than a thread. Work that is blocking by nature (the YouTube client,
+yt-dlp/ffmpeg downloads, Whisper and review generation) still runs in the
+thread pools of the synchronous pipeline, under the same limits.
+
+Those blocking stages run on a dedicated pool of ASYNC_BLOCKING_WORKERS
+threads, not the loop's default executor, which stays free for quick
+calls such as cache reads, so a cache hit never waits behind video work.
+Each search holds at most two of those threads at a time (one per
+platform branch, then one for review generation), so the pool size sets
+how many searches make progress on their video stages at once; further
+searches queue for a thread within their stage budgets.
+
+Caching, stage budgets and the stage graph are search_pipeline.SearchPlan's,
+shared with search_pipeline.iter_search. Cache writes run on the default
+executor, never on the loop.
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from youtube_search import search_videos as search_youtube_videos
+from tiktok_search import search_videos_async as search_tiktok_videos_async
+from video_pipeline import process_ranked_videos
+from candidate_ranking import rank_candidates, pool_size, VIDEO_TARGETS
+from review_generator import iter_query_directory
+from reviews import get_product_reviews_async, get_indexed_reviews, get_review_summary_async
+from result_cache import result_cache, normalize_query
+from suggestions import record_query
+from search_pipeline import SEARCH_BUDGET, SearchPlan, stage_deadline, store_component
+from utils import get_query_dir, Deadline
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BLOCKING_WORKERS = int(os.getenv('ASYNC_BLOCKING_WORKERS', '64'))
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix='async-blocking')
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a long blocking call on the dedicated pool.
+
+    Args:
+        fn (callable): Function to call
+        *args, **kwargs: Its arguments
+
+    Returns:
+        The function's result
+    """
+    return await asyncio.wrap_future(_blocking_pool.submit(fn, *args, **kwargs))
+
+def _close_generator(generator, step):
+    # A step may still be running in its thread: wait for it, since a running generator can't be closed
+    if step is not None:
+        wait([step])
+    generator.close()
+
+class StageTimeout(TimeoutError):
+    """Raised when a stage misses its deadline."""
+
+async def run_stage(name, deadline, awaitable, on_late=None):
+    """
+    Await a stage, giving up on it when its deadline passes.
+
+    Args:
+        name (str): Stage name, for logging
+        deadline (Deadline): Deadline for the stage
+        awaitable: Coroutine (or future) running the stage
+        on_late (callable): Called with the result if the stage finishes
+            successfully after its deadline (optional)
+
+    Returns:
+        The stage's result
+
+    Raises:
+        StageTimeout: If the deadline passed first
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        # Shielded so a late result can still be cached
+        return await asyncio.wait_for(asyncio.shield(task), timeout=deadline.remaining())
+    except TimeoutError:
+        logger.warning(f'Stage {name} missed its deadline')
+        if on_late:
+            task.add_done_callback(lambda t: not t.cancelled() and t.exception() is None and on_late(t.result()))
+        else:
+            task.cancel()
+        raise StageTimeout(name)
+
+async def fetch_ratings(query):
+    """
+    Get the aggregated rating and product images.
+
+    Args:
+        query (str): Product search query
+
+    Returns:
+        dict: total_reviews, weighted_avg_rating, img_urls and error
+    """
+    logger.info(f'Searching for product: {query}')
+    # Answer from the product index when it has a fresh match, otherwise scrape
+    ratings = await asyncio.to_thread(get_indexed_reviews, query) or await get_product_reviews_async(query)
+
+    if ratings.get('img_urls'):
+        ratings['img_urls'] = [url for url in ratings['img_urls'] if url.startswith(('http://', 'https://'))]
+        logger.info(f'Found {len(ratings["img_urls"])} valid images')
+
+    return ratings
+
+async def fetch_summary(query, ratings):
+    """
+    Get the LLM-written review summary.
+
+    Args:
+        query (str): Product search query
+        ratings (dict): Result of fetch_ratings
+
+    Returns:
+        str: Summary text or None if it could not be generated
+    """
+    summary_result = await get_review_summary_async(query, ratings)
+    if summary_result['error']:
+        logger.warning(f'Error getting review summary: {summary_result["error"]}')
+        return None
+    return summary_result['summary']
+
+async def _platform_branch(platform, search, query, query_dir, deadline, missing):
+    # Search one platform, then process its videos without waiting for the other platform
+    try:
+        videos = await run_stage(platform, stage_deadline(platform, deadline), search)
+    except StageTimeout:
+        missing.append(platform)
+        return []
+
+    processing_deadline = stage_deadline('video_processing', deadline)
+    candidates = rank_candidates([(platform, video) for video in videos or []], query)
+    results = await run_blocking(
+        process_ranked_videos, candidates, query_dir,
+        {platform: VIDEO_TARGETS[platform]}, deadline=processing_deadline
+    )
+    if processing_deadline.expired() and 'video_processing' not in missing:
+        missing.append('video_processing')
+    return results
+
+async def iter_video_reviews(query, deadline=None, missing=None):
+    """
+    Find, transcribe and turn YouTube/TikTok review videos into written reviews,
+    yielding each review as soon as it has been generated.
+
+    Args:
+        query (str): Product search query
+        deadline (Deadline): Deadline for the whole search (optional)
+        missing (list): Names of stages that missed their deadline are
+            appended here (optional)
+
+    Yields:
+        dict: Generated review, or raw transcribed video if generation failed
+    """
+    deadline = deadline or Deadline()
+    missing = [] if missing is None else missing
+    query_dir = get_query_dir(query)
+
+    youtube_reviews, tiktok_reviews = await asyncio.gather(
+        _platform_branch(
+            'youtube',
+            run_blocking(search_youtube_videos, query, max_results=pool_size('youtube'), query_dir=query_dir),
+            query, query_dir, deadline, missing
+        ),
+        _platform_branch(
+            'tiktok',
+            search_tiktok_videos_async(query, max_results=pool_size('tiktok')),
+            query, query_dir, deadline, missing
+        ),
+    )
+    all_reviews = youtube_reviews + tiktok_reviews
+    if not all_reviews:
+        return
+
+    logger.info('Generating reviews from transcripts...')
+    # Only the videos that finished: stragglers may still be writing into query_dir
+    video_dirs = [review.pop('video_dir') for review in all_reviews]
+    generation_deadline = stage_deadline('review_generation', deadline)
+    reviews = iter_query_directory(
+        str(query_dir), query=query, deadline=generation_deadline, video_dirs=video_dirs
+    )
+    generated = 0
+    step = None
+    try:
+        while True:
+            # Each step blocks on LLM calls, so it runs off the event loop
+            step = _blocking_pool.submit(next, reviews, None)
+            review = await asyncio.wrap_future(step)
+            if review is None:
+                break
+            generated += 1
+            yield review
+    finally:
+        # Closing waits on in-flight LLM requests (e.g. when the client
+        # disconnected), so it must not run on the event loop
+        await run_blocking(_close_generator, reviews, step)
+    if generation_deadline.expired():
+        missing.append('review_generation')
+
+    if generated:
+        logger.info(f'Generated {generated} reviews')
+        return
+
+    logger.warning('No reviews were generated from the transcript')
+    for review in all_reviews:
+        yield review
+
+def _store_off_loop(key):
+    # Cache writes go to disk, so they run on the default executor rather than the loop
+    loop = asyncio.get_running_loop()
+    return lambda name, value: loop.run_in_executor(None, store_component, key, name, value)
+
+async def iter_search(query, budget=None):
+    """
+    Async counterpart of search_pipeline.iter_search, driving the same SearchPlan.
+
+    Args:
+        query (str): Product search query
+        budget (float): Latency budget in seconds (default: SEARCH_BUDGET)
+
+    Yields:
+        tuple: (event, data) pairs, in order:
+            ('ratings', dict), ('summary', str or None),
+            ('review', dict) once per review,
+            ('done', dict) with 'missing', the stages that missed their deadline
+    """
+    key = normalize_query(query)
+    deadline = Deadline(SEARCH_BUDGET if budget is None else budget)
+    await asyncio.to_thread(record_query, query)
+    plan = SearchPlan(query, await asyncio.to_thread(result_cache.get, key), store=_store_off_loop(key))
+
+    # The video branch doesn't depend on ratings, so it starts first and runs alongside them
+    review_queue = asyncio.Queue()
+    video_missing = []
+    video_task = None
+    if plan.needs('video_reviews'):
+        async def produce():
+            try:
+                async for review in iter_video_reviews(query, deadline=deadline, missing=video_missing):
+                    await review_queue.put(review)
+            finally:
+                await review_queue.put(None)
+        video_task = asyncio.create_task(produce())
+
+    try:
+        if plan.needs('ratings'):
+            try:
+                plan.complete('ratings', await run_stage(
+                    'ratings', stage_deadline('ratings', deadline), fetch_ratings(query),
+                    on_late=plan.late('ratings')
+                ))
+            except StageTimeout:
+                plan.miss('ratings')
+        yield 'ratings', plan.values['ratings']
+
+        if plan.needs('summary'):
+            if plan.summary_blocked():
+                plan.miss('summary')
+            else:
+                try:
+                    plan.complete('summary', await run_stage(
+                        'summary', stage_deadline('summary', deadline), fetch_summary(query, plan.values['ratings']),
+                        on_late=plan.late('summary')
+                    ))
+                except StageTimeout:
+                    plan.miss('summary')
+        yield 'summary', plan.values['summary']
+
+        if video_task:
+            reviews = []
+            while (review := await review_queue.get()) is not None:
+                reviews.append(review)
+                yield 'review', review
+            # Surface any error from the video branch
+            await video_task
+            plan.complete_reviews(reviews, video_missing)
+        else:
+            for review in plan.values['video_reviews']:
+                yield 'review', review
+    finally:
+        # The client went away or something failed: don't leave the video branch running
+        if video_task and not video_task.done():
+            video_task.cancel()
+
+    yield 'done', plan.done()
@@ -0,0 +1,505 @@
+"""
+Shared audio normalization for every platform before transcription.
+
+Downloaded audio is converted to mono 16 kHz Opus in an OGG container,
+with silence removed and an optional tempo speed-up, so Whisper uploads
+are as small and as short as possible. Long audio can then be split at
+silence boundaries for parallel transcription.
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+import tempfile
+import subprocess
+from pathlib import Path
+import yt_dlp
+from clients import get_http_session
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AUDIO_FILENAME = 'audio.ogg'
+REPORT_FILENAME = 'audio_report.json'
+
+SAMPLE_RATE = 16000
+AUDIO_BITRATE = os.getenv('AUDIO_BITRATE', '24k')
+# atempo accepts 0.5-2.0; Whisper stays accurate up to roughly 1.5x
+AUDIO_TEMPO = float(os.getenv('AUDIO_TEMPO', '1.0'))
+TRIM_SILENCE = os.getenv('AUDIO_TRIM_SILENCE', 'true').lower() in ('1', 'true', 'yes')
+SILENCE_THRESHOLD = os.getenv('AUDIO_SILENCE_THRESHOLD', '-45dB')
+# Pauses shorter than this are kept so speech doesn't run together
+SILENCE_MIN_DURATION = float(os.getenv('AUDIO_SILENCE_MIN_DURATION', '0.7'))
+
+# Generous cap on raw downloads; long audio is split rather than skipped
+MAX_DOWNLOAD_BYTES = int(os.getenv('MAX_DOWNLOAD_BYTES', str(200 * 1024 * 1024)))
+# Long audio is transcribed as segments of about this many seconds
+SEGMENT_SECONDS = float(os.getenv('TRANSCRIBE_SEGMENT_SECONDS', '120'))
+SEGMENT_OVERLAP = float(os.getenv('TRANSCRIBE_SEGMENT_OVERLAP', '2'))
+# Read and pipe streamed downloads in 1 MiB chunks
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Seconds between checks of a piped download's cancel event
+CANCEL_POLL_INTERVAL = 0.5
+
+_SILENCE_RE = re.compile(r'silence_(start|end): (-?[\d.]+)')
+
+class DownloadCancelled(Exception):
+    """
+    Raised when a download is abandoned through its cancel event.
+    """
+
+def build_filters(tempo=None, trim_silence=None):
+    """
+    Build the ffmpeg audio filter chain.
+
+    Args:
+        tempo (float): Playback speed multiplier (default: AUDIO_TEMPO)
+        trim_silence (bool): Remove silent stretches (default: TRIM_SILENCE)
+
+    Returns:
+        str: Comma-separated filter chain, or '' for none
+    """
+    tempo = AUDIO_TEMPO if tempo is None else tempo
+    trim_silence = TRIM_SILENCE if trim_silence is None else trim_silence
+
+    filters = []
+    if trim_silence:
+        filters.append(
+            f'silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD}'
+            f':stop_periods=-1:stop_duration={SILENCE_MIN_DURATION}:stop_threshold={SILENCE_THRESHOLD}'
+        )
+    if tempo and tempo != 1.0:
+        filters.append(f'atempo={min(max(tempo, 0.5), 2.0)}')
+    return ','.join(filters)
+
+def build_ffmpeg_command(source, dest, tempo=None, trim_silence=None):
+    """
+    Build the ffmpeg command that normalizes source into dest.
+
+    Args:
+        source (str): Input path, URL or 'pipe:0' for stdin
+        dest (str): Output path
+        tempo (float): Playback speed multiplier (default: AUDIO_TEMPO)
+        trim_silence (bool): Remove silent stretches (default: TRIM_SILENCE)
+
+    Returns:
+        list: ffmpeg arguments
+    """
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-i', str(source), '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE)]
+    filters = build_filters(tempo, trim_silence)
+    if filters:
+        command += ['-af', filters]
+    command += ['-c:a', 'libopus', '-b:a', AUDIO_BITRATE, '-application', 'voip', str(dest)]
+    return command
+
+def probe_duration(path):
+    """
+    Get the duration of a media file.
+
+    Args:
+        path (str): Path to the media file
+
+    Returns:
+        float: Duration in seconds, or None if it could not be determined
+    """
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', str(path)],
+            check=True, capture_output=True, text=True
+        )
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, ValueError, OSError):
+        return None
+
+def build_report(dest, bytes_in=None, seconds_in=None):
+    """
+    Describe how much a normalized clip shrank, and save it next to the clip.
+
+    Args:
+        dest (str): Normalized audio path
+        bytes_in (int): Size of the source audio, if known
+        seconds_in (float): Duration of the source audio, if known
+
+    Returns:
+        dict: bytes_in, bytes_out, bytes_saved, seconds_in, seconds_out, seconds_saved
+    """
+    dest = Path(dest)
+    bytes_out = dest.stat().st_size
+    seconds_out = probe_duration(dest)
+    report = {
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'bytes_saved': bytes_in - bytes_out if bytes_in is not None else None,
+        'seconds_in': seconds_in,
+        'seconds_out': seconds_out,
+        'seconds_saved': (
+            round(seconds_in - seconds_out, 2)
+            if seconds_in is not None and seconds_out is not None else None
+        ),
+    }
+    logger.info(
+        f"Normalized {dest}: {bytes_in} -> {bytes_out} bytes, "
+        f"{seconds_in} -> {seconds_out} seconds"
+    )
+    try:
+        with open(dest.parent / REPORT_FILENAME, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+    except OSError as e:
+        logger.warning(f"Error saving audio report: {str(e)}")
+    return report
+
+def normalize_audio(source, dest, tempo=None, trim_silence=None):
+    """
+    Convert downloaded audio to mono 16 kHz Opus with silence trimmed.
+
+    Args:
+        source (str): Path to the downloaded audio or video file
+        dest (str): Path for the normalized audio (normally AUDIO_FILENAME)
+        tempo (float): Playback speed multiplier (default: AUDIO_TEMPO)
+        trim_silence (bool): Remove silent stretches (default: TRIM_SILENCE)
+
+    Returns:
+        dict: Size and duration report (see build_report)
+    """
+    source = Path(source)
+    bytes_in = source.stat().st_size
+    seconds_in = probe_duration(source)
+
+    subprocess.run(build_ffmpeg_command(source, dest, tempo, trim_silence), check=True, capture_output=True)
+
+    return build_report(dest, bytes_in, seconds_in)
+
+def stream_normalize(url, dest, headers=None, seconds_in=None, tempo=None, trim_silence=None, cancel=None):
+    """
+    Download a media URL straight into ffmpeg's stdin and normalize it.
+
+    Transcoding starts with the first chunk and nothing but the normalized
+    audio touches the disk. Meant for direct media URLs such as TikTok's
+    play address; videos resolved by yt-dlp go through pipe_normalize.
+
+    Args:
+        url (str): Direct media URL
+        dest (str): Path for the normalized audio (normally AUDIO_FILENAME)
+        headers (dict): Extra HTTP headers for the request
+        seconds_in (float): Source duration from metadata, for the report
+        tempo (float): Playback speed multiplier (default: AUDIO_TEMPO)
+        trim_silence (bool): Remove silent stretches (default: TRIM_SILENCE)
+        cancel (threading.Event): Abandons the download when set (optional)
+
+    Returns:
+        dict: Size and duration report (see build_report)
+
+    Raises:
+        DownloadCancelled: If cancel was set before the download finished
+        ValueError: If the source is larger than MAX_DOWNLOAD_BYTES
+        subprocess.CalledProcessError: If ffmpeg fails, e.g. on an MP4 whose
+            index is at the end of the file and so can't be read from a pipe
+    """
+    bytes_in = 0
+    process = subprocess.Popen(
+        build_ffmpeg_command('pipe:0', dest, tempo, trim_silence),
+        stdin=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=STREAM_CHUNK_SIZE
+    )
+    try:
+        with get_http_session().get(url, headers=headers, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                if cancel is not None and cancel.is_set():
+                    raise DownloadCancelled(url)
+                bytes_in += len(chunk)
+                if bytes_in > MAX_DOWNLOAD_BYTES:
+                    raise ValueError(f"Source exceeds {MAX_DOWNLOAD_BYTES} bytes")
+                process.stdin.write(chunk)
+        process.stdin.close()
+    except BrokenPipeError:
+        # ffmpeg gave up early; its exit code and stderr say why
+        pass
+    except Exception:
+        process.kill()
+        process.wait()
+        raise
+
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, 'ffmpeg', stderr=stderr)
+
+    return build_report(dest, bytes_in, seconds_in)
+
+def build_ytdlp_command(info_path, ydl_opts):
+    """
+    Build the yt-dlp command that writes a resolved video's media to stdout.
+
+    Args:
+        info_path (str): Info JSON from extract_info, so the video isn't
+            extracted a second time
+        ydl_opts (dict): yt-dlp options to carry over to the command line
+
+    Returns:
+        list: yt-dlp arguments
+    """
+    command = [sys.executable, '-m', 'yt_dlp', '--load-info-json', str(info_path), '-o', '-', '--quiet', '--no-warnings']
+    if ydl_opts.get('format'):
+        command += ['-f', ydl_opts['format']]
+    if ydl_opts.get('max_filesize'):
+        command += ['--max-filesize', str(ydl_opts['max_filesize'])]
+    # yt-dlp fetches in ranged chunks, which YouTube throttles far less than one long GET
+    if ydl_opts.get('http_chunk_size'):
+        command += ['--http-chunk-size', str(ydl_opts['http_chunk_size'])]
+    if ydl_opts.get('buffersize'):
+        command += ['--buffer-size', str(ydl_opts['buffersize'])]
+    if ydl_opts.get('socket_timeout'):
+        command += ['--socket-timeout', str(ydl_opts['socket_timeout'])]
+    if ydl_opts.get('retries') is not None:
+        command += ['--retries', str(ydl_opts['retries'])]
+    if ydl_opts.get('nocheckcertificate'):
+        command.append('--no-check-certificates')
+    for name, value in (ydl_opts.get('http_headers') or {}).items():
+        command += ['--add-headers', f'{name}:{value}']
+    return command
+
+def pipe_normalize(info_path, dest, ydl_opts, bytes_in=None, seconds_in=None, tempo=None, trim_silence=None,
+                   cancel=None):
+    """
+    Download a resolved video with yt-dlp into ffmpeg's stdin and normalize it.
+
+    yt-dlp writes the media to stdout with its own downloader, so chunked
+    range requests, retries and HLS keep working, while nothing but the
+    normalized audio touches the disk.
+
+    Args:
+        info_path (str): Info JSON from extract_info
+        dest (str): Path for the normalized audio (normally AUDIO_FILENAME)
+        ydl_opts (dict): yt-dlp options (see build_ytdlp_command)
+        bytes_in (int): Source size from metadata, for the report
+        seconds_in (float): Source duration from metadata, for the report
+        tempo (float): Playback speed multiplier (default: AUDIO_TEMPO)
+        trim_silence (bool): Remove silent stretches (default: TRIM_SILENCE)
+        cancel (threading.Event): Kills yt-dlp and ffmpeg when set (optional)
+
+    Returns:
+        dict: Size and duration report (see build_report)
+
+    Raises:
+        DownloadCancelled: If cancel was set before the download finished
+        subprocess.CalledProcessError: If yt-dlp or ffmpeg fails, e.g. on an
+            MP4 whose index is at the end of the file
+    """
+    # A file rather than a pipe, so a chatty yt-dlp can't block on a full stderr
+    with tempfile.TemporaryFile() as downloader_stderr:
+        downloader = subprocess.Popen(
+            build_ytdlp_command(info_path, ydl_opts), stdout=subprocess.PIPE, stderr=downloader_stderr
+        )
+        try:
+            process = subprocess.Popen(
+                build_ffmpeg_command('pipe:0', dest, tempo, trim_silence),
+                stdin=downloader.stdout, stderr=subprocess.PIPE
+            )
+        except Exception:
+            downloader.kill()
+            downloader.wait()
+            raise
+        # Only ffmpeg holds the read end now, so yt-dlp stops if ffmpeg does
+        downloader.stdout.close()
+        while True:
+            try:
+                _, stderr = process.communicate(timeout=CANCEL_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    process.kill()
+                    downloader.kill()
+                    process.communicate()
+                    downloader.wait()
+                    raise DownloadCancelled(str(info_path))
+        if process.returncode != 0:
+            downloader.kill()
+        downloader.wait()
+
+        if downloader.returncode != 0 and process.returncode == 0:
+            downloader_stderr.seek(0)
+            raise subprocess.CalledProcessError(downloader.returncode, 'yt-dlp', stderr=downloader_stderr.read())
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, 'ffmpeg', stderr=stderr)
+
+    return build_report(dest, bytes_in, seconds_in)
+
+def download_normalized(video_url, dest, ydl_opts, cancel=None):
+    """
+    Fetch a video's audio with yt-dlp and normalize it, streaming when possible.
+
+    The video is extracted once; yt-dlp then downloads the chosen format to
+    stdout and pipe_normalize feeds it to ffmpeg. A stream ffmpeg can't read
+    from a pipe is downloaded to disk by yt-dlp instead.
+
+    Args:
+        video_url (str): Video page URL
+        dest (str): Path for the normalized audio (normally AUDIO_FILENAME)
+        ydl_opts (dict): yt-dlp options, including format and outtmpl for
+            the on-disk fallback
+        cancel (threading.Event): Abandons the download when set (optional)
+
+    Returns:
+        dict: Size and duration report (see build_report)
+
+    Raises:
+        DownloadCancelled: If cancel was set before the download finished
+    """
+    def check_cancelled(progress=None):
+        if cancel is not None and cancel.is_set():
+            raise DownloadCancelled(video_url)
+
+    # The on-disk fallback checks for cancellation as it receives data
+    ydl_opts = dict(ydl_opts, progress_hooks=list(ydl_opts.get('progress_hooks', [])) + [check_cancelled])
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(video_url, download=False)
+        size = info.get('filesize') or info.get('filesize_approx')
+        if size and size > MAX_DOWNLOAD_BYTES:
+            raise ValueError(f"Source exceeds {MAX_DOWNLOAD_BYTES} bytes")
+
+        info_path = Path(dest).with_name('source.info.json')
+        try:
+            with open(info_path, 'w', encoding='utf-8') as f:
+                json.dump(ydl.sanitize_info(info), f)
+            return pipe_normalize(
+                info_path, dest, ydl_opts, bytes_in=size, seconds_in=info.get('duration'), cancel=cancel
+            )
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.warning(f"Streaming {video_url} failed, downloading to disk instead: {str(e)}")
+        finally:
+            info_path.unlink(missing_ok=True)
+
+        check_cancelled()
+        ydl.process_info(info)
+        source_path = Path(ydl.prepare_filename(info))
+
+    report = normalize_audio(source_path, dest)
+    source_path.unlink(missing_ok=True)
+    return report
+
+def extract_clip(path, dest, seconds):
+    """
+    Copy the first few seconds of an audio file without re-encoding.
+
+    Args:
+        path (str): Path to the audio file
+        dest (str): Path for the clip
+        seconds (float): Clip length in seconds
+
+    Returns:
+        str: Path to the clip
+    """
+    subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error', '-i', str(path), '-t', f'{seconds:.3f}', '-c', 'copy', str(dest)],
+        check=True, capture_output=True
+    )
+    return str(dest)
+
+def find_silences(path, threshold=None, min_duration=None):
+    """
+    Find silent stretches in an audio file with ffmpeg's silencedetect.
+
+    Args:
+        path (str): Path to the audio file
+        threshold (str): Noise level treated as silence (default: SILENCE_THRESHOLD)
+        min_duration (float): Shortest silence to report in seconds (default: 0.3)
+
+    Returns:
+        list: (start, end) tuples in seconds, in order
+    """
+    threshold = threshold or SILENCE_THRESHOLD
+    min_duration = min_duration or 0.3
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-nostats', '-i', str(path),
+         '-af', f'silencedetect=noise={threshold}:d={min_duration}', '-f', 'null', '-'],
+        capture_output=True, text=True
+    )
+
+    silences = []
+    start = None
+    for match in _SILENCE_RE.finditer(result.stderr):
+        if match.group(1) == 'start':
+            start = float(match.group(2))
+        elif start is not None:
+            silences.append((max(start, 0.0), float(match.group(2))))
+            start = None
+    return silences
+
+def plan_segments(duration, silences, segment_seconds=None, overlap=None):
+    """
+    Choose where to cut long audio, preferring silences near each target length.
+
+    Args:
+        duration (float): Total duration in seconds
+        silences (list): (start, end) silence tuples from find_silences
+        segment_seconds (float): Target segment length (default: SEGMENT_SECONDS)
+        overlap (float): Overlap added to cuts that fall mid-speech (default: SEGMENT_OVERLAP)
+
+    Returns:
+        list: (start, end, overlapped) tuples; overlapped is True when the
+            segment starts before the previous one ended
+    """
+    segment_seconds = segment_seconds or SEGMENT_SECONDS
+    overlap = SEGMENT_OVERLAP if overlap is None else overlap
+    # Cuts may move this far from the target to land in a silence
+    window = segment_seconds * 0.25
+
+    segments = []
+    start = 0.0
+    overlapped = False
+    while duration - start > segment_seconds + window:
+        target = start + segment_seconds
+        candidates = [
+            (s + e) / 2 for s, e in silences
+            if abs((s + e) / 2 - target) <= window
+        ]
+        if candidates:
+            cut = min(candidates, key=lambda point: abs(point - target))
+            segments.append((start, cut, overlapped))
+            start, overlapped = cut, False
+        else:
+            # No pause nearby: cut mid-speech and repeat a little on both sides
+            segments.append((start, target + overlap / 2, overlapped))
+            start, overlapped = target - overlap / 2, True
+    segments.append((start, duration, overlapped))
+    return segments
+
+def split_audio(path, out_dir, segment_seconds=None, overlap=None):
+    """
+    Split audio into segments cut at silence boundaries where possible.
+
+    Args:
+        path (str): Path to the normalized audio file
+        out_dir (str): Directory for the segment files
+        segment_seconds (float): Target segment length (default: SEGMENT_SECONDS)
+        overlap (float): Overlap for cuts that fall mid-speech (default: SEGMENT_OVERLAP)
+
+    Returns:
+        list: Dicts with path, start, end and overlapped, in playback order.
+            Audio shorter than about one segment yields a single entry for
+            the original file.
+    """
+    path = Path(path)
+    duration = probe_duration(path)
+    segment_seconds = segment_seconds or SEGMENT_SECONDS
+    if duration is None or duration <= segment_seconds * 1.25:
+        return [{'path': str(path), 'start': 0.0, 'end': duration, 'overlapped': False}]
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    segments = []
+    for i, (start, end, overlapped) in enumerate(
+        plan_segments(duration, find_silences(path), segment_seconds, overlap)
+    ):
+        segment_path = out_dir / f'segment_{i:03d}{path.suffix}'
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-ss', f'{start:.3f}', '-t', f'{end - start:.3f}',
+             '-i', str(path), '-c', 'copy', str(segment_path)],
+            check=True, capture_output=True
+        )
+        segments.append({'path': str(segment_path), 'start': start, 'end': end, 'overlapped': overlapped})
+
+    logger.info(f"Split {path} ({duration:.0f}s) into {len(segments)} segments")
+    return segments
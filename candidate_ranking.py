@@ -0,0 +1,182 @@
+"""
+Rank search hits by metadata before any of them are downloaded.
+
+Searches fetch a pool several times larger than the number of reviews
+wanted. Each candidate is scored on length, popularity, recency, title
+relevance and language hints, so downloads go to the likeliest good
+reviews first.
+"""
+
+import os
+import re
+import math
+import logging
+from datetime import datetime, timezone
+from transcribing_utils import is_english_language
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reviews wanted per platform, and how many candidates to fetch per review wanted
+VIDEO_TARGETS = {
+    'youtube': int(os.getenv('YOUTUBE_VIDEO_TARGET', '4')),
+    'tiktok': int(os.getenv('TIKTOK_VIDEO_TARGET', '8')),
+}
+OVERSAMPLE = float(os.getenv('CANDIDATE_OVERSAMPLE', '3'))
+# YouTube's search.list returns at most 50 results per call
+MAX_POOL = {'youtube': 50, 'tiktok': 30}
+
+# Comfortable review lengths in seconds: (min, max)
+IDEAL_DURATION = {
+    'youtube': (240, 1200),
+    'tiktok': (20, 180),
+}
+
+WEIGHTS = {
+    'duration': 1.0,
+    'popularity': 1.0,
+    'recency': 0.5,
+    'relevance': 2.0,
+    'language': 1.0,
+}
+
+STOPWORDS = {'a', 'an', 'the', 'and', 'or', 'of', 'for', 'to', 'in', 'on', 'with', 'review', 'reviews'}
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_ISO_DURATION_RE = re.compile(r'P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+
+def pool_size(platform, target=None):
+    """
+    Get how many candidates to fetch for a platform.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        target (int): Reviews wanted (default: VIDEO_TARGETS[platform])
+
+    Returns:
+        int: Candidate pool size
+    """
+    target = target or VIDEO_TARGETS[platform]
+    return min(MAX_POOL[platform], max(target, math.ceil(target * OVERSAMPLE)))
+
+def _terms(text):
+    return {word for word in _WORD_RE.findall((text or '').lower()) if word not in STOPWORDS}
+
+def duration_seconds(platform, video):
+    """
+    Get a candidate's length in seconds.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video (dict): Video information from the platform's search_videos
+
+    Returns:
+        float: Duration in seconds, or None if unknown
+    """
+    duration = video.get('duration')
+    if not duration:
+        return None
+    if platform == 'youtube':
+        # The Data API reports ISO 8601 durations such as PT12M3S
+        match = _ISO_DURATION_RE.fullmatch(str(duration))
+        if not match:
+            return None
+        days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+        return float(((days * 24 + hours) * 60 + minutes) * 60 + seconds)
+    # TikTok aweme durations are in milliseconds
+    return float(duration) / 1000
+
+def _published(video):
+    published_at = video.get('published_at')
+    if not published_at:
+        return None
+    try:
+        return datetime.fromisoformat(str(published_at).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+def score_candidate(platform, video, query_terms, now=None):
+    """
+    Score a candidate video from its metadata alone.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video (dict): Video information from the platform's search_videos
+        query_terms (set): Normalized query terms
+        now (datetime): Reference time for recency (default: now)
+
+    Returns:
+        float: Score (higher is better), or None if the video should be
+            dropped outright (e.g. metadata says it isn't English)
+    """
+    english = is_english_language(video.get('language'))
+    if english is False:
+        return None
+
+    scores = {}
+
+    seconds = duration_seconds(platform, video)
+    low, high = IDEAL_DURATION[platform]
+    if seconds is None:
+        scores['duration'] = 0.5
+    elif seconds < low:
+        scores['duration'] = seconds / low
+    elif seconds > high:
+        # Long videos are still usable, they just cost more to transcribe
+        scores['duration'] = max(0.2, high / seconds)
+    else:
+        scores['duration'] = 1.0
+
+    views = video.get('view_count') or 0
+    likes = video.get('like_count') or 0
+    # log scale: 1M views scores 1.0, and a healthy like ratio adds a little
+    popularity = min(math.log10(views + 1) / 6, 1.0)
+    if views and likes:
+        popularity += min(likes / views / 0.04, 1.0) * 0.25
+    scores['popularity'] = popularity
+
+    published = _published(video)
+    if published is None:
+        scores['recency'] = 0.5
+    else:
+        now = now or datetime.now(timezone.utc)
+        age_days = max((now - published).days, 0)
+        # Halves every year: products and firmware change
+        scores['recency'] = 0.5 ** (age_days / 365)
+
+    title_terms = _terms(video.get('title'))
+    if query_terms:
+        scores['relevance'] = len(query_terms & title_terms) / len(query_terms)
+    else:
+        scores['relevance'] = 0.0
+
+    scores['language'] = 1.0 if english else 0.5
+
+    return sum(WEIGHTS[name] * value for name, value in scores.items())
+
+def rank_candidates(candidates, query):
+    """
+    Order candidates best first, dropping ones that can't be used.
+
+    Args:
+        candidates (list): (platform, video) tuples
+        query (str): Product search query
+
+    Returns:
+        list: (platform, video) tuples, best first
+    """
+    query_terms = _terms(query)
+    now = datetime.now(timezone.utc)
+    scored = []
+    for i, (platform, video) in enumerate(candidates):
+        score = score_candidate(platform, video, query_terms, now)
+        if score is None:
+            logger.info(f'Dropping {platform} candidate {video.get("video_id")}: not English')
+            continue
+        scored.append((score, i, platform, video))
+
+    # Ties keep the platform's own search order
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    logger.info(f'Ranked {len(scored)} of {len(candidates)} candidates')
+    return [(platform, video) for _, _, platform, video in scored]
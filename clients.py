@@ -0,0 +1,191 @@
+"""
+Registry of shared, long-lived API clients.
+
+Every module gets its HTTP session, OpenAI client and YouTube service (and
+their async counterparts) from here so connections are pooled and kept
+alive across requests instead of paying a TLS handshake (and, for YouTube,
+a discovery document fetch) on every call.
+"""
+
+import os
+import json
+import logging
+import asyncio
+import threading
+import weakref
+from pathlib import Path
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from openai import OpenAI, AsyncOpenAI
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from dotenv import load_dotenv
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv(override=True)
+
+# Connection pool sizing
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '20'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '50'))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '120'))
+
+YOUTUBE_DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest'
+YOUTUBE_DISCOVERY_CACHE = Path(os.getenv('YOUTUBE_DISCOVERY_CACHE', 'cache/youtube_discovery.json'))
+
+_lock = threading.Lock()
+_http_session = None
+_openai_client = None
+_youtube_discovery = None
+# googleapiclient services wrap httplib2, which isn't thread-safe, so each thread gets its own
+_thread_local = threading.local()
+# Async connection pools belong to the event loop that opened them, so each loop gets its own
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_http_session():
+    """
+    Get the shared requests session.
+
+    Returns:
+        requests.Session: Session with a keep-alive connection pool
+    """
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http_session = session
+    return _http_session
+
+def get_openai_client():
+    """
+    Get the shared OpenAI client.
+
+    Returns:
+        OpenAI: Client backed by a pooled httpx connection, or None if
+            OPENAI_API_KEY is not set
+    """
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            return None
+        with _lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(
+                    api_key=api_key,
+                    timeout=OPENAI_TIMEOUT,
+                    http_client=httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=HTTP_POOL_MAXSIZE,
+                            max_keepalive_connections=HTTP_POOL_CONNECTIONS
+                        ),
+                        timeout=OPENAI_TIMEOUT
+                    )
+                )
+    return _openai_client
+
+def _loop_clients():
+    return _async_clients.setdefault(asyncio.get_running_loop(), {})
+
+def _async_limits():
+    return httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_CONNECTIONS)
+
+def get_async_http_client():
+    """
+    Get the shared async HTTP client for the running event loop.
+
+    Returns:
+        httpx.AsyncClient: Client with a keep-alive connection pool
+    """
+    clients = _loop_clients()
+    if 'http' not in clients:
+        clients['http'] = httpx.AsyncClient(limits=_async_limits(), timeout=OPENAI_TIMEOUT)
+    return clients['http']
+
+def get_async_openai_client():
+    """
+    Get the shared async OpenAI client for the running event loop.
+
+    Returns:
+        AsyncOpenAI: Client backed by a pooled httpx connection, or None if
+            OPENAI_API_KEY is not set
+    """
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        return None
+    clients = _loop_clients()
+    if 'openai' not in clients:
+        clients['openai'] = AsyncOpenAI(
+            api_key=api_key,
+            timeout=OPENAI_TIMEOUT,
+            http_client=httpx.AsyncClient(limits=_async_limits(), timeout=OPENAI_TIMEOUT)
+        )
+    return clients['openai']
+
+async def close_async_clients():
+    """
+    Close the async clients of the running event loop (e.g. on shutdown).
+    """
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        if isinstance(client, httpx.AsyncClient):
+            await client.aclose()
+        else:
+            await client.close()
+
+def get_youtube_discovery_document():
+    """
+    Get the YouTube Data API v3 discovery document, fetching it at most once.
+
+    The document is kept in memory and on disk. Without a disk copy the one
+    bundled with google-api-python-client is used, and the network only
+    when neither exists.
+
+    Returns:
+        str: Discovery document JSON
+    """
+    global _youtube_discovery
+    if _youtube_discovery is None:
+        with _lock:
+            if _youtube_discovery is None:
+                try:
+                    _youtube_discovery = YOUTUBE_DISCOVERY_CACHE.read_text(encoding='utf-8')
+                except OSError:
+                    _youtube_discovery = get_static_doc('youtube', 'v3')
+                if _youtube_discovery is None:
+                    logger.info('Fetching YouTube discovery document')
+                    response = get_http_session().get(YOUTUBE_DISCOVERY_URL, timeout=30)
+                    response.raise_for_status()
+                    document = response.text
+                    json.loads(document)
+                    try:
+                        YOUTUBE_DISCOVERY_CACHE.parent.mkdir(parents=True, exist_ok=True)
+                        YOUTUBE_DISCOVERY_CACHE.write_text(document, encoding='utf-8')
+                    except OSError as e:
+                        logger.warning(f'Error caching YouTube discovery document: {str(e)}')
+                    _youtube_discovery = document
+    return _youtube_discovery
+
+def get_youtube_client(api_key):
+    """
+    Get a YouTube Data API client for the calling thread.
+
+    Args:
+        api_key (str): YouTube API key
+
+    Returns:
+        Resource: YouTube service built from the cached discovery document
+    """
+    clients = getattr(_thread_local, 'youtube_clients', None)
+    if clients is None:
+        clients = _thread_local.youtube_clients = {}
+    if api_key not in clients:
+        clients[api_key] = build_from_document(get_youtube_discovery_document(), developerKey=api_key)
+    return clients[api_key]
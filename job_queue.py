@@ -0,0 +1,353 @@
+"""
+SQLite-backed job queue for running searches outside the Flask request thread.
+
+Searches are enqueued by normalized query so identical in-flight searches
+share one job, and are executed by worker processes started with
+start_workers() or by running this module directly. Workers publish each
+part of the results as a job event while the search runs, so every client
+of a shared job can stream them with stream_job().
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+from result_cache import normalize_query
+from search_pipeline import cached_search
+import transcription_backends
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.getenv('JOB_DB_PATH', 'cache/jobs.sqlite3'))
+WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '0.5'))
+# Seconds between checks for new events while streaming a job
+STREAM_POLL_INTERVAL = float(os.getenv('JOB_STREAM_POLL_INTERVAL', '0.2'))
+# Running jobs not updated for this many seconds are assumed to belong to a dead worker
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', '900'))
+# Finished jobs are kept this long so clients can still fetch their results
+JOB_RETENTION = int(os.getenv('JOB_RETENTION', str(24 * 3600)))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+def _connect():
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            query TEXT NOT NULL,
+            query_key TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS jobs_query_key ON jobs (query_key, status)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id)')
+    return conn
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+def enqueue(query):
+    """
+    Enqueue a search, reusing the job of an identical in-flight search.
+
+    Args:
+        query (str): Product search query
+
+    Returns:
+        str: Job ID
+    """
+    key = normalize_query(query)
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            'SELECT id FROM jobs WHERE query_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1',
+            (key, QUEUED, RUNNING)
+        ).fetchone()
+        if row:
+            conn.execute('COMMIT')
+            logger.info(f'Joining in-flight job {row["id"]} for "{key}"')
+            return row['id']
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn.execute(
+            'INSERT INTO jobs (id, query, query_key, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, query, key, QUEUED, now, now)
+        )
+        conn.execute('COMMIT')
+        logger.info(f'Enqueued job {job_id} for "{key}"')
+        return job_id
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def get_job(job_id):
+    """
+    Look up a job.
+
+    Args:
+        job_id (str): Job ID
+
+    Returns:
+        dict: Job row (id, query, status, result, error, timestamps) or None
+    """
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return _row_to_job(row)
+    finally:
+        conn.close()
+
+def wait_for_job(job_id, timeout=None, poll_interval=POLL_INTERVAL):
+    """
+    Block until a job finishes.
+
+    Args:
+        job_id (str): Job ID
+        timeout (float): Maximum seconds to wait (default: no limit)
+        poll_interval (float): Seconds between status checks
+
+    Returns:
+        dict: Job row, which may still be queued/running if the timeout expired
+    """
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        job = get_job(job_id)
+        if job is None or job['status'] in (DONE, FAILED):
+            return job
+        if deadline and time.time() >= deadline:
+            return job
+        time.sleep(poll_interval)
+
+def claim_next():
+    """
+    Atomically take the oldest queued job.
+
+    Returns:
+        dict: The claimed job or None if the queue is empty
+    """
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            'SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1',
+            (QUEUED,)
+        ).fetchone()
+        if row:
+            conn.execute(
+                'UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?',
+                (RUNNING, time.time(), row['id'])
+            )
+            # A requeued job starts over, so drop what its previous run published
+            conn.execute('DELETE FROM job_events WHERE job_id = ?', (row['id'],))
+        conn.execute('COMMIT')
+        return _row_to_job(row)
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def publish_event(job_id, event, data):
+    """
+    Record one part of a running job's results.
+
+    Args:
+        job_id (str): Job ID
+        event (str): Event name from iter_search
+        data: JSON-serializable event payload
+    """
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT INTO job_events (job_id, event, data, created_at) VALUES (?, ?, ?, ?)',
+            (job_id, event, json.dumps(data), time.time())
+        )
+        # Also shows the job is alive to recover()
+        conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (time.time(), job_id))
+    finally:
+        conn.close()
+
+def get_events(job_id, after_id=0):
+    """
+    Get a job's events published after a given one.
+
+    Args:
+        job_id (str): Job ID
+        after_id (int): ID of the last event already seen
+
+    Returns:
+        list: (id, event, data) tuples in publishing order
+    """
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            'SELECT id, event, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id',
+            (job_id, after_id)
+        ).fetchall()
+        return [(row['id'], row['event'], json.loads(row['data'])) for row in rows]
+    finally:
+        conn.close()
+
+def stream_job(job_id, poll_interval=STREAM_POLL_INTERVAL):
+    """
+    Follow a job's events from the start until it finishes.
+
+    Args:
+        job_id (str): Job ID
+        poll_interval (float): Seconds between checks for new events
+
+    Yields:
+        tuple: (event, data) pairs as published by the worker, ending with
+            ('done', dict), or with ('error', dict) if the job failed
+    """
+    last_id = 0
+    while True:
+        job = get_job(job_id)
+        if job is None:
+            yield 'error', {'error': 'Job not found'}
+            return
+        # Read after the status, so a finished job's events are all there
+        for last_id, event, data in get_events(job_id, last_id):
+            yield event, data
+            if event == 'done':
+                return
+        if job['status'] == FAILED:
+            yield 'error', {'error': job['error'] or 'Error processing search'}
+            return
+        if job['status'] == DONE:
+            return
+        time.sleep(poll_interval)
+
+def finish(job_id, result=None, error=None):
+    """
+    Record the outcome of a job.
+
+    Args:
+        job_id (str): Job ID
+        result (dict): Search results if the job succeeded
+        error (str): Error message if the job failed
+    """
+    conn = _connect()
+    try:
+        conn.execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?',
+            (
+                FAILED if error else DONE,
+                json.dumps(result) if result is not None else None,
+                error,
+                time.time(),
+                job_id
+            )
+        )
+    finally:
+        conn.close()
+
+def recover():
+    """
+    Requeue jobs orphaned by dead workers and drop expired finished jobs.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        requeued = conn.execute(
+            'UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?',
+            (QUEUED, now, RUNNING, now - JOB_TIMEOUT)
+        ).rowcount
+        conn.execute(
+            'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+            (DONE, FAILED, now - JOB_RETENTION)
+        )
+        conn.execute('DELETE FROM job_events WHERE job_id NOT IN (SELECT id FROM jobs)')
+        if requeued:
+            logger.warning(f'Requeued {requeued} orphaned jobs')
+    finally:
+        conn.close()
+
+def run_worker(poll_interval=POLL_INTERVAL):
+    """
+    Process queued searches until the process is terminated.
+
+    Args:
+        poll_interval (float): Seconds to sleep when the queue is empty
+    """
+    logger.info(f'Job worker {os.getpid()} started')
+    recover()
+    transcription_backends.warm_up()
+    while True:
+        job = claim_next()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        logger.info(f'Worker {os.getpid()} running job {job["id"]} for "{job["query"]}"')
+        try:
+            result = cached_search(
+                job['query'],
+                on_event=lambda event, data: publish_event(job['id'], event, data)
+            )
+            finish(job['id'], result=result)
+        except Exception as e:
+            logger.error(f'Job {job["id"]} failed: {str(e)}', exc_info=True)
+            finish(job['id'], error=f'Error processing search: {str(e)}')
+
+def start_workers(count=WORKERS):
+    """
+    Start worker processes in the background.
+
+    Args:
+        count (int): Number of worker processes
+
+    Returns:
+        list: The started multiprocessing.Process objects
+    """
+    workers = []
+    for i in range(count):
+        worker = multiprocessing.Process(target=run_worker, name=f'job-worker-{i}', daemon=True)
+        worker.start()
+        workers.append(worker)
+    return workers
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run search job workers')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Number of worker processes')
+    args = parser.parse_args()
+
+    processes = start_workers(args.workers)
+    for process in processes:
+        process.join()
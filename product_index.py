@@ -0,0 +1,314 @@
+"""
+Persistent product index built from Oxylabs shopping results.
+
+Every listing fetched by reviews.get_product_reviews is upserted here,
+keyed by its product identity: normalized name, rating, review count,
+image and fetch time, along with the searches that returned it. An FTS5
+table over the normalized names answers later searches. Prefixes are
+completed and misspelled words corrected to indexed terms, but numbers and
+model numbers must match exactly. A listing is only served for the search
+that fetched it or a prefix/fuzzy variant of that search.
+"""
+
+import os
+import time
+import sqlite3
+import difflib
+import logging
+from pathlib import Path
+from product_matching import tokenize, identity_keys
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.getenv('PRODUCT_INDEX_PATH', 'cache/products.sqlite3'))
+# Seconds an indexed listing counts as fresh enough to answer a search
+INDEX_TTL = int(os.getenv('PRODUCT_INDEX_TTL', str(6 * 3600)))
+# Most listings read from the index for one search
+MATCH_LIMIT = int(os.getenv('PRODUCT_INDEX_MATCH_LIMIT', '200'))
+# How similar (0-1) an indexed term must be to replace an unknown query term
+FUZZY_CUTOFF = float(os.getenv('PRODUCT_INDEX_FUZZY_CUTOFF', '0.8'))
+
+def _connect():
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY,
+            product_key TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            normalized_name TEXT NOT NULL,
+            product_id TEXT,
+            gtin TEXT,
+            rating REAL,
+            reviews_count INTEGER,
+            img_url TEXT,
+            fetched_at REAL NOT NULL
+        )
+    ''')
+    # External-content FTS table kept in sync with products by triggers
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            normalized_name, content='products', content_rowid='id', prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, normalized_name) VALUES (new.id, new.normalized_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, normalized_name) VALUES ('delete', old.id, old.normalized_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE OF normalized_name ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, normalized_name) VALUES ('delete', old.id, old.normalized_name);
+            INSERT INTO products_fts (rowid, normalized_name) VALUES (new.id, new.normalized_name);
+        END
+    ''')
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS products_vocab USING fts5vocab(products_fts, 'row')")
+    # Which searches returned each product, as normalized query keys
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS product_queries (
+            product_key TEXT NOT NULL,
+            query_key TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (product_key, query_key)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS product_queries_query ON product_queries (query_key)')
+    return conn
+
+def _product_key(key):
+    # Serialize an identity key from product_matching for storage
+    kind, *parts = key
+    if kind == 'title':
+        return 'title:' + ' '.join(sorted(parts[0]))
+    if kind == 'model':
+        return f'model:{parts[0]}:' + ' '.join(parts[1])
+    return f'{kind}:{parts[0]}'
+
+def _image(product):
+    img_url = product.get('thumbnail') or product.get('image')
+    if not img_url and isinstance(product.get('images'), list) and product['images']:
+        img_url = product['images'][0]
+    return img_url if isinstance(img_url, str) else None
+
+def query_key(query):
+    """
+    Normalize a query the way the index stores it.
+
+    Args:
+        query (str): Product search query
+
+    Returns:
+        str: Space-separated tokenize() terms
+    """
+    return ' '.join(tokenize(query))
+
+def _is_identity_term(term):
+    # Numbers and model numbers name one product: "15" is not a near miss for "14"
+    return any(char.isdigit() for char in term)
+
+def _term_matches(typed, stored):
+    if typed == stored:
+        return True
+    if _is_identity_term(typed) or _is_identity_term(stored):
+        return False
+    return stored.startswith(typed) or difflib.SequenceMatcher(None, typed, stored).ratio() >= FUZZY_CUTOFF
+
+def query_matches(query, stored_key):
+    """
+    Check whether a query is the stored query or a prefix/fuzzy variant of it.
+
+    Every term has to pair up with a different stored term, and terms with
+    digits only pair up with themselves.
+
+    Args:
+        query (str): Product search query
+        stored_key (str): query_key() of the search that fetched a product
+
+    Returns:
+        bool: True if the query asks for the same thing
+    """
+    typed = tokenize(query)
+    stored = stored_key.split()
+    if not typed or len(typed) != len(stored):
+        return False
+    remaining = list(stored)
+    for term in typed:
+        match = next((candidate for candidate in remaining if _term_matches(term, candidate)), None)
+        if match is None:
+            return False
+        remaining.remove(match)
+    return True
+
+def add_products(products, query=None, fetched_at=None):
+    """
+    Upsert fetched listings, one row per product.
+
+    Args:
+        products (list): Listings with title and any of product_id, gtin,
+            rating, reviews_count and image fields
+        query (str): Search that returned the listings (optional, but
+            listings are only served for searches matching it)
+        fetched_at (float): Fetch time (default: now)
+
+    Returns:
+        int: Number of products written
+    """
+    fetched_at = fetched_at or time.time()
+    rows = {}
+    for product in products:
+        if not product.get('title'):
+            continue
+        terms = tokenize(product['title'])
+        keys = identity_keys(product, terms)
+        if not keys:
+            continue
+        key = _product_key(keys[0])
+        # Merchants listing the same product: keep the listing with the most reviews
+        if key in rows and (rows[key][6] or 0) >= (product.get('reviews_count') or 0):
+            continue
+        rows[key] = (
+            key, product['title'], ' '.join(terms), product.get('product_id'), product.get('gtin'),
+            product.get('rating'), product.get('reviews_count'), _image(product), fetched_at
+        )
+    if not rows:
+        return 0
+
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany('''
+            INSERT INTO products (
+                product_key, name, normalized_name, product_id, gtin, rating, reviews_count, img_url, fetched_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (product_key) DO UPDATE SET
+                name = excluded.name,
+                normalized_name = excluded.normalized_name,
+                product_id = COALESCE(excluded.product_id, product_id),
+                gtin = COALESCE(excluded.gtin, gtin),
+                rating = excluded.rating,
+                reviews_count = excluded.reviews_count,
+                img_url = COALESCE(excluded.img_url, img_url),
+                fetched_at = excluded.fetched_at
+        ''', list(rows.values()))
+        if query and query_key(query):
+            conn.executemany(
+                '''
+                INSERT INTO product_queries (product_key, query_key, fetched_at) VALUES (?, ?, ?)
+                ON CONFLICT (product_key, query_key) DO UPDATE SET fetched_at = excluded.fetched_at
+                ''',
+                [(key, query_key(query), fetched_at) for key in rows]
+            )
+        conn.execute('COMMIT')
+        return len(rows)
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def _resolve_term(conn, term):
+    # The term itself, else its most common completion, else the closest indexed term
+    if _is_identity_term(term):
+        return term
+    row = conn.execute(
+        'SELECT term FROM products_vocab WHERE term >= ? AND term < ? ORDER BY term = ? DESC, doc DESC LIMIT 1',
+        (term, term + '\uffff', term)
+    ).fetchone()
+    if row:
+        return row['term']
+    candidates = [
+        row['term'] for row in conn.execute(
+            'SELECT term FROM products_vocab WHERE term >= ? AND term < ?', (term[0], term[0] + '\uffff')
+        ) if not _is_identity_term(row['term'])
+    ]
+    matches = difflib.get_close_matches(term, candidates, n=1, cutoff=FUZZY_CUTOFF)
+    return matches[0] if matches else term
+
+def search(query, max_age=INDEX_TTL, limit=MATCH_LIMIT):
+    """
+    Find fresh indexed listings fetched for this query or a variant of it.
+
+    A listing is returned only if every resolved query term is in its name
+    and it was fetched by a search that query_matches() the query, so
+    "samsung tv" never borrows the listings of "samsung galaxy s24".
+
+    Args:
+        query (str): Product search query
+        max_age (float): Oldest fetch, in seconds, to return
+        limit (int): Most listings to return
+
+    Returns:
+        tuple: (resolved query, listings). The resolved query has prefixes
+            completed and misspelled terms corrected to indexed terms.
+            Listings are dicts with title, product_id, gtin, rating,
+            reviews_count and thumbnail, best match first.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return query, []
+
+    conn = _connect()
+    try:
+        terms = [_resolve_term(conn, term) for term in terms]
+        match = ' AND '.join(f'"{term}"' for term in terms)
+        rows = conn.execute('''
+            SELECT p.name, p.product_id, p.gtin, p.rating, p.reviews_count, p.img_url,
+                   (SELECT group_concat(q.query_key, '|') FROM product_queries q
+                    WHERE q.product_key = p.product_key) AS query_keys
+            FROM products_fts f JOIN products p ON p.id = f.rowid
+            WHERE products_fts MATCH ? AND p.fetched_at >= ?
+            ORDER BY f.rank
+            LIMIT ?
+        ''', (match, time.time() - max_age, limit)).fetchall()
+    finally:
+        conn.close()
+
+    listings = [
+        {
+            'title': row['name'],
+            'product_id': row['product_id'],
+            'gtin': row['gtin'],
+            'rating': row['rating'],
+            'reviews_count': row['reviews_count'],
+            'thumbnail': row['img_url'],
+        }
+        for row in rows
+        if any(query_matches(query, key) for key in (row['query_keys'] or '').split('|') if key)
+    ]
+    return ' '.join(terms), listings
+
+def popular_queries(limit=MATCH_LIMIT):
+    """
+    Get the searches that fetched indexed products, by how reviewed their products are.
+
+    These are canonical names for products: what someone typed to find
+    them, normalized by query_key(), rather than a merchant's listing title.
+
+    Args:
+        limit (int): Most queries to return
+
+    Returns:
+        list: (query_key, reviews_count) tuples, reviews_count summed over
+            the query's products, most reviewed first
+    """
+    conn = _connect()
+    try:
+        rows = conn.execute('''
+            SELECT q.query_key, SUM(COALESCE(p.reviews_count, 0)) AS reviews_count
+            FROM product_queries q JOIN products p ON p.product_key = q.product_key
+            GROUP BY q.query_key
+            ORDER BY reviews_count DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+        return [(row['query_key'], row['reviews_count']) for row in rows]
+    finally:
+        conn.close()
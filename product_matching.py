@@ -0,0 +1,207 @@
+"""
+Resolve Google Shopping listings to products.
+
+A product is usually listed by several merchants, and a shopping search
+also turns up accessories and unrelated items. ProductMatcher drops
+listings that aren't relevant to the query and keeps one entry per
+product. Listings are grouped by GTIN or Google product id when they have
+one, and otherwise by model number or normalized title. Every title is
+tokenized once and clusters are found by dict lookup, so matching is O(n)
+in the number of listings.
+"""
+
+import os
+import re
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Share of the query's terms a listing title must contain
+MIN_RELEVANCE = float(os.getenv('PRODUCT_MIN_RELEVANCE', '0.5'))
+
+STOPWORDS = {'a', 'an', 'the', 'and', 'or', 'of', 'for', 'to', 'in', 'on', 'with', 'by', 'review', 'reviews'}
+# Words that don't tell one product from another
+NOISE_TERMS = {
+    'new', 'brand', 'latest', 'genuine', 'original', 'official', 'sale', 'free', 'shipping',
+    'black', 'white', 'silver', 'gray', 'grey', 'blue', 'red', 'green', 'pink', 'gold',
+    'purple', 'yellow', 'beige', 'midnight', 'graphite', 'color', 'colour',
+}
+# Words that make a listing an add-on when they are its head noun, unless the query asks for one
+ACCESSORY_TERMS = {
+    'case', 'cover', 'sleeve', 'skin', 'protector', 'charger', 'cable', 'adapter', 'strap',
+    'band', 'mount', 'stand', 'holder', 'replacement', 'compatible', 'earpads', 'tips',
+    'decal', 'sticker', 'pouch', 'bag', 'dock',
+}
+
+# Hyphens and apostrophes inside words are dropped, so "WH-1000XM5" matches "WH1000XM5"
+_JOINER_RE = re.compile(r"(?<=\w)[-'.](?=\w)")
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_MODEL_RE = re.compile(r'^(?=.*\d)(?=.*[a-z])[a-z0-9]{3,}$')
+# What follows these describes what comes in the box, not what the listing is
+_BUNDLE_WORDS = {'with', 'includes', 'including', 'plus'}
+
+def _words(text):
+    # Like tokenize, but keeping stopwords and "+" so the title's phrasing can be read
+    text = _JOINER_RE.sub('', (text or '').lower()).replace('+', ' plus ')
+    return _WORD_RE.findall(text)
+
+def is_accessory(title, query_terms=frozenset()):
+    """
+    Tell whether a listing is an accessory for a product rather than the product.
+
+    Accessory words after "with", "includes" or "+" describe the bundle
+    ("... with MagSafe Charging Case") and are ignored. Before them, a
+    listing is an accessory when an accessory word is followed by "for"
+    ("Case for ..."), when it is "... compatible with/for ...", or when an
+    accessory word comes before any of the query's terms ("Spigen Case
+    Sony ...").
+
+    Args:
+        title (str): Listing title
+        query_terms (set): tokenize(query); accessory words in it are
+            what the user asked for and never count
+
+    Returns:
+        bool: True if the listing should be treated as an add-on
+    """
+    words = _words(title)
+    seen_query_term = False
+    for i, word in enumerate(words):
+        following = words[i + 1] if i + 1 < len(words) else None
+        if word == 'compatible' and following in ('with', 'for'):
+            return True
+        if word in _BUNDLE_WORDS:
+            return False
+        if word in query_terms:
+            seen_query_term = True
+            continue
+        if word in ACCESSORY_TERMS:
+            if following == 'for' or not seen_query_term:
+                return True
+    return False
+
+def tokenize(text):
+    """
+    Split a title or query into normalized terms.
+
+    Args:
+        text (str): Title or query
+
+    Returns:
+        list: Lowercase terms without stopwords, in order
+    """
+    text = _JOINER_RE.sub('', (text or '').lower())
+    return [word for word in _WORD_RE.findall(text) if word not in STOPWORDS]
+
+def identity_keys(product, terms):
+    """
+    Get the keys listings of the same product share.
+
+    Args:
+        product (dict): Listing with any of gtin, product_id and title
+        terms (list): tokenize(title) for the listing
+
+    Returns:
+        list: Identity keys, most specific first (empty if the listing
+            can't be identified)
+    """
+    keys = []
+    if product.get('gtin'):
+        keys.append(('gtin', str(product['gtin'])))
+    if product.get('product_id'):
+        keys.append(('id', str(product['product_id'])))
+
+    distinct = [term for term in terms if term not in NOISE_TERMS]
+    models = sorted({term for term in distinct if _MODEL_RE.match(term)})
+    if models:
+        # Brand (first word) and model number identify the product across merchants' titles
+        keys.append(('model', distinct[0], tuple(models)))
+    elif distinct:
+        keys.append(('title', frozenset(distinct)))
+    return keys
+
+class ProductMatcher:
+    """
+    Relevance filter and product clustering for one query's listings.
+    """
+
+    def __init__(self, query, min_relevance=None):
+        self.query_terms = set(tokenize(query))
+        # A model number in the query has to match exactly: "XM4" isn't a near miss for "XM5"
+        self.query_models = {term for term in self.query_terms if _MODEL_RE.match(term)}
+        self.min_relevance = MIN_RELEVANCE if min_relevance is None else min_relevance
+        self.listings = 0
+        self.rejected = 0
+        # cluster key -> representative listing, and every identity key -> cluster key
+        self._clusters = {}
+        self._aliases = {}
+
+    def relevance(self, title, terms=None):
+        """
+        Score how well a listing matches the query.
+
+        Args:
+            title (str): Listing title
+            terms (list): tokenize(title), if already computed
+
+        Returns:
+            float: Share of the query's terms in the title, or 0.0 for
+                accessories the query didn't ask for and other models
+        """
+        if not self.query_terms:
+            return 1.0
+        title_terms = set(tokenize(title) if terms is None else terms)
+        if not self.query_models <= title_terms or is_accessory(title, self.query_terms):
+            return 0.0
+        return len(self.query_terms & title_terms) / len(self.query_terms)
+
+    def add(self, product):
+        """
+        Match a listing against the products seen so far.
+
+        A product's representative is the listing with the most reviews,
+        since merchants for the same product show the same aggregate rating.
+
+        Args:
+            product (dict): Listing with title, rating, reviews_count and
+                optionally gtin/product_id
+
+        Returns:
+            tuple: (key, previous) when the listing becomes its product's
+                representative, previous being the listing it replaced (or
+                None for a new product); None if the listing was rejected
+                or another listing already represents the product
+        """
+        self.listings += 1
+        terms = tokenize(product.get('title'))
+        if self.relevance(product.get('title'), terms) < self.min_relevance:
+            self.rejected += 1
+            return None
+
+        keys = identity_keys(product, terms)
+        if not keys:
+            self.rejected += 1
+            return None
+
+        # A listing joins the cluster of any key it shares, e.g. a model
+        # number seen earlier on a listing with a GTIN
+        key = next((self._aliases[k] for k in keys if k in self._aliases), keys[0])
+        for k in keys:
+            self._aliases.setdefault(k, key)
+
+        previous = self._clusters.get(key)
+        if previous is not None and (previous.get('reviews_count') or 0) >= (product.get('reviews_count') or 0):
+            return None
+        self._clusters[key] = product
+        return key, previous
+
+    def products(self):
+        """
+        Get one listing per matched product.
+
+        Returns:
+            list: Representative listings, in the order products were first seen
+        """
+        return list(self._clusters.values())
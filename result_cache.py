@@ -0,0 +1,187 @@
+"""
+Query-level cache for final search results.
+
+Results are split into components (ratings, summary, video_reviews), each
+with its own TTL. Entries live in an in-process LRU tier backed by JSON
+files on disk so they survive restarts and are shared between workers.
+A memory entry is only served while its disk file is unchanged, so an
+entry another worker process refreshed is picked up on the next lookup.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(os.getenv('RESULT_CACHE_DIR', 'cache/results'))
+MEMORY_ENTRIES = int(os.getenv('RESULT_CACHE_MEMORY_ENTRIES', '256'))
+
+# Seconds a component is served without triggering a refresh
+COMPONENT_TTLS = {
+    'ratings': int(os.getenv('RESULT_CACHE_TTL_RATINGS', str(6 * 3600))),
+    'summary': int(os.getenv('RESULT_CACHE_TTL_SUMMARY', str(24 * 3600))),
+    'video_reviews': int(os.getenv('RESULT_CACHE_TTL_VIDEO_REVIEWS', str(3 * 24 * 3600))),
+}
+
+# Seconds past its TTL a component may still be served while it is refreshed
+STALE_TTL = int(os.getenv('RESULT_CACHE_STALE_TTL', str(7 * 24 * 3600)))
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISSING = 'missing'
+
+def normalize_query(query):
+    """
+    Normalize a search query so trivially different spellings share a cache entry.
+
+    Args:
+        query (str): Raw search query
+
+    Returns:
+        str: Lowercased query with punctuation and repeated whitespace removed
+    """
+    query = re.sub(r'[^\w\s-]', ' ', query.lower())
+    return ' '.join(query.split())
+
+def component_state(entry, name):
+    """
+    Classify a cached component as fresh, stale or missing.
+
+    Args:
+        entry (dict): Cache entry as returned by ResultCache.get
+        name (str): Component name
+
+    Returns:
+        str: FRESH, STALE or MISSING
+    """
+    component = (entry or {}).get('components', {}).get(name)
+    if not component:
+        return MISSING
+
+    age = time.time() - component.get('fetched_at', 0)
+    ttl = COMPONENT_TTLS.get(name, 0)
+    if age < ttl:
+        return FRESH
+    if age < ttl + STALE_TTL:
+        return STALE
+    return MISSING
+
+class ResultCache:
+    """
+    Two-tier (memory LRU + disk) store of per-query cache entries.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, memory_entries=MEMORY_ENTRIES):
+        self.cache_dir = Path(cache_dir)
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.cache_dir / f'{digest}.json'
+
+    def _remember(self, key, entry, version):
+        self._memory[key] = (entry, version)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_version(self, key):
+        # Every write replaces the file, so a new inode or mtime means another process wrote it
+        try:
+            stat = os.stat(self._disk_path(key))
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def get(self, key):
+        """
+        Look up an entry, promoting disk hits into the memory tier.
+
+        The memory copy is served only while the disk file is the one it
+        was read from (or written to), which costs a stat per lookup.
+
+        Args:
+            key (str): Normalized query
+
+        Returns:
+            dict: Entry with a 'components' mapping, or None
+        """
+        version = self._disk_version(key)
+        with self._lock:
+            if key in self._memory and self._memory[key][1] == version:
+                self._memory.move_to_end(key)
+                return self._memory[key][0]
+
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Error reading result cache entry: {str(e)}")
+            return None
+
+        with self._lock:
+            self._remember(key, entry, version)
+        return entry
+
+    def set_component(self, key, name, value):
+        """
+        Store a single component of an entry in both tiers.
+
+        Args:
+            key (str): Normalized query
+            name (str): Component name
+            value: JSON-serializable component value
+        """
+        # Serialized so two stages of one search finishing together don't drop each other's component
+        with self._write_lock:
+            existing = self.get(key)
+            entry = {'query': key, 'components': dict((existing or {}).get('components', {}))}
+            entry['components'][name] = {'value': value, 'fetched_at': time.time()}
+
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                path = self._disk_path(key)
+                tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                tmp_path.replace(path)
+            except OSError as e:
+                logger.warning(f"Error writing result cache entry: {str(e)}")
+
+            with self._lock:
+                self._remember(key, entry, self._disk_version(key))
+
+    def queries(self):
+        """
+        List the queries with an entry on disk.
+
+        Returns:
+            list: Normalized queries
+        """
+        queries = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    query = json.load(f).get('query')
+            except (OSError, ValueError) as e:
+                logger.warning(f"Error reading result cache entry: {str(e)}")
+                continue
+            if query:
+                queries.append(query)
+        return queries
+
+result_cache = ResultCache()
@@ -1,13 +1,160 @@
 import os
 import json
+import time
+import random
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import openai
 from dotenv import load_dotenv
+from utils import RateLimiter, estimate_tokens
+from clients import get_openai_client
+from transcript_condenser import condense_transcript, get_metrics as get_condenser_metrics
 
 load_dotenv(override=True)
 
-# Initialize OpenAI client
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# Concurrency and client-side rate limits for review generation
+REVIEW_WORKERS = int(os.getenv('REVIEW_WORKERS', '4'))
+OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', '500'))
+OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '150000'))
+MAX_RETRIES = int(os.getenv('REVIEW_MAX_RETRIES', '5'))
+
+# Tokens reserved for the completion when budgeting a request
+COMPLETION_TOKENS = 300
+
+# Batch mode packs several transcripts into one request
+REVIEW_BATCH_MODE = os.getenv('REVIEW_BATCH_MODE', 'false').lower() in ('1', 'true', 'yes')
+REVIEW_BATCH_TOKEN_BUDGET = int(os.getenv('REVIEW_BATCH_TOKEN_BUDGET', '12000'))
+REVIEW_BATCH_MAX_VIDEOS = int(os.getenv('REVIEW_BATCH_MAX_VIDEOS', '6'))
+
+rate_limiter = RateLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT)
+
+def _retry_delay(error, attempt):
+    """
+    Work out how long to wait before retrying a rate-limited request.
+    
+    Args:
+        error (openai.RateLimitError): The 429 error
+        attempt (int): Zero-based retry attempt
+    
+    Returns:
+        float: Seconds to wait
+    """
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        # Exponential backoff with jitter so parallel workers don't retry in lockstep
+        return min(2 ** attempt, 30) + random.uniform(0, 1)
+
+def create_chat_completion(messages, completion_tokens=COMPLETION_TOKENS, **kwargs):
+    """
+    Create a chat completion within the client-side rate limits, retrying with
+    backoff when OpenAI responds with 429.
+    
+    Args:
+        messages (list): Chat messages
+        completion_tokens (int): Tokens to reserve for the response
+        **kwargs: Extra arguments for openai.chat.completions.create
+    
+    Returns:
+        ChatCompletion: OpenAI response
+    """
+    tokens = sum(estimate_tokens(message['content']) for message in messages) + completion_tokens
+    
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiter.acquire(tokens)
+        try:
+            return get_openai_client().chat.completions.create(messages=messages, **kwargs)
+        except openai.RateLimitError as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            print(f"Rate limited by OpenAI, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+SYSTEM_MESSAGE = "You are an expert at distilling product reviews into concise, authentic summaries."
+
+REVIEW_INSTRUCTIONS = """Write a customer review as if you personally used the product. The review should:
+1. Be 1-4 sentences long
+2. Include specific details about the product's features and performance
+3. Give a rating out of 5 stars
+4. Focus on your direct experience with the product
+5. NOT mention that this is based on a video or reference any reviewers
+6. Be written in first person about your hands-on experience
+7. Include both pros and cons"""
+
+REVIEW_GUIDELINES = """Make sure to:
+- Use proper JSON formatting with double quotes
+- Make the rating a number between 1 and 5
+- Write as a customer who bought and used the product
+- Never mention YouTube, videos, or reviewers
+- Focus on personal experience with the product"""
+
+def parse_json_response(content):
+    """
+    Parse a JSON object from a model response, even if it's embedded in other text.
+    
+    Args:
+        content (str): Raw response content
+    
+    Returns:
+        dict or list: Parsed JSON
+    """
+    try:
+        # First try direct JSON parsing
+        return json.loads(content)
+    except json.JSONDecodeError:
+        # Then the outermost object, which keeps nested objects such as a
+        # batch's reviews array intact, inside code fences or other text
+        start, end = content.find('{'), content.rfind('}')
+        if start != -1 and end > start:
+            try:
+                return json.loads(content[start:end + 1])
+            except json.JSONDecodeError:
+                pass
+        # If that fails, try to find JSON-like structure
+        import re
+        json_pattern = r'\{[^{}]*\}'  # Simple pattern to match JSON object
+        matches = re.findall(json_pattern, content)
+        if matches:
+            try:
+                return json.loads(matches[0])
+            except json.JSONDecodeError:
+                raise Exception("Could not parse embedded JSON")
+        else:
+            raise Exception("No JSON-like structure found in response")
+
+def validate_review(review_data):
+    """
+    Validate a generated review and normalize its rating.
+    
+    Args:
+        review_data (dict): Parsed review with review_text and rating
+    
+    Returns:
+        dict: The validated review
+    """
+    # Validate the structure
+    if not isinstance(review_data, dict):
+        raise Exception("Response is not a dictionary")
+    if 'review_text' not in review_data or 'rating' not in review_data:
+        raise Exception("Missing required fields in response")
+        
+    # Convert rating to float/int if it's a string
+    if isinstance(review_data['rating'], str):
+        try:
+            review_data['rating'] = float(review_data['rating'])
+        except ValueError:
+            raise Exception("Rating must be a number")
+            
+    if not isinstance(review_data['rating'], (int, float)) or not 1 <= float(review_data['rating']) <= 5:
+        raise Exception("Invalid rating value")
+    if not isinstance(review_data['review_text'], str) or len(review_data['review_text']) < 10:
+        raise Exception("Invalid review text")
+        
+    return review_data
 
 def generate_review(video_data, transcript):
     """
@@ -31,14 +178,7 @@ Description: {video_data.get('description', 'Not available')}
 
 Transcript: {transcript}
 
-Write a customer review as if you personally used the product. The review should:
-1. Be 1-4 sentences long
-2. Include specific details about the product's features and performance
-3. Give a rating out of 5 stars
-4. Focus on your direct experience with the product
-5. NOT mention that this is based on a video or reference any reviewers
-6. Be written in first person about your hands-on experience
-7. Include both pros and cons
+{REVIEW_INSTRUCTIONS}
 
 Respond with a JSON object in this exact format, with no deviations:
 {{
@@ -46,18 +186,13 @@ Respond with a JSON object in this exact format, with no deviations:
     "rating": "Your rating out of 5 stars here"
 }}
 
-Make sure to:
-- Use proper JSON formatting with double quotes
-- Make the rating a number between 1 and 5
-- Write as a customer who bought and used the product
-- Never mention YouTube, videos, or reviewers
-- Focus on personal experience with the product"""
+{REVIEW_GUIDELINES}"""
 
     try:
-        response = openai.chat.completions.create(
+        response = create_chat_completion(
             model="gpt-4-turbo-preview",
             messages=[
-                {"role": "system", "content": "You are an expert at distilling product reviews into concise, authentic summaries."},
+                {"role": "system", "content": SYSTEM_MESSAGE},
                 {"role": "user", "content": prompt}
             ],
             response_format={"type": "json_object"},
@@ -67,110 +202,312 @@ Make sure to:
         content = response.choices[0].message.content
         print("Review generated: ", content)
         
-        # Try to extract JSON even if it's embedded in other text
+        return validate_review(parse_json_response(content))
+        
+    except Exception as e:
+        print(f"Error generating review: {str(e)}")
+        return None
+
+def _format_batch_entry(video_id, video_data, transcript):
+    platform = video_data.get('platform', 'YouTube')
+    return f"""=== Video ID: {video_id} ===
+Platform: {platform}
+Title: {video_data['title']}
+Channel: {video_data['channel']}
+Description: {video_data.get('description', 'Not available')}
+
+Transcript: {transcript}"""
+
+def pack_batches(items, token_budget=None, max_videos=None):
+    """
+    Greedily pack videos into batches whose prompts fit a token budget.
+    
+    Args:
+        items (list): (video_id, video_data, transcript) tuples
+        token_budget (int): Maximum estimated prompt tokens per batch (default: REVIEW_BATCH_TOKEN_BUDGET)
+        max_videos (int): Maximum videos per batch (default: REVIEW_BATCH_MAX_VIDEOS)
+    
+    Returns:
+        list: Lists of items; consecutive so the overall order is preserved
+    """
+    token_budget = token_budget or REVIEW_BATCH_TOKEN_BUDGET
+    max_videos = max_videos or REVIEW_BATCH_MAX_VIDEOS
+    overhead = estimate_tokens(SYSTEM_MESSAGE + REVIEW_INSTRUCTIONS + REVIEW_GUIDELINES) + 150
+    
+    batches = []
+    current, current_tokens = [], overhead
+    for item in items:
+        tokens = estimate_tokens(_format_batch_entry(*item))
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_videos):
+            batches.append(current)
+            current, current_tokens = [], overhead
+        # A single video over the budget still gets a batch of its own
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def generate_reviews_batch(items):
+    """
+    Generate reviews for several videos with a single structured-JSON request.
+    
+    Args:
+        items (list): (video_id, video_data, transcript) tuples
+    
+    Returns:
+        dict: Validated reviews keyed by video ID; videos the model skipped or
+            answered invalidly are missing
+    """
+    entries = "\n\n".join(_format_batch_entry(*item) for item in items)
+    prompt = f"""Below are {len(items)} product reviews, each starting with a line of the form "=== Video ID: <id> ===".
+
+{entries}
+
+For EACH video, separately:
+{REVIEW_INSTRUCTIONS}
+
+Respond with a JSON object in this exact format, with exactly one entry per video ID, no deviations:
+{{
+    "reviews": [
+        {{
+            "video_id": "The video ID exactly as given",
+            "review_text": "Your 1-4 sentence review here",
+            "rating": "Your rating out of 5 stars here"
+        }}
+    ]
+}}
+
+{REVIEW_GUIDELINES}"""
+
+    response = create_chat_completion(
+        model="gpt-4-turbo-preview",
+        messages=[
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.6,
+        completion_tokens=COMPLETION_TOKENS * len(items)
+    )
+
+    content = response.choices[0].message.content
+    print("Batch reviews generated: ", content)
+    
+    data = parse_json_response(content)
+    if not isinstance(data, dict) or not isinstance(data.get('reviews'), list):
+        raise Exception("Batch response has no reviews array")
+    
+    expected_ids = {str(video_id) for video_id, _, _ in items}
+    reviews = {}
+    for review_data in data['reviews']:
         try:
-            # First try direct JSON parsing
-            review_data = json.loads(content)
-        except json.JSONDecodeError:
-            # If that fails, try to find JSON-like structure
-            import re
-            json_pattern = r'\{[^{}]*\}'  # Simple pattern to match JSON object
-            matches = re.findall(json_pattern, content)
-            if matches:
-                try:
-                    review_data = json.loads(matches[0])
-                except json.JSONDecodeError:
-                    raise Exception("Could not parse embedded JSON")
-            else:
-                raise Exception("No JSON-like structure found in response")
+            video_id = str(review_data.get('video_id'))
+            if video_id in expected_ids:
+                reviews[video_id] = validate_review(review_data)
+        except Exception as e:
+            print(f"Invalid review in batch response: {str(e)}")
+    return reviews
+
+def load_video_dir(video_dir):
+    """
+    Load the saved video data for a video directory.
+    
+    Args:
+        video_dir (Path): Directory containing video_data.json
+    
+    Returns:
+        dict: Parsed video_data.json or None if there is nothing to review
+    """
+    print(f"\nChecking directory: {video_dir}")
+    if not video_dir.is_dir():
+        print("Not a directory, skipping...")
+        return None
         
-        # Validate the structure
-        if not isinstance(review_data, dict):
-            raise Exception("Response is not a dictionary")
-        if 'review_text' not in review_data or 'rating' not in review_data:
-            raise Exception("Missing required fields in response")
-            
-        # Convert rating to float/int if it's a string
-        if isinstance(review_data['rating'], str):
-            try:
-                review_data['rating'] = float(review_data['rating'])
-            except ValueError:
-                raise Exception("Rating must be a number")
-                
-        if not isinstance(review_data['rating'], (int, float)) or not 1 <= float(review_data['rating']) <= 5:
-            raise Exception("Invalid rating value")
-        if not isinstance(review_data['review_text'], str) or len(review_data['review_text']) < 10:
-            raise Exception("Invalid review text")
-            
-        return review_data
+    video_data_path = video_dir / 'video_data.json'
+    print(f"Looking for video data at: {video_data_path}")
+    if not video_data_path.exists():
+        print("No video data found, skipping...")
+        return None
         
+    # Load video data
+    try:
+        print("Loading video data...")
+        with open(video_data_path, 'r') as f:
+            video_data = json.load(f)
+        print(f"Video title: {video_data['video_info']['title']}")
+        print(f"Transcript length: {len(video_data.get('transcript', ''))} chars")
+        return video_data
     except Exception as e:
-        print(f"Error generating review: {str(e)}")
+        print(f"Error processing {video_dir}: {str(e)}")
         return None
 
-def process_query_directory(query_dir):
+def build_review_result(video_info, review):
     """
-    Process all videos in a query directory and generate reviews.
+    Combine a generated review with the video it came from.
     
     Args:
-        query_dir (str): Path to query directory
+        video_info (dict): The 'video_info' section of video_data.json
+        review (dict): Generated review
+    
+    Returns:
+        dict: Review as returned to the views, or None if it's invalid
+    """
+    if review and isinstance(review, dict) and 'review_text' in review and 'rating' in review:
+        try:
+            result = {
+                'video_title': video_info['title'],
+                'channel': video_info['channel'],
+                'review_text': review['review_text'],
+                'rating': review['rating'],
+                'video_url': video_info['video_url'],
+                'platform': video_info.get('platform', 'youtube')
+            }
+            print(f"Added review with rating: {review['rating']} stars")
+            return result
+        except Exception as e:
+            print(f"Error adding review: {str(e)}")
+    else:
+        print(f"Invalid review format: {review}")
+    return None
+
+def prepare_transcript(video_info, transcript, query=None):
+    """
+    Condense a transcript to the token budget before it goes into a prompt.
+    
+    Args:
+        video_info (dict): The 'video_info' section of video_data.json
+        transcript (str): Full transcript
+        query (str): Product query; the video title is used when missing
     
     Returns:
-        list: List of generated reviews
+        str: Transcript to put in the prompt
+    """
+    return condense_transcript(transcript, query or video_info.get('title', ''))
+
+def process_video_dir(video_dir, query=None):
+    """
+    Generate a review for a single video directory.
+    
+    Args:
+        video_dir (Path): Directory containing video_data.json
+        query (str): Product query used to condense the transcript
+    
+    Returns:
+        dict: Generated review or None if the directory could not be processed
+    """
+    video_data = load_video_dir(video_dir)
+    if video_data is None:
+        return None
+        
+    # Generate review
+    print("Generating review...")
+    review = generate_review(
+        video_data=video_data['video_info'],
+        transcript=prepare_transcript(video_data['video_info'], video_data.get('transcript', ''), query)
+    )
+    return build_review_result(video_data['video_info'], review)
+
+def process_video_batch(batch):
+    """
+    Generate reviews for a batch of loaded videos, falling back to one
+    request per video for anything the batch request didn't cover.
+    
+    Args:
+        batch (list): (video_id, video_data, transcript) tuples
+    
+    Returns:
+        list: Generated review or None for each video, in batch order
+    """
+    reviews = {}
+    if len(batch) > 1:
+        try:
+            print(f"Generating {len(batch)} reviews in one batch...")
+            reviews = generate_reviews_batch(batch)
+        except Exception as e:
+            print(f"Batch review generation failed, falling back to per-video requests: {str(e)}")
+    
+    results = []
+    for video_id, video_data, transcript in batch:
+        review = reviews.get(str(video_id))
+        if review is None:
+            print("Generating review...")
+            review = generate_review(video_data=video_data, transcript=transcript)
+        results.append(build_review_result(video_data, review))
+    return results
+
+def iter_query_directory(query_dir, max_workers=None, batch=None, query=None, deadline=None, video_dirs=None):
+    """
+    Generate reviews for a query directory, yielding each one as soon as it is ready.
+    
+    Video directories (or batches of them) are processed concurrently but
+    reviews are always yielded in directory-name order.
+    
+    Args:
+        query_dir (str): Path to query directory
+        video_dirs (list): The video directories to review (default: every
+            directory in query_dir). Searches pass the videos they finished,
+            so videos still being processed in the background are left out
+        max_workers (int): Concurrent LLM requests; 1 runs serially (default: REVIEW_WORKERS)
+        batch (bool): Pack several videos into each request (default: REVIEW_BATCH_MODE)
+        query (str): Product query used to condense transcripts
+        deadline (Deadline): Stop and return what is ready when it passes (optional)
+    
+    Yields:
+        dict: Generated review
     """
     print(f"\nProcessing directory: {query_dir}")
     query_path = Path(query_dir)
-    reviews = []
+    video_dirs = sorted(query_path.iterdir() if video_dirs is None else map(Path, video_dirs))
+    batch = REVIEW_BATCH_MODE if batch is None else batch
+    
+    if batch:
+        items = []
+        for video_dir in video_dirs:
+            video_data = load_video_dir(video_dir)
+            if video_data is not None:
+                video_info = video_data['video_info']
+                video_id = video_info.get('video_id') or video_dir.name
+                transcript = prepare_transcript(video_info, video_data.get('transcript', ''), query)
+                items.append((video_id, video_info, transcript))
+        tasks, worker = pack_batches(items), process_video_batch
+    else:
+        tasks, worker = video_dirs, partial(process_video_dir, query=query)
+    
+    workers = max(1, min(max_workers or REVIEW_WORKERS, len(tasks)))
     
     # Process each video directory
-    for video_dir in query_path.iterdir():
-        print(f"\nChecking directory: {video_dir}")
-        if not video_dir.is_dir():
-            print("Not a directory, skipping...")
-            continue
-            
-        video_data_path = video_dir / 'video_data.json'
-        print(f"Looking for video data at: {video_data_path}")
-        if not video_data_path.exists():
-            print("No video data found, skipping...")
-            continue
-            
-        # Load video data
-        try:
-            print("Loading video data...")
-            with open(video_data_path, 'r') as f:
-                video_data = json.load(f)
-            print(f"Video title: {video_data['video_info']['title']}")
-            print(f"Transcript length: {len(video_data.get('transcript', ''))} chars")
-                
-            # Generate review
-            print("Generating review...")
-            review = generate_review(
-                video_data=video_data['video_info'],
-                transcript=video_data.get('transcript', '')
-            )
-            print("Review generated successfully!")
-            
-            if review and isinstance(review, dict) and 'review_text' in review and 'rating' in review:
-                try:
-                    reviews.append({
-                        'video_title': video_data['video_info']['title'],
-                        'channel': video_data['video_info']['channel'],
-                        'review_text': review['review_text'],
-                        'rating': review['rating'],
-                        'video_url': video_data['video_info']['video_url'],
-                        'platform': video_data['video_info'].get('platform', 'youtube')
-                    })
-                    print(f"Added review with rating: {review['rating']} stars")
-                except Exception as e:
-                    print(f"Error adding review: {str(e)}")
-            else:
-                print(f"Invalid review format: {review}")
-                
-        except Exception as e:
-            print(f"Error processing {video_dir}: {str(e)}")
-            
-    return reviews
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='review')
+    try:
+        timeout = deadline.remaining() if deadline else None
+        for result in executor.map(worker, tasks, timeout=timeout):
+            for review in (result if batch else [result]):
+                if review:
+                    yield review
+    except TimeoutError:
+        print("Review generation deadline reached, returning the reviews generated so far")
+    finally:
+        # Don't hold the caller up on requests that missed the deadline
+        executor.shutdown(wait=not (deadline and deadline.expired()), cancel_futures=True)
+    
+    metrics = get_condenser_metrics()
+    print(f"Transcript condensation so far: ~{metrics['tokens_saved']} tokens saved "
+          f"across {metrics['transcripts']} transcripts ({metrics['condensed']} condensed)")
+
+def process_query_directory(query_dir, max_workers=None, batch=None, query=None):
+    """
+    Process all videos in a query directory and generate reviews.
+    
+    Args:
+        query_dir (str): Path to query directory
+        max_workers (int): Concurrent LLM requests; 1 runs serially (default: REVIEW_WORKERS)
+        batch (bool): Pack several videos into each request (default: REVIEW_BATCH_MODE)
+        query (str): Product query used to condense transcripts
+    
+    Returns:
+        list: List of generated reviews, in directory-name order
+    """
+    return list(iter_query_directory(query_dir, max_workers=max_workers, batch=batch, query=query))
 
 def save_reviews(query_dir, reviews):
     """
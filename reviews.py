@@ -1,22 +1,231 @@
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, List
 from dotenv import load_dotenv
 import os
+import re
+import json
+import time
+import codecs
 import logging
-from openai import OpenAI
+import asyncio
+import sqlite3
+import threading
+import httpx
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import product_index
+from product_matching import ProductMatcher
+from clients import get_http_session, get_openai_client, get_async_http_client, get_async_openai_client
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 load_dotenv(override=True)
 
-def get_product_reviews(query: str, pages: int = 2) -> Dict[str, Any]:
+OXYLABS_URL = 'https://realtime.oxylabs.io/v1/queries'
+OXYLABS_TIMEOUT = 40
+# Results pages fetched per query (each is its own request), capped at REVIEW_MAX_PAGES
+REVIEW_PAGES = int(os.getenv('REVIEW_PAGES', '2'))
+REVIEW_MAX_PAGES = int(os.getenv('REVIEW_MAX_PAGES', '10'))
+# Stop fetching pages once this many reviews have been counted (0 reads every page)
+REVIEW_COUNT_THRESHOLD = int(os.getenv('REVIEW_COUNT_THRESHOLD', '5000'))
+# Fewest reviews an index match needs to be served instead of scraping
+INDEX_MIN_REVIEWS = int(os.getenv('PRODUCT_INDEX_MIN_REVIEWS', '50'))
+# Share of the query's terms an indexed listing needs; stricter than a scrape's PRODUCT_MIN_RELEVANCE
+INDEX_MIN_RELEVANCE = 1.0
+# Page requests one query keeps in flight; the next page starts only while below REVIEW_COUNT_THRESHOLD
+PAGE_BATCH = int(os.getenv('OXYLABS_PAGE_BATCH', '2'))
+# The response body is read and scanned in chunks of this size
+STREAM_CHUNK_SIZE = int(os.getenv('REVIEWS_STREAM_CHUNK_SIZE', '65536'))
+# Log the fields extracted from every product, at DEBUG level
+REVIEWS_DEBUG = os.getenv('REVIEWS_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+
+if REVIEWS_DEBUG:
+    logger.setLevel(logging.DEBUG)
+
+# The only product fields product matching and the rating and image aggregation read
+PRODUCT_FIELDS = ('title', 'product_id', 'gtin', 'thumbnail', 'image', 'images', 'rating', 'reviews_count')
+
+_ORGANIC_RE = re.compile(r'"organic"\s*:\s*\[')
+# Longest text kept between chunks while looking for the "organic" key
+_KEY_TAIL = 64
+
+_metrics = {'requests': 0, 'products': 0, 'bytes_parsed': 0, 'parse_seconds': 0.0, 'fetch_seconds': 0.0}
+_metrics_lock = threading.Lock()
+
+class OrganicProductScanner:
+    """
+    Incremental scanner for the "organic" product arrays of an Oxylabs
+    Google Shopping response.
+
+    Bytes are fed in as they arrive. Everything outside the organic arrays
+    is skipped as text, each product is decoded on its own with
+    json.JSONDecoder.raw_decode and cut down to PRODUCT_FIELDS, so the full
+    response is never materialized.
+    """
+
+    def __init__(self):
+        self.bytes_parsed = 0
+        self.parse_seconds = 0.0
+        self.products = 0
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._buffer = ''
+        self._pos = 0
+        self._in_array = False
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """
+        Scan the next chunk of the response body.
+
+        Args:
+            chunk (bytes): Raw response bytes
+
+        Returns:
+            List of products completed by this chunk, each holding only
+            PRODUCT_FIELDS
+        """
+        self.bytes_parsed += len(chunk)
+        return self._scan(self._text.decode(chunk))
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finish scanning once the body has been read.
+
+        Returns:
+            List of any products still pending
+        """
+        return self._scan(self._text.decode(b'', final=True))
+
+    def _scan(self, text: str) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        # Drop what has already been consumed
+        buffer = self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        products = []
+
+        while True:
+            if not self._in_array:
+                match = _ORGANIC_RE.search(buffer, self._pos)
+                if not match:
+                    # The key may be split across chunks
+                    self._pos = max(self._pos, len(buffer) - _KEY_TAIL)
+                    break
+                self._pos = match.end()
+                self._in_array = True
+
+            pos = self._pos
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            self._pos = pos
+            if pos == len(buffer):
+                break
+            if buffer[pos] == ']':
+                self._pos = pos + 1
+                self._in_array = False
+                continue
+
+            try:
+                product, self._pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The rest of this product hasn't arrived yet
+                break
+            if not isinstance(product, dict):
+                continue
+
+            fields = {field: product[field] for field in PRODUCT_FIELDS if field in product}
+            self.products += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Oxylabs product {self.products}: {json.dumps(fields)}")
+            products.append(fields)
+
+        self.parse_seconds += time.perf_counter() - started
+        return products
+
+class RatingAggregate:
+    """
+    Running review count, weighted rating and image list over one query's
+    products, with listings resolved to products by ProductMatcher so each
+    relevant product counts once.
+    """
+
+    def __init__(self, query: str, min_relevance: float = None):
+        self.query = query
+        self.matcher = ProductMatcher(query, min_relevance)
+        self.total_reviews = 0
+        self.weighted_rating_sum = 0
+        # Every listing seen, relevant or not, for the product index
+        self.listings = []
+        # product key -> image URL
+        self._images = {}
+        # Pages are parsed concurrently
+        self._lock = threading.Lock()
+
+    def add(self, product: Dict[str, Any]):
+        """
+        Add one listing's rating and image, replacing its product's previous
+        listing if this one has more reviews.
+
+        Args:
+            product (Dict[str, Any]): Listing with any of PRODUCT_FIELDS
+        """
+        img_url = product.get('thumbnail') or product.get('image')
+        if not img_url:
+            images = product.get('images')
+            if isinstance(images, list) and images:
+                img_url = images[0]
+
+        with self._lock:
+            self.listings.append(product)
+            match = self.matcher.add(product)
+            if match is None:
+                return
+            key, previous = match
+            if previous is not None:
+                self._count(previous, -1)
+            self._count(product, 1)
+            if isinstance(img_url, str) and img_url.startswith(('http://', 'https://')):
+                self._images[key] = img_url
+
+    def _count(self, product, sign):
+        rating = product.get('rating')
+        reviews_count = product.get('reviews_count')
+        if rating is not None and reviews_count is not None:
+            self.total_reviews += sign * reviews_count
+            self.weighted_rating_sum += sign * rating * reviews_count
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Get the get_product_reviews result for the products added so far.
+
+        Returns:
+            Dict with total_reviews, weighted_avg_rating, img_urls and error
+        """
+        with self._lock:
+            weighted_avg_rating = (
+                round(self.weighted_rating_sum / self.total_reviews, 2) if self.total_reviews > 0 else None
+            )
+            return {
+                "total_reviews": self.total_reviews,
+                "weighted_avg_rating": weighted_avg_rating,
+                "img_urls": list(self._images.values()),
+                "error": None
+            }
+
+def get_product_reviews(query: str, pages: int = None, min_reviews: int = None) -> Dict[str, Any]:
     """
     Fetch and analyze product reviews from Google Shopping.
     
+    Each results page is a separate Oxylabs request. Up to PAGE_BATCH
+    pages run concurrently on threads of this query's own, and the next page
+    is only requested while fewer than min_reviews reviews have been
+    counted. Products are added to the rating as they are parsed. Once
+    min_reviews is reached, pages still in flight stop being read.
+    
     Args:
         query (str): The product search query
-        pages (int): Number of pages to scrape (default: 2)
+        pages (int): Number of pages to scrape (default: REVIEW_PAGES)
+        min_reviews (int): Review count that ends the fetch early, 0 to read
+            every page (default: REVIEW_COUNT_THRESHOLD)
     
     Returns:
         Dict containing:
@@ -25,117 +234,324 @@ def get_product_reviews(query: str, pages: int = 2) -> Dict[str, Any]:
         - img_urls: List of URLs of product images
         - error: Error message if any
     """
+    pages, min_reviews = _page_settings(pages, min_reviews)
+    aggregate = RatingAggregate(query)
+    stop = threading.Event()
+    batch = min(PAGE_BATCH, pages)
+    # A pool per query, so one query's slow pages never queue another's
+    pool = ThreadPoolExecutor(max_workers=batch, thread_name_prefix='oxylabs-page')
+    futures = {}
+    next_page = 1
+    errors = []
+    read = 0
     try:
-        payload = {
-            'source': 'google_shopping_search',
-            'domain': 'com',
-            'query': query,
-            'pages': pages,
-            'parse': True,
-            'context': [
-                {'key': 'sort_by', 'value': 'r'},
-            ],
-        }
+        while True:
+            while next_page <= pages and len(futures) < batch and not stop.is_set():
+                futures[pool.submit(_fetch_page, query, next_page, aggregate, stop, min_reviews)] = next_page
+                next_page += 1
+            if not futures or stop.is_set():
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = futures.pop(future)
+                error = future.result()
+                if error:
+                    logger.warning(f"Oxylabs page {page} for '{query}' failed: {error}")
+                    errors.append(error)
+                else:
+                    read += 1
+    finally:
+        # Enough reviews: pages in flight stop reading on their own, without being waited on
+        stop.set()
+        pool.shutdown(wait=False)
 
-        response = requests.request(
-            'POST',
-            'https://realtime.oxylabs.io/v1/queries',
+    result = _page_results(query, aggregate, errors, read, pages)
+    index_listings(aggregate)
+    return result
+
+def _fetch_page(query: str, page: int, aggregate: 'RatingAggregate', stop: threading.Event, min_reviews: int):
+    # Returns an error message, or None if the page was read (or cut short by stop)
+    started = time.perf_counter()
+    scanner = OrganicProductScanner()
+    try:
+        with get_http_session().post(
+            OXYLABS_URL,
             auth=(os.getenv('OXYLABS_USER'), os.getenv('OXYLABS_PASS')),
-            json=payload,
-            timeout=40
-        )
+            json=build_reviews_payload(query, page),
+            timeout=OXYLABS_TIMEOUT,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                if stop.is_set():
+                    break
+                _add_products(scanner.feed(chunk), aggregate, stop, min_reviews)
+            else:
+                _add_products(scanner.close(), aggregate, stop, min_reviews)
+        return None
 
-        response.raise_for_status()
-        data = response.json()
-        
-        # Log the full response structure
-        print("\nFull API Response:")
-        import json
-        print(json.dumps(data, indent=2))
-        print("\n")
-
-        total_reviews = 0
-        weighted_rating_sum = 0
-        img_urls = []
-
-        for result in data.get("results", []):
-            print(f"\nProcessing result:")
-            print(json.dumps(result, indent=2))
-            
-            content = result.get("content", {})
-            print(f"\nContent section:")
-            print(json.dumps(content, indent=2))
-            
-            organic_results = content.get("results", {}).get("organic", [])
-            print(f"\nFound {len(organic_results)} organic results")
-
-            for idx, product in enumerate(organic_results):
-                print(f"\nProduct {idx + 1}:")
-                print(json.dumps(product, indent=2))
-                
-                # Try multiple possible image fields
-                img_url = None
-                if product.get("thumbnail"):
-                    img_url = product.get("thumbnail")
-                    print(f"Found thumbnail URL: {img_url}")
-                elif product.get("image"):
-                    img_url = product.get("image")
-                    print(f"Found image URL: {img_url}")
-                elif product.get("images"):
-                    images = product.get("images")
-                    if isinstance(images, list) and images:
-                        img_url = images[0]
-                        print(f"Found URL in images array: {img_url}")
-                
-                if img_url:
-                    # Analyze URL structure
-                    print(f"URL Analysis:")
-                    print(f"- Full URL: {img_url}")
-                    print(f"- Starts with http/https: {img_url.startswith(('http://', 'https://'))}")
-                    print(f"- URL length: {len(img_url)}")
-                    print(f"- URL parts: {img_url.split('/')}")
-                    
-                    if img_url.startswith(('http://', 'https://')):
-                        img_urls.append(img_url)
-                        print("✓ URL added to valid images list")
-                    else:
-                        print("✗ URL rejected - invalid protocol")
-                else:
-                    print(f"No image found in any field for product {idx + 1}")
-
-                rating = product.get("rating")
-                reviews_count = product.get("reviews_count")
-                
-                if rating is not None and reviews_count is not None:
-                    print(f"Rating: {rating}, Reviews: {reviews_count}")
-                    total_reviews += reviews_count
-                    weighted_rating_sum += rating * reviews_count
+    except requests.RequestException as e:
+        return f"Error fetching reviews: {str(e)}"
+    except Exception as e:
+        return f"Unexpected error: {str(e)}"
+    finally:
+        record_metrics(query, page, scanner, time.perf_counter() - started)
+
+async def get_product_reviews_async(query: str, pages: int = None, min_reviews: int = None) -> Dict[str, Any]:
+    """
+    Async variant of get_product_reviews using the shared httpx.AsyncClient.
+    
+    Args:
+        query (str): The product search query
+        pages (int): Number of pages to scrape (default: REVIEW_PAGES)
+        min_reviews (int): Review count that ends the fetch early, 0 to read
+            every page (default: REVIEW_COUNT_THRESHOLD)
+    
+    Returns:
+        Dict with the same keys as get_product_reviews
+    """
+    pages, min_reviews = _page_settings(pages, min_reviews)
+    aggregate = RatingAggregate(query)
+    stop = threading.Event()
+    batch = min(PAGE_BATCH, pages)
+    tasks = {}
+    next_page = 1
+    errors = []
+    read = 0
+    try:
+        while True:
+            while next_page <= pages and len(tasks) < batch and not stop.is_set():
+                tasks[asyncio.create_task(_fetch_page_async(query, next_page, aggregate, stop, min_reviews))] = next_page
+                next_page += 1
+            if not tasks or stop.is_set():
+                break
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                page = tasks.pop(task)
+                error = task.result()
+                if error:
+                    logger.warning(f"Oxylabs page {page} for '{query}' failed: {error}")
+                    errors.append(error)
                 else:
-                    print(f"Missing rating or reviews. Rating: {rating}, Reviews: {reviews_count}")
+                    read += 1
+    finally:
+        # Enough reviews, or the caller gave up: drop the pages still in flight
+        for task in tasks:
+            task.cancel()
 
-        weighted_avg_rating = round(weighted_rating_sum / total_reviews, 2) if total_reviews > 0 else None
+    result = _page_results(query, aggregate, errors, read, pages)
+    await asyncio.to_thread(index_listings, aggregate)
+    return result
 
-        return {
-            "total_reviews": total_reviews,
-            "weighted_avg_rating": weighted_avg_rating,
-            "img_urls": img_urls,
-            "error": None
-        }
+async def _fetch_page_async(query: str, page: int, aggregate: 'RatingAggregate', stop: threading.Event, min_reviews: int):
+    started = time.perf_counter()
+    scanner = OrganicProductScanner()
+    try:
+        async with get_async_http_client().stream(
+            'POST',
+            OXYLABS_URL,
+            auth=(os.getenv('OXYLABS_USER'), os.getenv('OXYLABS_PASS')),
+            json=build_reviews_payload(query, page),
+            timeout=OXYLABS_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                if stop.is_set():
+                    break
+                _add_products(scanner.feed(chunk), aggregate, stop, min_reviews)
+            else:
+                _add_products(scanner.close(), aggregate, stop, min_reviews)
+        return None
 
-    except requests.RequestException as e:
-        return {
-            "total_reviews": 0,
-            "weighted_avg_rating": None,
-            "img_urls": [],
-            "error": f"Error fetching reviews: {str(e)}"
-        }
+    except httpx.HTTPError as e:
+        return f"Error fetching reviews: {str(e)}"
     except Exception as e:
-        return {
-            "total_reviews": 0,
-            "weighted_avg_rating": None,
-            "img_urls": [],
-            "error": f"Unexpected error: {str(e)}"
-        }
+        return f"Unexpected error: {str(e)}"
+    finally:
+        record_metrics(query, page, scanner, time.perf_counter() - started)
+
+def _page_settings(pages, min_reviews):
+    pages = REVIEW_PAGES if pages is None else pages
+    min_reviews = REVIEW_COUNT_THRESHOLD if min_reviews is None else min_reviews
+    return max(1, min(pages, REVIEW_MAX_PAGES)), min_reviews
+
+def _add_products(products, aggregate, stop, min_reviews):
+    for product in products:
+        aggregate.add(product)
+    if min_reviews and aggregate.total_reviews >= min_reviews:
+        stop.set()
+
+def _page_results(query, aggregate, errors, read, pages):
+    result = aggregate.result()
+    if errors and not read and not result['total_reviews']:
+        # Every page that finished failed, and nothing was counted
+        return review_error(errors[0])
+    logger.info(
+        f"Oxylabs '{query}': {result['total_reviews']} reviews over {len(aggregate.matcher.products())} products "
+        f"({aggregate.matcher.listings} listings, {aggregate.matcher.rejected} rejected) "
+        f"from {read} of {pages} pages" + (f" ({len(errors)} failed)" if errors else "")
+    )
+    return result
+
+def index_listings(aggregate: 'RatingAggregate'):
+    """
+    Add the listings behind a fetch to the product index.
+    
+    Args:
+        aggregate (RatingAggregate): Aggregate the fetch filled
+    """
+    with aggregate._lock:
+        listings = list(aggregate.listings)
+    try:
+        written = product_index.add_products(listings, aggregate.query)
+        logger.info(f"Indexed {written} products from {len(listings)} listings")
+    except Exception as e:
+        # The index only speeds up later searches
+        logger.warning(f"Error updating product index: {str(e)}")
+
+def get_indexed_reviews(query: str, max_age: float = None) -> Dict[str, Any]:
+    """
+    Answer get_product_reviews from the product index, without scraping.
+    
+    Counts only listings whose titles contain every query term
+    (INDEX_MIN_RELEVANCE), where a scrape keeps any listing with
+    PRODUCT_MIN_RELEVANCE of them. Scraped listings were ranked by Google
+    for this query; indexed ones may come from another query's results, so
+    partial-title matches are left out and an index hit can count fewer
+    reviews than a scrape of the same query.
+    
+    Args:
+        query (str): The product search query
+        max_age (float): Oldest fetch, in seconds, to use (default:
+            product_index.INDEX_TTL)
+    
+    Returns:
+        Dict with the same keys as get_product_reviews, or None if the index
+        has no fresh match with at least INDEX_MIN_REVIEWS reviews
+    """
+    started = time.perf_counter()
+    try:
+        resolved, listings = product_index.search(
+            query, max_age=product_index.INDEX_TTL if max_age is None else max_age
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"Error searching product index: {str(e)}")
+        return None
+
+    # Resolved terms, so corrected spellings count; every term must be in the title
+    aggregate = RatingAggregate(resolved, min_relevance=INDEX_MIN_RELEVANCE)
+    for listing in listings:
+        aggregate.add(listing)
+    result = aggregate.result()
+    elapsed = time.perf_counter() - started
+    if result['total_reviews'] < INDEX_MIN_REVIEWS:
+        logger.info(f"Product index miss for '{query}' ({result['total_reviews']} reviews, {elapsed * 1000:.1f} ms)")
+        return None
+
+    logger.info(
+        f"Product index hit for '{query}' as '{resolved}': {result['total_reviews']} reviews over "
+        f"{len(aggregate.matcher.products())} products ({elapsed * 1000:.1f} ms)"
+    )
+    return result
+
+def record_metrics(query: str, page: int, scanner: OrganicProductScanner, fetch_seconds: float):
+    """
+    Log one Oxylabs page fetch and add it to the process-wide metrics.
+    
+    Args:
+        query (str): The product search query
+        page (int): Results page number
+        scanner (OrganicProductScanner): Scanner that read the response
+        fetch_seconds (float): Time from request to last byte parsed
+    """
+    logger.info(
+        f"Oxylabs '{query}' page {page}: {scanner.products} products from {scanner.bytes_parsed} bytes, "
+        f"parsed in {scanner.parse_seconds:.3f}s ({fetch_seconds:.2f}s total)"
+    )
+    with _metrics_lock:
+        _metrics['requests'] += 1
+        _metrics['products'] += scanner.products
+        _metrics['bytes_parsed'] += scanner.bytes_parsed
+        _metrics['parse_seconds'] += scanner.parse_seconds
+        _metrics['fetch_seconds'] += fetch_seconds
+
+def get_metrics() -> Dict[str, Any]:
+    """
+    Get cumulative Oxylabs fetch metrics for this process.
+    
+    Returns:
+        Dict with requests, products, bytes_parsed, parse_seconds and fetch_seconds
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+def review_error(message: str) -> Dict[str, Any]:
+    """
+    Build the get_product_reviews result for a failed fetch.
+    
+    Args:
+        message (str): Error message
+    
+    Returns:
+        Dict with no reviews and the error set
+    """
+    return {
+        "total_reviews": 0,
+        "weighted_avg_rating": None,
+        "img_urls": [],
+        "error": message
+    }
+
+def build_reviews_payload(query: str, page: int = 1) -> Dict[str, Any]:
+    """
+    Build the Oxylabs Google Shopping request body for one results page.
+    
+    Args:
+        query (str): The product search query
+        page (int): Results page number, from 1
+    
+    Returns:
+        Dict: JSON request body
+    """
+    return {
+        'source': 'google_shopping_search',
+        'domain': 'com',
+        'query': query,
+        'start_page': page,
+        'pages': 1,
+        'parse': True,
+        'context': [
+            {'key': 'sort_by', 'value': 'r'},
+        ],
+    }
+
+def build_summary_messages(query: str, results: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for a review summary.
+
+    Args:
+        query (str): The product to get review summary for
+        results (Dict[str, Any]): The results of the product reviews
+
+    Returns:
+        List of chat messages
+    """
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a review aggregator artificial intelligence assistant and you need to "
+                "help the user summarize reviews for a product they queried from across the internet. "
+                "Do not provide citations for any website in your response."
+            ),
+        },
+        {
+            "role": "user",
+            "content": (
+                f"Provide a 2-3 sentence summary of reviews across the internet for {query}. Use the {results['weighted_avg_rating']} out of 5 to inform your summary review as well, but do not restate this rating explicitly."
+            ),
+        },
+    ]
 
 def get_review_summary(query: str, results: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -151,26 +567,13 @@ def get_review_summary(query: str, results: Dict[str, Any]) -> Dict[str, Any]:
             error (str): Error message if any, None otherwise
     """
     try:
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            return None, "OPENAI_API_KEY not found in environment variables"
-        client = OpenAI(api_key=api_key)
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a review aggregator artificial intelligence assistant and you need to "
-                    "help the user summarize reviews for a product they queried from across the internet. "
-                    "Do not provide citations for any website in your response."
-                ),
-            },
-            {
-                "role": "user",
-                "content": (
-                    f"Provide a 2-3 sentence summary of reviews across the internet for {query}. Use the {results['weighted_avg_rating']} out of 5 to inform your summary review as well, but do not restate this rating explicitly."
-                ),
-            },
-        ]
+        client = get_openai_client()
+        if client is None:
+            return {
+                "summary": None,
+                "error": "OPENAI_API_KEY not found in environment variables"
+            }
+        messages = build_summary_messages(query, results)
 
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
@@ -190,4 +593,39 @@ def get_review_summary(query: str, results: Dict[str, Any]) -> Dict[str, Any]:
             "error": f"Error getting review summary: {str(e)}"
         }
 
+async def get_review_summary_async(query: str, results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of get_review_summary using the shared AsyncOpenAI client.
 
+    Args:
+        query (str): The product to get review summary for
+        results (Dict[str, Any]): The results of the product reviews
+
+    Returns:
+        Dict with the same keys as get_review_summary
+    """
+    try:
+        client = get_async_openai_client()
+        if client is None:
+            return {
+                "summary": None,
+                "error": "OPENAI_API_KEY not found in environment variables"
+            }
+
+        response = await client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=build_summary_messages(query, results),
+            temperature=0.7,
+            max_tokens=150,
+        )
+
+        return {
+            "summary": response.choices[0].message.content,
+            "error": None
+        }
+    except Exception as e:
+        logger.error(f"Error getting review summary: {str(e)}", exc_info=True)
+        return {
+            "summary": None,
+            "error": f"Error getting review summary: {str(e)}"
+        }
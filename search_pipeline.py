@@ -0,0 +1,599 @@
+"""
+Search pipeline behind the /search route.
+
+The pipeline is split into independently cacheable stages:
+ratings (Oxylabs), summary (LLM) and video_reviews (YouTube/TikTok search,
+transcription and review generation). run_search runs them all concurrently;
+iter_search streams them through result_cache, refreshing stale stages in
+the background and holding each stage to a deadline, and cached_search
+collects its output into one dict.
+"""
+
+import os
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from youtube_search import search_videos as search_youtube_videos
+from tiktok_search import search_videos as search_tiktok_videos
+from video_pipeline import process_ranked_videos
+from candidate_ranking import rank_candidates, pool_size, VIDEO_TARGETS
+from review_generator import iter_query_directory
+from reviews import get_product_reviews, get_indexed_reviews, get_review_summary
+from suggestions import record_query
+from result_cache import result_cache, normalize_query, component_state, STALE, MISSING
+from utils import get_query_dir, Deadline
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Latency budget for a whole search, and for each stage within it (seconds, 0 = no limit)
+SEARCH_BUDGET = float(os.getenv('SEARCH_BUDGET', '240'))
+STAGE_BUDGETS = {
+    'ratings': float(os.getenv('RATINGS_BUDGET', '45')),
+    'summary': float(os.getenv('SUMMARY_BUDGET', '30')),
+    'youtube': float(os.getenv('YOUTUBE_SEARCH_BUDGET', '15')),
+    'tiktok': float(os.getenv('TIKTOK_SEARCH_BUDGET', '15')),
+    'video_processing': float(os.getenv('VIDEO_PROCESSING_BUDGET', '150')),
+    'review_generation': float(os.getenv('REVIEW_GENERATION_BUDGET', '90')),
+}
+
+# Stages run here so a caller can stop waiting on them; late results still finish
+STAGE_WORKERS = int(os.getenv('STAGE_WORKERS', '32'))
+_stage_pool = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix='stage')
+
+class StageTimeout(TimeoutError):
+    """Raised when a stage misses its deadline."""
+
+def run_stage(name, deadline, fn, *args, on_late=None, **kwargs):
+    """
+    Run a stage function, giving up on it when its deadline passes.
+
+    Args:
+        name (str): Stage name, for logging
+        deadline (Deadline): Deadline for the stage
+        fn (callable): Stage function
+        on_late (callable): Called with the result if the stage finishes
+            successfully after its deadline (optional)
+
+    Returns:
+        The stage function's result
+
+    Raises:
+        StageTimeout: If the deadline passed first
+    """
+    future = _stage_pool.submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except TimeoutError:
+        logger.warning(f'Stage {name} missed its deadline')
+        if on_late:
+            future.add_done_callback(lambda f: f.exception() is None and on_late(f.result()))
+        raise StageTimeout(name)
+
+def stage_deadline(name, parent):
+    """
+    Get the deadline for a stage starting now.
+
+    Args:
+        name (str): Stage name (a key of STAGE_BUDGETS)
+        parent (Deadline): Deadline of the whole search
+
+    Returns:
+        Deadline: The stage budget, capped by the search deadline
+    """
+    return Deadline(STAGE_BUDGETS.get(name), parent=parent)
+
+def fetch_ratings(query):
+    """
+    Get the aggregated rating and product images.
+
+    Args:
+        query (str): Product search query
+
+    Returns:
+        dict: total_reviews, weighted_avg_rating, img_urls and error
+    """
+    # Answer from the product index when it has a fresh match, otherwise scrape
+    logger.info(f'Searching for product: {query}')
+    ratings = get_indexed_reviews(query) or get_product_reviews(query)
+
+    # Process image URLs
+    if ratings.get('img_urls'):
+        logger.info(f'Found {len(ratings["img_urls"])} images')
+        valid_urls = [url for url in ratings['img_urls'] if url.startswith(('http://', 'https://'))]
+        ratings['img_urls'] = valid_urls
+        logger.info(f'Found {len(valid_urls)} valid images')
+
+    return ratings
+
+def fetch_summary(query, ratings):
+    """
+    Get the LLM-written review summary.
+
+    Args:
+        query (str): Product search query
+        ratings (dict): Result of fetch_ratings
+
+    Returns:
+        str: Summary text or None if it could not be generated
+    """
+    summary_result = get_review_summary(query, ratings)
+    if summary_result['error']:
+        logger.warning(f'Error getting review summary: {summary_result["error"]}')
+        return None
+
+    logger.info('Successfully retrieved review summary')
+    logger.info(f'Review summary: {summary_result["summary"]}')
+    return summary_result['summary']
+
+def iter_video_reviews(query, deadline=None, missing=None):
+    """
+    Find, transcribe and turn YouTube/TikTok review videos into written reviews,
+    yielding each review as soon as it has been generated.
+
+    Both platform searches start at once, and each platform's videos start
+    processing as soon as its own search returns.
+
+    Args:
+        query (str): Product search query
+        deadline (Deadline): Deadline for the whole search (optional)
+        missing (list): Names of stages that missed their deadline are
+            appended here (optional)
+
+    Yields:
+        dict: Generated review, or raw transcribed video if generation failed
+    """
+    deadline = deadline or Deadline()
+    missing = [] if missing is None else missing
+
+    # Create directory for this search query
+    query_dir = get_query_dir(query)
+
+    # Fetch an oversampled, metadata-only candidate pool from each platform
+    searches = {
+        _stage_pool.submit(
+            search_youtube_videos, query, max_results=pool_size('youtube'), query_dir=query_dir
+        ): ('youtube', stage_deadline('youtube', deadline)),
+        _stage_pool.submit(
+            search_tiktok_videos, query, max_results=pool_size('tiktok')
+        ): ('tiktok', stage_deadline('tiktok', deadline)),
+    }
+
+    # Download and transcribe each platform's best candidates as soon as its search returns
+    processing = {}
+    while searches:
+        remaining = [d.remaining() for _, d in searches.values() if d.remaining() is not None]
+        timeout = min(remaining) if remaining else None
+        done, _ = wait(searches, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            platform, _ = searches.pop(future)
+            try:
+                videos = future.result() or []
+            except Exception as e:
+                logger.error(f'Error searching {platform} videos: {str(e)}')
+                videos = []
+            processing_deadline = stage_deadline('video_processing', deadline)
+            candidates = rank_candidates([(platform, video) for video in videos], query)
+            processing[platform] = (
+                _stage_pool.submit(
+                    process_ranked_videos, candidates, query_dir,
+                    {platform: VIDEO_TARGETS[platform]}, deadline=processing_deadline
+                ),
+                processing_deadline
+            )
+        for future, (platform, search_deadline) in list(searches.items()):
+            if search_deadline.expired():
+                logger.warning(f'Stage {platform} missed its deadline')
+                missing.append(platform)
+                del searches[future]
+
+    all_reviews = []
+    for platform in ('youtube', 'tiktok'):
+        if platform in processing:
+            future, processing_deadline = processing[platform]
+            all_reviews += future.result()
+            if processing_deadline.expired() and 'video_processing' not in missing:
+                missing.append('video_processing')
+
+    # Generate reviews from all videos
+    if not all_reviews:
+        return
+
+    logger.info('Generating reviews from transcripts...')
+    # Only the videos that finished: stragglers may still be writing into query_dir
+    video_dirs = [review.pop('video_dir') for review in all_reviews]
+    generation_deadline = stage_deadline('review_generation', deadline)
+    generated = 0
+    for review in iter_query_directory(
+        str(query_dir), query=query, deadline=generation_deadline, video_dirs=video_dirs
+    ):
+        generated += 1
+        yield review
+    if generation_deadline.expired():
+        missing.append('review_generation')
+
+    if generated:
+        logger.info(f'Generated {generated} reviews')
+        return
+
+    logger.warning('No reviews were generated from the transcript')
+    yield from all_reviews
+
+def fetch_video_reviews(query):
+    """
+    Find, transcribe and turn YouTube/TikTok review videos into written reviews.
+
+    Args:
+        query (str): Product search query
+
+    Returns:
+        list: Generated reviews, or raw transcribed videos if generation failed
+    """
+    return list(iter_video_reviews(query))
+
+def build_results(ratings, summary, reviews):
+    """
+    Combine stage outputs into the results dict used by the views.
+
+    Args:
+        ratings (dict): Result of fetch_ratings
+        summary (str): Result of fetch_summary
+        reviews (list): Result of fetch_video_reviews
+
+    Returns:
+        dict: Search results
+    """
+    results = dict(ratings)
+    if summary:
+        results['summary'] = summary
+    if reviews:
+        results['reviews'] = reviews
+    return results
+
+def run_search(query):
+    """
+    Run every stage of the search pipeline without the cache.
+
+    Args:
+        query (str): Product search query
+
+    Returns:
+        dict: Search results
+    """
+    # Only the summary depends on another stage (ratings)
+    reviews = _stage_pool.submit(fetch_video_reviews, query)
+    ratings = fetch_ratings(query)
+    summary = fetch_summary(query, ratings)
+    return build_results(ratings, summary, reviews.result())
+
+# Stages currently being refreshed in the background, as (key, stage) pairs
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def store_component(key, name, value):
+    """
+    Cache a stage result for a query, skipping failed or empty results so
+    they are retried on the next search.
+
+    Args:
+        key (str): Normalized query
+        name (str): Stage name
+        value: Stage result
+    """
+    if name == 'ratings' and value.get('error'):
+        return
+    if not value:
+        return
+    result_cache.set_component(key, name, value)
+
+def _refresh(query, key, names, ratings):
+    try:
+        if 'ratings' in names:
+            ratings = fetch_ratings(query)
+            store_component(key, 'ratings', ratings)
+        if 'summary' in names:
+            store_component(key, 'summary', fetch_summary(query, ratings))
+        if 'video_reviews' in names:
+            store_component(key, 'video_reviews', fetch_video_reviews(query))
+    except Exception as e:
+        logger.error(f'Error refreshing cached results for "{key}": {str(e)}')
+    finally:
+        with _refreshing_lock:
+            _refreshing.difference_update((key, name) for name in names)
+
+def schedule_refresh(query, key, names, ratings):
+    """
+    Recompute stale stages in a background thread, at most once at a time per stage.
+
+    Args:
+        query (str): Product search query
+        key (str): Normalized query
+        names (list): Stage names to refresh
+        ratings (dict): Cached ratings, used for the summary if ratings aren't refreshed
+    """
+    with _refreshing_lock:
+        names = [name for name in names if (key, name) not in _refreshing]
+        _refreshing.update((key, name) for name in names)
+    if not names:
+        return
+
+    logger.info(f'Refreshing stale cached results for "{key}": {", ".join(names)}')
+    threading.Thread(
+        target=_refresh,
+        args=(query, key, names, ratings),
+        name=f'refresh-{key}',
+        daemon=True
+    ).start()
+
+def _prefetch(iterable, name):
+    """
+    Start consuming an iterable in a background thread right away.
+
+    Args:
+        iterable: Iterable to consume (typically a generator)
+        name (str): Thread name
+
+    Returns:
+        generator: Yields the iterable's items as they arrive, re-raising
+            any exception it raised
+    """
+    items = queue.Queue()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put((True, item))
+            items.put((False, None))
+        except Exception as e:
+            items.put((False, e))
+
+    threading.Thread(target=produce, name=name, daemon=True).start()
+
+    def consume():
+        while True:
+            has_item, item = items.get()
+            if not has_item:
+                if item is not None:
+                    raise item
+                return
+            yield item
+
+    return consume()
+
+class SearchPlan:
+    """
+    The cache-driven state of one search: which stages to compute, their
+    results so far and the stages that missed their deadline.
+
+    Both pipelines (iter_search here and async_pipeline.iter_search) drive
+    the same plan and differ only in how they run stages, so caching,
+    stale-while-revalidate and the deferred summary refresh can't drift
+    apart between them.
+    """
+
+    STAGES = ('ratings', 'summary', 'video_reviews')
+
+    def __init__(self, query, entry, store=None):
+        """
+        Classify the cached stages and start refreshing stale ones.
+
+        Args:
+            query (str): Product search query
+            entry (dict): result_cache entry for the query, or None
+            store (callable): Called with (name, value) to cache a stage
+                result (default: store_component, in the calling thread)
+        """
+        self.query = query
+        self.key = normalize_query(query)
+        self.store = store or (lambda name, value: store_component(self.key, name, value))
+        self.missing = []
+        self.states = {name: component_state(entry, name) for name in self.STAGES}
+        self.values = {
+            name: entry['components'][name]['value']
+            for name, state in self.states.items() if state != MISSING
+        }
+        logger.info(f'Result cache state for "{self.key}": {self.states}')
+
+        stale = [name for name, state in self.states.items() if state == STALE]
+        # The summary is rebuilt from the ratings: if they have expired, wait until they are fetched
+        self._deferred_summary = 'summary' in stale and self.states['ratings'] == MISSING
+        if self._deferred_summary:
+            stale.remove('summary')
+        if stale:
+            schedule_refresh(query, self.key, stale, self.values.get('ratings'))
+
+    def needs(self, name):
+        """
+        Tell whether a stage has to be computed for this search.
+
+        Args:
+            name (str): Stage name
+
+        Returns:
+            bool: True if nothing usable is cached for it
+        """
+        return self.states[name] == MISSING
+
+    def summary_blocked(self):
+        """
+        Tell whether the summary can't be computed: its prompt is built
+        around the ratings, which missed their deadline.
+
+        Returns:
+            bool: True if the ratings missed their deadline
+        """
+        return 'ratings' in self.missing
+
+    def complete(self, name, value):
+        """
+        Record and cache a stage's result.
+
+        Args:
+            name (str): 'ratings' or 'summary'
+            value: Stage result
+        """
+        self.values[name] = value
+        self.store(name, value)
+        if name == 'ratings' and self._deferred_summary:
+            schedule_refresh(self.query, self.key, ['summary'], value)
+
+    def late(self, name):
+        """
+        Get the on_late callback that caches a stage's result after its deadline.
+
+        Args:
+            name (str): Stage name
+
+        Returns:
+            callable: Takes the late result
+        """
+        return lambda value: self.store(name, value)
+
+    def miss(self, name):
+        """
+        Record a stage that missed its deadline, or couldn't run.
+
+        Args:
+            name (str): 'ratings' or 'summary'
+        """
+        self.missing.append(name)
+        self.values[name] = None
+        if name == 'ratings':
+            self.values['ratings'] = {
+                'total_reviews': 0,
+                'weighted_avg_rating': 0,
+                'img_urls': [],
+                # Flagged through 'missing' so the rest of the results still render
+                'error': None
+            }
+
+    def complete_reviews(self, reviews, video_missing):
+        """
+        Record the reviews of the video branch.
+
+        Args:
+            reviews (list): Reviews the branch yielded
+            video_missing (list): Video stages that missed their deadline
+        """
+        self.values['video_reviews'] = reviews
+        # Partial review lists aren't cached, so the next search completes them
+        if video_missing:
+            self.missing.extend(video_missing)
+        else:
+            self.store('video_reviews', reviews)
+
+    def done(self):
+        """
+        Get the payload of the final event.
+
+        Returns:
+            dict: 'missing', the stages that missed their deadline
+        """
+        if self.missing:
+            logger.warning(f'Search for "{self.key}" returned partial results; missing: {", ".join(self.missing)}')
+        return {'missing': self.missing}
+
+def iter_search(query, budget=None):
+    """
+    Run the search pipeline through the query cache, yielding each part of the
+    results as soon as it is available.
+
+    Stale stages are served immediately and refreshed in a background
+    thread (stale-while-revalidate). Missing stages are computed as a
+    dependency graph: the video branch runs alongside ratings and only
+    the summary waits for ratings. Each stage has its own deadline
+    (STAGE_BUDGETS) and the whole search stays within budget. A stage that
+    misses its deadline is left out and named in the final event. Ratings
+    and summaries that finish late are still cached. The bookkeeping is
+    SearchPlan's.
+
+    Args:
+        query (str): Product search query
+        budget (float): Latency budget in seconds (default: SEARCH_BUDGET)
+
+    Yields:
+        tuple: (event, data) pairs, in order:
+            ('ratings', dict) with total_reviews, weighted_avg_rating, img_urls and error,
+            ('summary', str or None),
+            ('review', dict) once per review,
+            ('done', dict) with 'missing', the stages that missed their deadline
+    """
+    deadline = Deadline(SEARCH_BUDGET if budget is None else budget)
+    record_query(query)
+    plan = SearchPlan(query, result_cache.get(normalize_query(query)))
+
+    # The video branch doesn't depend on ratings, so it starts first and runs alongside them
+    if plan.needs('video_reviews'):
+        video_missing = []
+        video_reviews = _prefetch(
+            iter_video_reviews(query, deadline=deadline, missing=video_missing),
+            name=f'video-reviews-{plan.key}'
+        )
+
+    if plan.needs('ratings'):
+        try:
+            plan.complete('ratings', run_stage(
+                'ratings', stage_deadline('ratings', deadline), fetch_ratings, query,
+                on_late=plan.late('ratings')
+            ))
+        except StageTimeout:
+            plan.miss('ratings')
+    yield 'ratings', plan.values['ratings']
+
+    if plan.needs('summary'):
+        if plan.summary_blocked():
+            plan.miss('summary')
+        else:
+            try:
+                plan.complete('summary', run_stage(
+                    'summary', stage_deadline('summary', deadline), fetch_summary, query, plan.values['ratings'],
+                    on_late=plan.late('summary')
+                ))
+            except StageTimeout:
+                plan.miss('summary')
+    yield 'summary', plan.values['summary']
+
+    if plan.needs('video_reviews'):
+        reviews = []
+        for review in video_reviews:
+            reviews.append(review)
+            yield 'review', review
+        plan.complete_reviews(reviews, video_missing)
+    else:
+        for review in plan.values['video_reviews']:
+            yield 'review', review
+
+    yield 'done', plan.done()
+
+def cached_search(query, on_event=None):
+    """
+    Serve search results from the query cache, computing only what is missing.
+
+    Args:
+        query (str): Product search query
+        on_event (callable): Called with each (event, data) pair from
+            iter_search as it happens (optional)
+
+    Returns:
+        dict: Search results, with 'missing' listing any stages that
+            missed their deadline
+    """
+    ratings, summary, reviews, missing = {}, None, [], []
+    for event, data in iter_search(query):
+        if on_event:
+            on_event(event, data)
+        if event == 'ratings':
+            ratings = data
+        elif event == 'summary':
+            summary = data
+        elif event == 'review':
+            reviews.append(data)
+        elif event == 'done':
+            missing = data['missing']
+
+    results = build_results(ratings, summary, reviews)
+    if missing:
+        results['missing'] = missing
+    return results
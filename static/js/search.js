@@ -2,154 +2,319 @@ document.addEventListener('DOMContentLoaded', function() {
     const searchForm = document.getElementById('search-form');
     const loadingOverlay = document.getElementById('loading-overlay');
     const loadingText = document.querySelector('.loader p');
-    
-    searchForm.addEventListener('submit', async function(e) {
-        e.preventDefault();
-        const query = document.getElementById('product-search').value;
-        
-        try {
-            // Show loading overlay
-            loadingOverlay.classList.add('visible');
-            loadingText.textContent = 'Searching for reviews...';
-            
-            // Show processing message
-            loadingText.textContent = 'Analyzing reviews...';
-            
-            // Make the request with AJAX header
-            const response = await fetch(`/search?product=${encodeURIComponent(query)}`, {
-                headers: {
-                    'X-Requested-With': 'XMLHttpRequest'
-                }
-            });
-            
-            const data = await response.json();
-            
-            if (data.status === 'success') {
-                // Hide loading overlay
-                loadingOverlay.classList.remove('visible');
-                
-                // Update URL without reloading
-                window.history.pushState({}, '', `/search?product=${encodeURIComponent(query)}`);
-                
-                // Update page content
-                document.body.innerHTML = `
-                    <div class="container">
-                        <header class="header results-header-position">
-                            <a href="/" class="logo">
-                                <h1>Revi</h1>
-                            </a>
-                        </header>
-                        
-                        <main class="results-section">
-                        <div class="results-header">
-                            <div class="results-summary">
-                                <div class="product-info">
-                                    ${data.img_urls && data.img_urls.length > 0 ? `
-                                        <div class="product-image-container">
-                                            <img
-                                                src="${data.img_urls[0]}"
-                                                alt="${query} - Image"
-                                                class="product-image"
-                                                id="productImage"
-                                            />
-                                        </div>
-                                    ` : ''}
-                                    <h3 class="product-name">${query}</h3>
+
+    function renderStars(rating) {
+        return Array(5).fill().map((_, i) => {
+            if (rating - i >= 1) return '<i class="fas fa-star"></i>';
+            if (rating - i > 0) return '<i class="fas fa-star-half-alt"></i>';
+            return '<i class="far fa-star"></i>';
+        }).join('');
+    }
+
+    function renderReview(review) {
+        return `
+            <div class="review-card">
+                <div class="review-header">
+                    <div class="review-rating">
+                        ${Array(5).fill().map((_, i) =>
+                            i < Math.round(review.rating) ?
+                            '<i class="fas fa-star"></i>' :
+                            '<i class="far fa-star"></i>'
+                        ).join('')}
+                    </div>
+                    <a href="${review.video_url}" target="_blank" class="${review.platform}-link">
+                        <i class="fab fa-${review.platform}"></i>
+                        <span>Watch on ${review.platform}</span>
+                    </a>
+                </div>
+                <div class="review-content">
+                    <p>${review.review_text}</p>
+                </div>
+                <div class="review-source">
+                    <i class="fas fa-user"></i>
+                    <span>${review.channel || 'YouTube Creator'}</span>
+                </div>
+            </div>
+        `;
+    }
+
+    function renderResultsPage(query, data) {
+        document.body.innerHTML = `
+            <div class="container">
+                <header class="header results-header-position">
+                    <a href="/" class="logo">
+                        <h1>Revi</h1>
+                    </a>
+                </header>
+
+                <main class="results-section">
+                <div class="results-header">
+                    <div class="results-summary">
+                        <div class="product-info">
+                            ${data.img_urls && data.img_urls.length > 0 ? `
+                                <div class="product-image-container">
+                                    <img
+                                        src="${data.img_urls[0]}"
+                                        alt="${query} - Image"
+                                        class="product-image"
+                                        id="productImage"
+                                    />
                                 </div>
-                                
-                                <div class="rating-card">
-                                    <div class="rating-header">
-                                        <div class="stars">
-                                            ${Array(5).fill().map((_, i) => {
-                                                const rating = data.weighted_avg_rating;
-                                                if (rating - i >= 1) return '<i class="fas fa-star"></i>';
-                                                if (rating - i > 0) return '<i class="fas fa-star-half-alt"></i>';
-                                                return '<i class="far fa-star"></i>';
-                                            }).join('')}
-                                        </div>
-                                        <div class="rating-number">${data.weighted_avg_rating.toFixed(1)}</div>
-                                        <br/>
-                                        <div class="stat-item">
-                                            <span class="stat-value">${data.total_reviews.toLocaleString()}</span>
-                                            <span class="stat-label">&nbsp;&nbsp;Reviews</span>
-                                        </div>
-                                    </div>
-                                    
-                                    <div class="rating-stats">
-                                        ${data.summary ? `
-                                            <p class="summary-text">${data.summary}</p>
-                                        ` : ''}
-                                    </div>
+                            ` : ''}
+                            <h3 class="product-name">${query}</h3>
+                        </div>
+
+                        <div class="rating-card">
+                            <div class="rating-header">
+                                <div class="stars">
+                                    ${renderStars(data.weighted_avg_rating)}
+                                </div>
+                                <div class="rating-number">${data.weighted_avg_rating.toFixed(1)}</div>
+                                <br/>
+                                <div class="stat-item">
+                                    <span class="stat-value">${data.total_reviews.toLocaleString()}</span>
+                                    <span class="stat-label">&nbsp;&nbsp;Reviews</span>
                                 </div>
                             </div>
-                        </div>
-                        
-                        <div class="youtube-reviews">
-                            <div class="reviews-grid">
-                                ${data.reviews.map(review => `
-                                    <div class="review-card">
-                                        <div class="review-header">
-                                            <div class="review-rating">
-                                                ${Array(5).fill().map((_, i) => 
-                                                    i < Math.round(review.rating) ? 
-                                                    '<i class="fas fa-star"></i>' : 
-                                                    '<i class="far fa-star"></i>'
-                                                ).join('')}
-                                            </div>
-                                            <a href="${review.video_url}" target="_blank" class="${review.platform}-link">
-                                                <i class="fab fa-${review.platform}"></i>
-                                                <span>Watch on ${review.platform}</span>
-                                            </a>
-                                        </div>
-                                        <div class="review-content">
-                                            <p>${review.review_text}</p>
-                                        </div>
-                                        <div class="review-source">
-                                            <i class="fas fa-user"></i>
-                                            <span>${review.channel || 'YouTube Creator'}</span>
-                                        </div>
-                                    </div>
-                                `).join('')}
+
+                            <div class="rating-stats" id="rating-stats">
+                                <p class="summary-text summary-pending">Summarizing reviews...</p>
                             </div>
                         </div>
                     </div>
-                        </main>
-                        
-                        <div class="search-again-container">
-                            <a href="/" class="search-again-button">
-                                <i class="fas fa-search"></i>
-                                Search Again
-                            </a>
-                        </div>
-                        
-                        <footer class="footer">
-                            <p>TreeHacks 2025 | Made by Henry Bloom & Alexis Fry</p>
-                        </footer>
-                    </div>
-                    
-                    <div id="loading-overlay" class="loading-overlay">
-                        <div class="loader">
-                            <div class="spinner"></div>
-                            <div id="loading-text" class="loading-text">Loading...</div>
-                        </div>
-                    </div>
-                `;
-            } else {
-                throw new Error(data.message || 'Error processing request');
-            }
-            
-        } catch (error) {
-            console.error('Search error:', error);
-            loadingOverlay.classList.remove('visible');
-            
-            // Show error message
-            const mainContent = document.querySelector('main');
-            mainContent.innerHTML = `
-                <div class="error-message">
-                    <h2>Error</h2>
-                    <p>${error.message || 'An error occurred while processing your request'}</p>
                 </div>
-            `;
+
+                <div class="youtube-reviews">
+                    <div class="reviews-grid" id="reviews-grid"></div>
+                    <p class="reviews-pending" id="reviews-pending">
+                        <i class="fas fa-spinner fa-spin"></i>
+                        Watching video reviews...
+                    </p>
+                </div>
+            </div>
+                </main>
+
+                <div class="search-again-container">
+                    <a href="/" class="search-again-button">
+                        <i class="fas fa-search"></i>
+                        Search Again
+                    </a>
+                </div>
+
+                <footer class="footer">
+                    <p>TreeHacks 2025 | Made by Henry Bloom & Alexis Fry</p>
+                </footer>
+            </div>
+
+            <div id="loading-overlay" class="loading-overlay">
+                <div class="loader">
+                    <div class="spinner"></div>
+                    <div id="loading-text" class="loading-text">Loading...</div>
+                </div>
+            </div>
+        `;
+    }
+
+    function showError(message) {
+        loadingOverlay.classList.remove('visible');
+
+        // Show error message
+        const mainContent = document.querySelector('main');
+        mainContent.innerHTML = `
+            <div class="error-message">
+                <h2>Error</h2>
+                <p>${message || 'An error occurred while processing your request'}</p>
+            </div>
+        `;
+    }
+
+    // Suggestions as the user types, from /suggest
+    const searchInput = document.getElementById('product-search');
+    const suggestionList = document.getElementById('search-suggestions');
+    const SUGGEST_DEBOUNCE_MS = 150;
+    let suggestTimer = null;
+    let suggestController = null;
+    let activeSuggestion = -1;
+
+    function hideSuggestions() {
+        suggestionList.classList.remove('visible');
+        suggestionList.innerHTML = '';
+        activeSuggestion = -1;
+    }
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function showSuggestions(suggestions) {
+        activeSuggestion = -1;
+        if (!suggestions.length) {
+            hideSuggestions();
+            return;
         }
+        suggestionList.innerHTML = suggestions.map(suggestion =>
+            `<li role="option">${escapeHtml(suggestion)}</li>`
+        ).join('');
+        suggestionList.classList.add('visible');
+    }
+
+    function highlightSuggestion(index) {
+        const items = suggestionList.querySelectorAll('li');
+        items.forEach((item, i) => item.classList.toggle('active', i === index));
+        activeSuggestion = index;
+    }
+
+    function chooseSuggestion(text) {
+        searchInput.value = text;
+        hideSuggestions();
+        searchForm.requestSubmit();
+    }
+
+    function fetchSuggestions(prefix) {
+        // Only the latest keystroke's request matters
+        if (suggestController) {
+            suggestController.abort();
+        }
+        suggestController = new AbortController();
+        fetch(`/suggest?q=${encodeURIComponent(prefix)}`, { signal: suggestController.signal })
+            .then(response => response.json())
+            .then(data => {
+                if (searchInput.value === prefix) {
+                    showSuggestions(data.suggestions || []);
+                }
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error('Suggest error:', error);
+                }
+            });
+    }
+
+    if (searchInput && suggestionList) {
+        searchInput.addEventListener('input', function() {
+            clearTimeout(suggestTimer);
+            const prefix = searchInput.value;
+            if (prefix.trim().length < 2) {
+                hideSuggestions();
+                return;
+            }
+            suggestTimer = setTimeout(() => fetchSuggestions(prefix), SUGGEST_DEBOUNCE_MS);
+        });
+
+        searchInput.addEventListener('keydown', function(e) {
+            const items = suggestionList.querySelectorAll('li');
+            if (!items.length) return;
+            if (e.key === 'ArrowDown') {
+                e.preventDefault();
+                highlightSuggestion((activeSuggestion + 1) % items.length);
+            } else if (e.key === 'ArrowUp') {
+                e.preventDefault();
+                highlightSuggestion((activeSuggestion - 1 + items.length) % items.length);
+            } else if (e.key === 'Enter' && activeSuggestion >= 0) {
+                e.preventDefault();
+                chooseSuggestion(items[activeSuggestion].textContent);
+            } else if (e.key === 'Escape') {
+                hideSuggestions();
+            }
+        });
+
+        // mousedown fires before the input loses focus
+        suggestionList.addEventListener('mousedown', function(e) {
+            const item = e.target.closest('li');
+            if (item) {
+                e.preventDefault();
+                chooseSuggestion(item.textContent);
+            }
+        });
+
+        searchInput.addEventListener('blur', hideSuggestions);
+    }
+
+    searchForm.addEventListener('submit', function(e) {
+        e.preventDefault();
+        clearTimeout(suggestTimer);
+        if (suggestionList) {
+            hideSuggestions();
+        }
+        const query = document.getElementById('product-search').value;
+
+        // Show loading overlay until the first part of the results arrives
+        loadingOverlay.classList.add('visible');
+        loadingText.textContent = 'Analyzing reviews...';
+
+        const source = new EventSource(`/search/stream?product=${encodeURIComponent(query)}`);
+        let rendered = false;
+
+        source.addEventListener('ratings', function(event) {
+            const data = JSON.parse(event.data);
+
+            // Hide loading overlay
+            loadingOverlay.classList.remove('visible');
+
+            // Update URL without reloading
+            window.history.pushState({}, '', `/search?product=${encodeURIComponent(query)}`);
+
+            renderResultsPage(query, data);
+            rendered = true;
+        });
+
+        source.addEventListener('summary', function(event) {
+            const data = JSON.parse(event.data);
+            const ratingStats = document.getElementById('rating-stats');
+            if (ratingStats) {
+                ratingStats.innerHTML = data.summary ? `
+                    <p class="summary-text">${data.summary}</p>
+                ` : '';
+            }
+        });
+
+        source.addEventListener('review', function(event) {
+            const review = JSON.parse(event.data);
+            const grid = document.getElementById('reviews-grid');
+            if (grid) {
+                grid.insertAdjacentHTML('beforeend', renderReview(review));
+            }
+        });
+
+        source.addEventListener('done', function(event) {
+            source.close();
+            const data = JSON.parse(event.data);
+            const pending = document.getElementById('reviews-pending');
+            if (pending) {
+                const grid = document.getElementById('reviews-grid');
+                if (grid && grid.children.length === 0) {
+                    pending.textContent = 'No video reviews found.';
+                } else {
+                    pending.remove();
+                }
+            }
+            if (data && data.missing && data.missing.length) {
+                const header = document.querySelector('.results-header');
+                if (header) {
+                    header.insertAdjacentHTML('beforeend', `
+                        <div class="partial-notice">Some sources took too long to respond, so these results are incomplete.</div>
+                    `);
+                }
+            }
+        });
+
+        source.addEventListener('error', function(event) {
+            source.close();
+            console.error('Search error:', event);
+            let message;
+            if (event.data) {
+                message = JSON.parse(event.data).error;
+            }
+            if (!rendered) {
+                showError(message);
+            } else {
+                const pending = document.getElementById('reviews-pending');
+                if (pending) {
+                    pending.textContent = message || 'Some results could not be loaded.';
+                }
+            }
+        });
     });
 });
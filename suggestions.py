@@ -0,0 +1,212 @@
+"""
+Search-as-you-type suggestions from an in-memory prefix index.
+
+Suggestions are canonical product names: the normalized searches that
+found products in the product index, and past queries with cached results
+once they have been searched SUGGEST_MIN_SEARCHES times. Merchant listing
+titles are never suggested. A past query and the indexed search it
+normalizes to are one suggestion, ranked by both how often it was searched
+and how many reviews its products have. Each suggestion is indexed under
+every word it contains, in a sorted array, so a lookup is two bisections
+plus a scan of the matches. The index is rebuilt in the background every
+SUGGEST_REFRESH_INTERVAL seconds. Searches are counted in SQLite so that
+worker processes and web processes share the counts.
+"""
+
+import os
+import math
+import time
+import heapq
+import sqlite3
+import logging
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from result_cache import result_cache, normalize_query
+import product_index
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.getenv('SUGGEST_DB_PATH', 'cache/suggestions.sqlite3'))
+SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', '8'))
+# Shorter prefixes match too much of the index to be useful
+MIN_PREFIX = int(os.getenv('SUGGEST_MIN_PREFIX', '2'))
+REFRESH_INTERVAL = int(os.getenv('SUGGEST_REFRESH_INTERVAL', '300'))
+# Most product names taken from the product index
+MAX_PRODUCTS = int(os.getenv('SUGGEST_MAX_PRODUCTS', '20000'))
+# Searches a past query needs before it is suggested, unless it found indexed products
+MIN_SEARCHES = int(os.getenv('SUGGEST_MIN_SEARCHES', '2'))
+# A past query's score per doubling of its search count, against log10(reviews) for products
+QUERY_WEIGHT = float(os.getenv('SUGGEST_QUERY_WEIGHT', '4'))
+
+def _connect():
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS searches (
+            query_key TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            last_searched_at REAL NOT NULL
+        )
+    ''')
+    return conn
+
+def record_query(query):
+    """
+    Count a search towards its query's popularity.
+
+    Args:
+        query (str): Product search query
+    """
+    key = normalize_query(query)
+    if not key:
+        return
+    try:
+        conn = _connect()
+        try:
+            conn.execute('''
+                INSERT INTO searches (query_key, count, last_searched_at) VALUES (?, 1, ?)
+                ON CONFLICT (query_key) DO UPDATE SET count = count + 1, last_searched_at = excluded.last_searched_at
+            ''', (key, time.time()))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # Popularity is best-effort: never fail a search over it
+        logger.warning(f'Error recording search for suggestions: {str(e)}')
+
+def _search_counts():
+    conn = _connect()
+    try:
+        return {row['query_key']: row['count'] for row in conn.execute('SELECT query_key, count FROM searches')}
+    finally:
+        conn.close()
+
+class PrefixIndex:
+    """
+    Immutable sorted-array prefix index over scored suggestions.
+    """
+
+    def __init__(self, suggestions=()):
+        """
+        Args:
+            suggestions: (text, score) pairs. Texts that normalize to the
+                same key are merged, keeping the best-scored text
+        """
+        best = {}
+        for text, score in suggestions:
+            key = normalize_query(text)
+            if key and (key not in best or score > best[key][1]):
+                best[key] = (text, score)
+
+        entries = []
+        for key, (text, score) in best.items():
+            words = key.split()
+            # Indexed from every word, so "airwrap" finds "dyson airwrap"
+            for i in range(len(words)):
+                entries.append((' '.join(words[i:]), i == 0, score, text))
+        entries.sort(key=lambda entry: entry[0])
+
+        self._keys = [entry[0] for entry in entries]
+        self._entries = [entry[1:] for entry in entries]
+        self.size = len(best)
+
+    def lookup(self, prefix, limit=SUGGEST_LIMIT):
+        """
+        Find the best suggestions starting with a prefix.
+
+        Args:
+            prefix (str): What the user has typed so far
+            limit (int): Most suggestions to return
+
+        Returns:
+            list: Suggestion texts, those starting with the prefix before
+                those with a later word matching it, then most popular first
+        """
+        prefix = normalize_query(prefix)
+        if len(prefix) < MIN_PREFIX:
+            return []
+
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + '\uffff', lo)
+        # A suggestion can match from several of its words; keep its best match
+        matches = {}
+        for starts, score, text in self._entries[lo:hi]:
+            rank = (starts, score)
+            if text not in matches or rank > matches[text]:
+                matches[text] = rank
+        return heapq.nlargest(limit, matches, key=matches.get)
+
+_index = PrefixIndex()
+_built_at = 0.0
+_lock = threading.Lock()
+_building = False
+
+def build_index():
+    """
+    Build a prefix index from cached queries and indexed products.
+
+    Returns:
+        PrefixIndex: The new index
+    """
+    reviews = dict(product_index.popular_queries(MAX_PRODUCTS))
+    # Past queries by canonical name, so "Samsung Galaxy S24!" counts towards "samsung galaxy s24"
+    searches = {}
+    search_counts = _search_counts()
+    for query in result_cache.queries():
+        name = product_index.query_key(query)
+        if name:
+            searches[name] = searches.get(name, 0) + search_counts.get(query, 0)
+
+    suggestions = []
+    for name in reviews.keys() | searches.keys():
+        count = searches.get(name, 0)
+        # A one-off search is likely a typo or an odd phrasing: wait until it finds products or recurs
+        if name not in reviews and count < MIN_SEARCHES:
+            continue
+        score = QUERY_WEIGHT * math.log2(1 + count) + math.log10(1 + reviews.get(name, 0))
+        suggestions.append((name, score))
+    return PrefixIndex(suggestions)
+
+def rebuild():
+    """
+    Rebuild the shared prefix index, keeping the old one if the build fails.
+    """
+    global _index, _built_at, _building
+    started = time.perf_counter()
+    try:
+        index = build_index()
+        _index = index
+        logger.info(f'Built suggestion index of {index.size} entries in {time.perf_counter() - started:.2f}s')
+    except Exception as e:
+        logger.warning(f'Error building suggestion index: {str(e)}')
+    finally:
+        with _lock:
+            _built_at = time.time()
+            _building = False
+
+def _refresh_if_stale():
+    global _building
+    with _lock:
+        if _building or time.time() - _built_at < REFRESH_INTERVAL:
+            return
+        _building = True
+    # Lookups keep using the current index while the new one is built
+    threading.Thread(target=rebuild, name='suggest-rebuild', daemon=True).start()
+
+def suggest(prefix, limit=SUGGEST_LIMIT):
+    """
+    Get suggestions for a partially typed query.
+
+    Args:
+        prefix (str): What the user has typed so far
+        limit (int): Most suggestions to return
+
+    Returns:
+        list: Suggestion texts, best first
+    """
+    _refresh_if_stale()
+    return _index.lookup(prefix, limit)
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+import job_queue
+
+@pytest.fixture(autouse=True)
+def jobs_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'DB_PATH', tmp_path / 'jobs.sqlite3')
+
+def age(job_id, seconds):
+    conn = job_queue._connect()
+    try:
+        conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (time.time() - seconds, job_id))
+    finally:
+        conn.close()
+
+def test_identical_in_flight_searches_share_a_job():
+    job_id = job_queue.enqueue('Sony WH-1000XM5')
+    assert job_queue.enqueue('sony wh-1000xm5!') == job_id
+    assert job_queue.enqueue('sony wh-1000xm4') != job_id
+
+    assert job_queue.claim_next()['id'] == job_id
+    assert job_queue.enqueue('Sony WH-1000XM5') == job_id
+
+def test_finished_searches_are_not_joined():
+    job_id = job_queue.enqueue('iphone 14')
+    job_queue.claim_next()
+    job_queue.finish(job_id, result={'ratings': {}})
+    assert job_queue.enqueue('iphone 14') != job_id
+
+def test_claim_takes_oldest_queued_job_once():
+    first = job_queue.enqueue('iphone 14')
+    job_queue.enqueue('galaxy s24')
+    assert job_queue.claim_next()['id'] == first
+    assert job_queue.get_job(first)['status'] == job_queue.RUNNING
+    assert job_queue.claim_next()['query'] == 'galaxy s24'
+    assert job_queue.claim_next() is None
+
+def test_recover_requeues_orphaned_jobs(monkeypatch):
+    monkeypatch.setattr(job_queue, 'JOB_TIMEOUT', 60)
+    orphaned = job_queue.enqueue('iphone 14')
+    alive = job_queue.enqueue('galaxy s24')
+    job_queue.claim_next()
+    job_queue.claim_next()
+    job_queue.publish_event(orphaned, 'ratings', {'total_reviews': 1})
+    age(orphaned, 120)
+
+    job_queue.recover()
+    assert job_queue.get_job(orphaned)['status'] == job_queue.QUEUED
+    assert job_queue.get_job(alive)['status'] == job_queue.RUNNING
+
+    # The retry starts without the events of the dead run
+    assert job_queue.claim_next()['id'] == orphaned
+    assert job_queue.get_events(orphaned) == []
+
+def test_recover_drops_expired_finished_jobs(monkeypatch):
+    monkeypatch.setattr(job_queue, 'JOB_RETENTION', 60)
+    expired = job_queue.enqueue('iphone 14')
+    kept = job_queue.enqueue('galaxy s24')
+    for job_id in (expired, kept):
+        job_queue.claim_next()
+        job_queue.publish_event(job_id, 'done', {'missing': []})
+        job_queue.finish(job_id, result={})
+    age(expired, 120)
+
+    job_queue.recover()
+    assert job_queue.get_job(expired) is None
+    assert job_queue.get_events(expired) == []
+    assert job_queue.get_job(kept)['status'] == job_queue.DONE
+
+def test_stream_job_replays_published_events():
+    job_id = job_queue.enqueue('iphone 14')
+    job_queue.claim_next()
+    job_queue.publish_event(job_id, 'ratings', {'total_reviews': 10})
+    job_queue.publish_event(job_id, 'summary', 'Good phone')
+    job_queue.publish_event(job_id, 'done', {'missing': []})
+    job_queue.finish(job_id, result={})
+
+    assert list(job_queue.stream_job(job_id, poll_interval=0)) == [
+        ('ratings', {'total_reviews': 10}),
+        ('summary', 'Good phone'),
+        ('done', {'missing': []}),
+    ]
+
+def test_stream_job_reports_failure():
+    job_id = job_queue.enqueue('iphone 14')
+    job_queue.claim_next()
+    job_queue.publish_event(job_id, 'ratings', {'total_reviews': 10})
+    job_queue.finish(job_id, error='Error processing search: boom')
+
+    assert list(job_queue.stream_job(job_id, poll_interval=0)) == [
+        ('ratings', {'total_reviews': 10}),
+        ('error', {'error': 'Error processing search: boom'}),
+    ]
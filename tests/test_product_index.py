@@ -0,0 +1,64 @@
+import pytest
+
+import product_index
+import reviews
+
+GALAXY_S24 = {
+    'title': 'Samsung Galaxy S24 128GB Unlocked Android Smartphone',
+    'product_id': 's24',
+    'rating': 4.6,
+    'reviews_count': 900,
+    'thumbnail': 'https://example.com/s24.jpg',
+}
+IPHONE_14 = {
+    'title': 'Apple iPhone 14 128GB Unlocked',
+    'product_id': 'iphone14',
+    'rating': 4.7,
+    'reviews_count': 2000,
+    'thumbnail': 'https://example.com/iphone14.jpg',
+}
+
+@pytest.fixture(autouse=True)
+def index_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(product_index, 'DB_PATH', tmp_path / 'products.sqlite3')
+    monkeypatch.setattr(reviews, 'INDEX_MIN_REVIEWS', 1)
+    product_index.add_products([GALAXY_S24], query='samsung galaxy s24')
+    product_index.add_products([IPHONE_14], query='iphone 14')
+
+@pytest.mark.parametrize('query', ['samsung tv', 'samsung washer', 'iphone 15', 'galaxy s23', 'samsung galaxy'])
+def test_near_miss_queries_are_not_served(query):
+    assert reviews.get_indexed_reviews(query) is None
+
+@pytest.mark.parametrize('query, total', [
+    ('samsung galaxy s24', 900),
+    ('Samsung Galaxy S24', 900),
+    ('samsng galaxy s24', 900),
+    ('samsung gal s24', 900),
+    ('iphone 14', 2000),
+    ('iPhone 14', 2000),
+])
+def test_matching_queries_are_served(query, total):
+    result = reviews.get_indexed_reviews(query)
+    assert result is not None
+    assert result['total_reviews'] == total
+
+def test_stale_listings_are_not_served():
+    assert reviews.get_indexed_reviews('iphone 14', max_age=0) is None
+
+def test_query_matches():
+    assert product_index.query_matches('iphone 14', 'iphone 14')
+    assert product_index.query_matches('14 iphone', 'iphone 14')
+    assert not product_index.query_matches('iphone 15', 'iphone 14')
+    assert not product_index.query_matches('iphone', 'iphone 14')
+    assert not product_index.query_matches('samsung tv', 'samsung galaxy s24')
+
+def test_index_counts_only_listings_with_every_term():
+    # Two of the three terms: enough for a scrape, not for the index
+    partial = dict(GALAXY_S24, title='Samsung S24 Ultra 256GB Phone', product_id='s24u', reviews_count=300)
+    product_index.add_products([partial], query='samsung galaxy s24')
+
+    scraped = reviews.RatingAggregate('samsung galaxy s24')
+    for listing in (GALAXY_S24, partial):
+        scraped.add(listing)
+    assert scraped.result()['total_reviews'] == 1200
+    assert reviews.get_indexed_reviews('samsung galaxy s24')['total_reviews'] == 900
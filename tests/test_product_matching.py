@@ -0,0 +1,44 @@
+import pytest
+
+from product_matching import ProductMatcher, is_accessory, tokenize
+
+@pytest.mark.parametrize('query, title', [
+    ('airpods pro 2', 'Apple AirPods Pro 2 Wireless Earbuds, Active Noise Cancellation, Hearing Aid Feature, '
+                      'Bluetooth Headphones, Transparency, Personalized Spatial Audio, High-Fidelity Sound, '
+                      'H2 Chip, USB-C Charging with MagSafe Charging Case (USB-C)'),
+    ('nintendo switch oled', 'Nintendo Switch OLED Model with White Joy-Con, 64GB Storage and Dock'),
+    ('sony wh-1000xm5', 'Sony WH-1000XM5 The Best Wireless Noise Canceling Headphones with Auto Noise '
+                        'Canceling Optimizer, Crystal Clear Hands-Free Calling, and Alexa Voice Control, '
+                        'Black with Carrying Case'),
+    ('apple watch series 9', 'Apple Watch Series 9 [GPS 41mm] Smartwatch with Midnight Aluminum Case '
+                             'with Midnight Sport Band S/M'),
+    ('apple watch series 9', 'Apple Watch Series 9 GPS 45mm Silver Aluminum Case Storm Blue Sport Band'),
+    ('anker charger', 'Anker Nano Charger 20W USB-C Fast Charger for iPhone'),
+    ('airpods pro 2', 'Apple AirPods Pro 2 + Charging Case'),
+])
+def test_products_with_bundled_accessories_are_relevant(query, title):
+    assert not is_accessory(title, set(tokenize(query)))
+    assert ProductMatcher(query).relevance(title) >= 0.75
+
+@pytest.mark.parametrize('query, title', [
+    ('sony wh-1000xm5', 'Case for Sony WH-1000XM5 Headphones, Hard Shell Travel Carrying Case'),
+    ('apple watch series 9', 'Spigen Rugged Armor Case for Apple Watch Series 9 45mm'),
+    ('nintendo switch oled', 'Tempered Glass Screen Protector Compatible with Nintendo Switch OLED Model'),
+    ('airpods pro 2', 'Silicone Cover Case for AirPods Pro 2nd Generation with Keychain'),
+    ('apple watch series 9', 'Sport Band Compatible with Apple Watch Series 9 Bands 41mm'),
+    ('sony wh-1000xm5', 'Replacement Ear Pads for Sony WH-1000XM5 Headphones'),
+    ('sony wh-1000xm5', 'Spigen Case Sony WH-1000XM5'),
+])
+def test_accessories_for_the_product_are_rejected(query, title):
+    assert is_accessory(title, set(tokenize(query)))
+    assert ProductMatcher(query).relevance(title) == 0.0
+
+def test_bundled_listings_are_counted():
+    matcher = ProductMatcher('nintendo switch oled')
+    match = matcher.add({
+        'title': 'Nintendo Switch OLED Model with White Joy-Con, 64GB Storage and Dock',
+        'rating': 4.8,
+        'reviews_count': 12000,
+    })
+    assert match is not None
+    assert matcher.rejected == 0
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, component_state, normalize_query, FRESH, STALE, MISSING
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return tmp_path / 'results'
+
+def entry(name, age):
+    return {'components': {name: {'value': 1, 'fetched_at': time.time() - age}}}
+
+def test_normalize_query():
+    assert normalize_query('  Sony  WH-1000XM5!! ') == 'sony wh-1000xm5'
+
+@pytest.mark.parametrize('age, state', [
+    (0, FRESH),
+    (result_cache.COMPONENT_TTLS['ratings'] + 1, STALE),
+    (result_cache.COMPONENT_TTLS['ratings'] + result_cache.STALE_TTL + 1, MISSING),
+])
+def test_component_state(age, state):
+    assert component_state(entry('ratings', age), 'ratings') == state
+
+def test_component_state_of_missing_entry():
+    assert component_state(None, 'ratings') == MISSING
+    assert component_state(entry('summary', 0), 'ratings') == MISSING
+
+def test_components_are_merged(cache_dir):
+    cache = ResultCache(cache_dir)
+    cache.set_component('iphone 14', 'ratings', {'total_reviews': 10})
+    cache.set_component('iphone 14', 'summary', 'Good')
+    components = ResultCache(cache_dir).get('iphone 14')['components']
+    assert components['ratings']['value'] == {'total_reviews': 10}
+    assert components['summary']['value'] == 'Good'
+
+def test_memory_tier_sees_writes_from_other_processes(cache_dir):
+    worker, other_worker = ResultCache(cache_dir), ResultCache(cache_dir)
+    worker.set_component('iphone 14', 'summary', 'Old')
+    assert worker.get('iphone 14')['components']['summary']['value'] == 'Old'
+
+    other_worker.set_component('iphone 14', 'summary', 'New')
+    assert worker.get('iphone 14')['components']['summary']['value'] == 'New'
+
+def test_memory_tier_is_served_while_disk_is_unchanged(cache_dir, monkeypatch):
+    cache = ResultCache(cache_dir)
+    cache.set_component('iphone 14', 'summary', 'Good')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('read from disk')
+
+    monkeypatch.setattr(result_cache.json, 'load', fail)
+    assert cache.get('iphone 14')['components']['summary']['value'] == 'Good'
@@ -0,0 +1,72 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import review_generator
+from transcribing_utils import save_video_data
+
+def add_video(query_dir, name):
+    video_dir = query_dir / name
+    video_dir.mkdir()
+    video_info = {
+        'video_id': name,
+        'title': f'{name} review',
+        'channel': 'Channel',
+        'video_url': f'https://example.com/{name}',
+        'platform': 'youtube',
+    }
+    save_video_data(video_dir, video_info, f'Transcript of {name}')
+    return video_dir
+
+@pytest.fixture
+def reviews(monkeypatch):
+    monkeypatch.setattr(
+        review_generator, 'generate_review',
+        lambda video_data, transcript: {'review_text': f'About {video_data["video_id"]}', 'rating': 4}
+    )
+    monkeypatch.setattr(review_generator, 'prepare_transcript', lambda video_info, transcript, query=None: transcript)
+
+def test_save_video_data_leaves_no_partial_file(tmp_path):
+    video_dir = add_video(tmp_path, 'a')
+    assert [path.name for path in video_dir.iterdir()] == ['video_data.json']
+    assert json.loads((video_dir / 'video_data.json').read_text())['transcript'] == 'Transcript of a'
+
+def test_only_listed_video_dirs_are_reviewed(tmp_path, reviews):
+    finished = [add_video(tmp_path, 'a'), add_video(tmp_path, 'c')]
+    # A video still being processed in the background
+    add_video(tmp_path, 'b')
+
+    results = list(review_generator.iter_query_directory(
+        str(tmp_path), batch=False, video_dirs=[str(path) for path in finished]
+    ))
+    assert [result['review_text'] for result in results] == ['About a', 'About c']
+
+def test_every_video_dir_is_reviewed_by_default(tmp_path, reviews):
+    for name in ('a', 'b'):
+        add_video(tmp_path, name)
+    results = list(review_generator.iter_query_directory(str(tmp_path), batch=False))
+    assert [result['review_text'] for result in results] == ['About a', 'About b']
+
+BATCH_REPLY = {'reviews': [
+    {'video_id': 'a', 'review_text': 'Solid sound', 'rating': 4},
+    {'video_id': 'b', 'review_text': 'Battery died fast', 'rating': '2'},
+]}
+
+def reply(content):
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+@pytest.mark.parametrize('content', [
+    json.dumps(BATCH_REPLY),
+    '```json\n' + json.dumps(BATCH_REPLY, indent=4) + '\n```',
+    'Here are the reviews: ' + json.dumps(BATCH_REPLY) + ' Let me know if you need more.',
+])
+def test_batch_reply_is_parsed_from_surrounding_text(monkeypatch, content):
+    monkeypatch.setattr(review_generator, 'create_chat_completion', lambda **kwargs: reply(content))
+    items = [(name, {'title': f'{name} review', 'channel': 'Channel'}, 'Transcript') for name in ('a', 'b')]
+
+    reviews = review_generator.generate_reviews_batch(items)
+    assert reviews['a']['review_text'] == 'Solid sound'
+    assert reviews['b']['review_text'] == 'Battery died fast'
+    assert sorted(reviews) == ['a', 'b']
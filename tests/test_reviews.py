@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+import reviews
+
+REVIEWS_PER_PAGE = 3000
+
+def listing(page):
+    # Distinct titles, so every page is a product of its own
+    return {
+        'title': 'Sony Headphones ' + 'ABCDEFGHIJ'[page - 1] * 3,
+        'product_id': f'p{page}',
+        'rating': 4.0,
+        'reviews_count': REVIEWS_PER_PAGE,
+        'thumbnail': f'https://example.com/{page}.jpg',
+    }
+
+class Pages:
+    def __init__(self):
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def start(self, page):
+        with self.lock:
+            self.requested.append(page)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finish(self, page, aggregate, stop, min_reviews):
+        with self.lock:
+            self.in_flight -= 1
+        reviews._add_products([listing(page)], aggregate, stop, min_reviews)
+
+@pytest.fixture
+def pages(monkeypatch):
+    pages = Pages()
+    monkeypatch.setattr(reviews, 'index_listings', lambda aggregate: None)
+    return pages
+
+@pytest.fixture
+def sync_pages(pages, monkeypatch):
+    # Pages only finish in pairs, so a batch of two must really run together
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fetch_page(query, page, aggregate, stop, min_reviews):
+        pages.start(page)
+        if reviews.PAGE_BATCH == 2:
+            barrier.wait()
+        pages.finish(page, aggregate, stop, min_reviews)
+
+    monkeypatch.setattr(reviews, '_fetch_page', fetch_page)
+    return pages
+
+@pytest.fixture
+def async_pages(pages, monkeypatch):
+    async def fetch_page_async(query, page, aggregate, stop, min_reviews):
+        pages.start(page)
+        await asyncio.sleep(0.01)
+        pages.finish(page, aggregate, stop, min_reviews)
+
+    monkeypatch.setattr(reviews, '_fetch_page_async', fetch_page_async)
+    return pages
+
+def test_pages_run_in_batches(sync_pages, monkeypatch):
+    monkeypatch.setattr(reviews, 'PAGE_BATCH', 2)
+    result = reviews.get_product_reviews('sony headphones', pages=6, min_reviews=0)
+    assert result['total_reviews'] == 6 * REVIEWS_PER_PAGE
+    assert sorted(sync_pages.requested) == [1, 2, 3, 4, 5, 6]
+    assert sync_pages.max_in_flight == 2
+
+def test_paging_stops_at_the_review_threshold(sync_pages, monkeypatch):
+    monkeypatch.setattr(reviews, 'PAGE_BATCH', 1)
+    result = reviews.get_product_reviews('sony headphones', pages=6, min_reviews=5000)
+    assert result['total_reviews'] == 2 * REVIEWS_PER_PAGE
+    assert sync_pages.requested == [1, 2]
+
+def test_async_pages_run_in_batches(async_pages, monkeypatch):
+    monkeypatch.setattr(reviews, 'PAGE_BATCH', 3)
+    result = asyncio.run(reviews.get_product_reviews_async('sony headphones', pages=6, min_reviews=0))
+    assert result['total_reviews'] == 6 * REVIEWS_PER_PAGE
+    assert sorted(async_pages.requested) == [1, 2, 3, 4, 5, 6]
+    assert async_pages.max_in_flight == 3
+
+def test_async_paging_stops_at_the_review_threshold(async_pages, monkeypatch):
+    monkeypatch.setattr(reviews, 'PAGE_BATCH', 1)
+    result = asyncio.run(reviews.get_product_reviews_async('sony headphones', pages=6, min_reviews=5000))
+    assert result['total_reviews'] == 2 * REVIEWS_PER_PAGE
+    assert async_pages.requested == [1, 2]
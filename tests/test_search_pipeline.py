@@ -0,0 +1,123 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+import async_pipeline
+import search_pipeline
+from result_cache import ResultCache, COMPONENT_TTLS
+
+RATINGS = {'total_reviews': 120, 'weighted_avg_rating': 4.5, 'img_urls': [], 'error': None}
+REVIEW = {'video_title': 'Review', 'review_text': 'Great', 'rating': 5}
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResultCache(cache_dir=tmp_path / 'results')
+    for module in (search_pipeline, async_pipeline):
+        monkeypatch.setattr(module, 'result_cache', cache)
+        monkeypatch.setattr(module, 'record_query', lambda query: None)
+    return cache
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        search_pipeline, 'schedule_refresh',
+        lambda query, key, names, ratings: calls.append((names, ratings))
+    )
+    return calls
+
+@pytest.fixture
+def stages(monkeypatch):
+    def iter_video_reviews(query, deadline=None, missing=None):
+        yield REVIEW
+
+    async def iter_video_reviews_async(query, deadline=None, missing=None):
+        yield REVIEW
+
+    async def fetch_ratings_async(query):
+        return dict(RATINGS)
+
+    async def fetch_summary_async(query, ratings):
+        return f'Rated {ratings["weighted_avg_rating"]}'
+
+    monkeypatch.setattr(search_pipeline, 'fetch_ratings', lambda query: dict(RATINGS))
+    monkeypatch.setattr(
+        search_pipeline, 'fetch_summary', lambda query, ratings: f'Rated {ratings["weighted_avg_rating"]}'
+    )
+    monkeypatch.setattr(search_pipeline, 'iter_video_reviews', iter_video_reviews)
+    monkeypatch.setattr(async_pipeline, 'fetch_ratings', fetch_ratings_async)
+    monkeypatch.setattr(async_pipeline, 'fetch_summary', fetch_summary_async)
+    monkeypatch.setattr(async_pipeline, 'iter_video_reviews', iter_video_reviews_async)
+
+def run_sync(query):
+    return list(search_pipeline.iter_search(query))
+
+def run_async(query):
+    async def collect():
+        return [event async for event in async_pipeline.iter_search(query)]
+    return asyncio.run(collect())
+
+@pytest.fixture(params=[run_sync, run_async], ids=['sync', 'async'])
+def search(request, cache, refreshes, stages):
+    return request.param
+
+def expire(cache, key, name, stale=True):
+    entry = cache.get(key)
+    age = COMPONENT_TTLS[name] + (1 if stale else 10 ** 9)
+    entry['components'][name]['fetched_at'] = time.time() - age
+    # Rewritten the way another worker process would, by replacing the file
+    path = cache._disk_path(key)
+    path.with_suffix('.tmp').write_text(json.dumps(entry))
+    path.with_suffix('.tmp').replace(path)
+
+def test_cold_search_computes_and_caches_every_stage(search, cache):
+    assert search('sony xm5') == [
+        ('ratings', RATINGS),
+        ('summary', 'Rated 4.5'),
+        ('review', REVIEW),
+        ('done', {'missing': []}),
+    ]
+    components = cache.get('sony xm5')['components']
+    assert components['ratings']['value'] == RATINGS
+    assert components['summary']['value'] == 'Rated 4.5'
+    assert components['video_reviews']['value'] == [REVIEW]
+
+def test_stale_stages_are_served_and_refreshed(search, cache, refreshes):
+    search('sony xm5')
+    expire(cache, 'sony xm5', 'video_reviews')
+    events = search('sony xm5')
+    assert ('review', REVIEW) in events
+    assert refreshes == [(['video_reviews'], RATINGS)]
+
+def test_stale_summary_waits_for_expired_ratings(search, cache, refreshes):
+    cache.set_component('sony xm5', 'ratings', dict(RATINGS, weighted_avg_rating=3.0))
+    cache.set_component('sony xm5', 'summary', 'Rated 3.0')
+    cache.set_component('sony xm5', 'video_reviews', [REVIEW])
+    expire(cache, 'sony xm5', 'ratings', stale=False)
+    expire(cache, 'sony xm5', 'summary')
+
+    events = search('sony xm5')
+    # The stale summary is served now, and rebuilt from the ratings just fetched
+    assert events[:2] == [('ratings', RATINGS), ('summary', 'Rated 3.0')]
+    assert refreshes == [(['summary'], RATINGS)]
+
+def test_ratings_timeout_skips_the_summary(search, monkeypatch):
+    monkeypatch.setitem(search_pipeline.STAGE_BUDGETS, 'ratings', 0.01)
+
+    def slow_ratings(query):
+        time.sleep(0.2)
+        return dict(RATINGS)
+
+    async def slow_ratings_async(query):
+        await asyncio.sleep(0.2)
+        return dict(RATINGS)
+
+    monkeypatch.setattr(search_pipeline, 'fetch_ratings', slow_ratings)
+    monkeypatch.setattr(async_pipeline, 'fetch_ratings', slow_ratings_async)
+
+    events = search('sony xm5')
+    assert events[0][1]['total_reviews'] == 0
+    assert events[1] == ('summary', None)
+    assert events[-1] == ('done', {'missing': ['ratings', 'summary']})
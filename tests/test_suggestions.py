@@ -0,0 +1,44 @@
+import pytest
+
+import product_index
+import suggestions
+from suggestions import result_cache
+
+GALAXY_S24 = {
+    'title': 'Samsung Galaxy S24 128GB Unlocked Android Smartphone - Onyx Black',
+    'product_id': 's24',
+    'rating': 4.6,
+    'reviews_count': 900,
+}
+
+@pytest.fixture(autouse=True)
+def suggest_dbs(tmp_path, monkeypatch):
+    monkeypatch.setattr(product_index, 'DB_PATH', tmp_path / 'products.sqlite3')
+    monkeypatch.setattr(suggestions, 'DB_PATH', tmp_path / 'suggestions.sqlite3')
+    monkeypatch.setattr(suggestions, 'MIN_SEARCHES', 2)
+    product_index.add_products([GALAXY_S24], query='Samsung Galaxy S24')
+
+def build(monkeypatch, queries):
+    monkeypatch.setattr(result_cache, 'queries', lambda: list(queries))
+    return suggestions.build_index()
+
+def test_suggests_the_query_not_the_listing_title(monkeypatch):
+    index = build(monkeypatch, [])
+    assert index.lookup('gal') == ['samsung galaxy s24']
+
+def test_one_off_queries_are_not_suggested(monkeypatch):
+    suggestions.record_query('samsnug phone')
+    index = build(monkeypatch, ['samsnug phone'])
+    assert index.lookup('sams') == ['samsung galaxy s24']
+
+def test_repeated_queries_are_suggested(monkeypatch):
+    for _ in range(2):
+        suggestions.record_query('samsung tv')
+    index = build(monkeypatch, ['samsung tv'])
+    assert set(index.lookup('sams')) == {'samsung galaxy s24', 'samsung tv'}
+
+def test_past_queries_merge_with_their_canonical_name(monkeypatch):
+    suggestions.record_query('the samsung galaxy s24')
+    index = build(monkeypatch, ['the samsung galaxy s24'])
+    assert index.lookup('samsung') == ['samsung galaxy s24']
+    assert index.size == 1
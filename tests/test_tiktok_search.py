@@ -0,0 +1,80 @@
+import time
+import threading
+
+import pytest
+
+import tiktok_search
+import transcript_cache
+from audio_utils import AUDIO_FILENAME, REPORT_FILENAME, DownloadCancelled
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'data': {'video': {'play_addr': {'url_list': ['https://example.com/video.mp4']}}}}
+
+class FakeSession:
+    def get(self, *args, **kwargs):
+        return FakeResponse()
+
+def write_audio(dest, name):
+    dest.write_text(name)
+    dest.with_name(REPORT_FILENAME).write_text(name)
+
+@pytest.fixture(autouse=True)
+def tiktok(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcript_cache, 'CACHE_DIR', tmp_path / 'transcripts')
+    monkeypatch.setattr(tiktok_search, 'get_http_session', lambda: FakeSession())
+    monkeypatch.setattr(tiktok_search, 'HEDGE_DELAY', 0.05)
+
+def download(tmp_path):
+    return tiktok_search.download_audio('https://tiktok.com/@a/video/1', '1', 'Review', tmp_path)
+
+def test_fast_api_download_is_not_hedged(tmp_path, monkeypatch):
+    started = []
+    monkeypatch.setattr(tiktok_search, 'stream_normalize', lambda url, dest, cancel=None: write_audio(dest, 'api'))
+    monkeypatch.setattr(
+        tiktok_search, 'download_normalized', lambda *args, **kwargs: started.append('ytdlp')
+    )
+
+    audio_path = download(tmp_path)
+    assert open(audio_path).read() == 'api'
+    assert started == []
+
+def test_hedge_winner_is_kept_and_loser_stopped(tmp_path, monkeypatch):
+    api_finished = threading.Event()
+
+    def slow_api(url, dest, cancel=None):
+        dest.write_text('partial')
+        try:
+            # Runs until the hedge cancels it
+            assert cancel.wait(5)
+            raise DownloadCancelled(url)
+        finally:
+            api_finished.set()
+
+    def ytdlp(video_url, dest, ydl_opts, cancel=None):
+        write_audio(dest, 'ytdlp')
+
+    monkeypatch.setattr(tiktok_search, 'stream_normalize', slow_api)
+    monkeypatch.setattr(tiktok_search, 'download_normalized', ytdlp)
+
+    started = time.monotonic()
+    audio_path = download(tmp_path)
+    assert time.monotonic() - started < 5
+
+    video_dir = tiktok_search.get_video_dir('1', 'Review', tmp_path, create=False)
+    assert open(audio_path).read() == 'ytdlp'
+    assert (video_dir / REPORT_FILENAME).read_text() == 'ytdlp'
+    # Nothing of either attempt is left running or on disk
+    assert api_finished.is_set()
+    assert sorted(path.name for path in video_dir.iterdir()) == sorted([AUDIO_FILENAME, REPORT_FILENAME])
+
+def test_both_attempts_failing_returns_none(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError('boom')
+
+    monkeypatch.setattr(tiktok_search, 'stream_normalize', fail)
+    monkeypatch.setattr(tiktok_search, 'download_normalized', fail)
+    assert download(tmp_path) is None
@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+import transcript_cache
+import transcribing_utils
+
+ENGLISH = 'This is a long review of the headphones and I think the sound is really very good overall.'
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcript_cache, 'CACHE_DIR', tmp_path / 'transcripts')
+    return tmp_path / 'transcripts'
+
+@pytest.fixture
+def whisper(monkeypatch):
+    calls = {'probe': 0, 'transcribe': 0}
+
+    def probe_language(audio_path, platform=None):
+        calls['probe'] += 1
+        return 'Hola a todos, hoy vamos a ver estos auriculares nuevos de Sony que son muy buenos'
+
+    def transcribe(audio_path, platform=None):
+        calls['transcribe'] += 1
+        return ENGLISH
+
+    monkeypatch.setattr(transcribing_utils, 'probe_language', probe_language)
+    monkeypatch.setattr(transcribing_utils.transcription_backends, 'transcribe', transcribe)
+    return calls
+
+def test_transcripts_and_language_verdicts_are_separate():
+    transcript_cache.put_language('youtube', 'abc', 'non-en')
+    assert transcript_cache.get_language('youtube', 'abc') == 'non-en'
+    assert transcript_cache.get_transcript('youtube', 'abc') is None
+
+    transcript_cache.put_transcript('youtube', 'abc', ENGLISH)
+    assert transcript_cache.get_transcript('youtube', 'abc') == ENGLISH
+    assert transcript_cache.get_transcript('tiktok', 'abc') is None
+
+def test_expired_entries_are_not_served(cache_dir):
+    transcript_cache.put_transcript('youtube', 'abc', ENGLISH)
+    old = time.time() - transcript_cache.TTL_SECONDS - 1
+    os.utime(cache_dir / 'youtube' / 'abc' / transcript_cache.TRANSCRIPT_FILE, (old, old))
+    assert transcript_cache.get_transcript('youtube', 'abc') is None
+
+def test_evict_removes_least_recently_used(cache_dir, monkeypatch):
+    for video_id in ('old', 'new'):
+        transcript_cache.put_transcript('youtube', video_id, ENGLISH)
+    past = time.time() - 60
+    os.utime(cache_dir / 'youtube' / 'old', (past, past))
+    monkeypatch.setattr(transcript_cache, 'MAX_BYTES', len(ENGLISH))
+
+    assert transcript_cache.evict() == 1
+    assert transcript_cache.get_transcript('youtube', 'old') is None
+    assert transcript_cache.get_transcript('youtube', 'new') == ENGLISH
+
+def test_non_english_opening_caches_only_a_verdict(tmp_path, whisper):
+    audio_path = str(tmp_path / 'audio.ogg')
+    result = transcribing_utils.transcribe_audio(audio_path, platform='youtube', video_id='abc')
+    assert not result['available']
+    assert transcript_cache.get_language('youtube', 'abc') == transcribing_utils.NON_ENGLISH
+    assert transcript_cache.get_transcript('youtube', 'abc') is None
+
+    # A later query rejects the video without probing again
+    result = transcribing_utils.transcribe_audio(audio_path, platform='youtube', video_id='abc')
+    assert not result['available']
+    assert whisper == {'probe': 1, 'transcribe': 0}
+
+def test_english_metadata_skips_the_probe(tmp_path, whisper):
+    audio_path = str(tmp_path / 'audio.ogg')
+    result = transcribing_utils.transcribe_audio(
+        audio_path, platform='youtube', video_id='abc', language_hint='en-US'
+    )
+    assert result['available']
+    assert result['transcript'] == ENGLISH
+    assert transcript_cache.get_transcript('youtube', 'abc') == ENGLISH
+    assert whisper == {'probe': 0, 'transcribe': 1}
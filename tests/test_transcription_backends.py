@@ -0,0 +1,52 @@
+import pytest
+
+import transcription_backends
+
+@pytest.fixture
+def routing(monkeypatch):
+    durations = {}
+    monkeypatch.setattr(transcription_backends, 'probe_duration', lambda audio_path: durations.get(audio_path))
+    monkeypatch.setattr(transcription_backends, 'TRANSCRIBE_BACKEND', 'auto')
+    monkeypatch.setattr(transcription_backends, 'LOCAL_PLATFORMS', set())
+    monkeypatch.setattr(transcription_backends, 'LOCAL_MAX_SECONDS', 180)
+    for backend in transcription_backends.BACKENDS.values():
+        monkeypatch.setattr(backend, 'is_available', lambda: True)
+    return durations
+
+def preferred(audio_path, platform=None):
+    backends = transcription_backends.select_backends(audio_path, platform)
+    names = {id(backend): name for name, backend in transcription_backends.BACKENDS.items()}
+    return [names[id(backend)] for backend in backends]
+
+def test_short_clips_go_local(routing):
+    routing['short.ogg'] = 60
+    assert preferred('short.ogg', 'youtube') == ['local', 'api']
+
+def test_long_clips_go_to_the_api(routing):
+    routing['long.ogg'] = 900
+    assert preferred('long.ogg', 'youtube') == ['api', 'local']
+
+def test_unknown_duration_goes_to_the_api(routing):
+    assert preferred('missing.ogg') == ['api', 'local']
+
+def test_tiktok_clips_are_routed_by_duration(routing):
+    routing['long.ogg'] = 900
+    routing['short.ogg'] = 30
+    assert preferred('long.ogg', 'tiktok') == ['api', 'local']
+    assert preferred('short.ogg', 'tiktok') == ['local', 'api']
+
+def test_local_platforms_override_duration(routing, monkeypatch):
+    monkeypatch.setattr(transcription_backends, 'LOCAL_PLATFORMS', {'tiktok'})
+    routing['long.ogg'] = 900
+    assert preferred('long.ogg', 'tiktok') == ['local', 'api']
+    assert preferred('long.ogg', 'youtube') == ['api', 'local']
+
+def test_configured_backend_wins(routing, monkeypatch):
+    monkeypatch.setattr(transcription_backends, 'TRANSCRIBE_BACKEND', 'api')
+    routing['short.ogg'] = 30
+    assert preferred('short.ogg', 'youtube') == ['api', 'local']
+
+def test_unavailable_backends_are_skipped(routing, monkeypatch):
+    monkeypatch.setattr(transcription_backends.BACKENDS['local'], 'is_available', lambda: False)
+    routing['short.ogg'] = 30
+    assert preferred('short.ogg') == ['api']
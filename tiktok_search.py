@@ -1,16 +1,27 @@
 import logging
 import os
-import requests
-from datetime import datetime
+import shutil
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 from dotenv import load_dotenv
-from transcribing_utils import transcribe_audio, is_english_text, save_video_data
-import yt_dlp
+import transcript_cache
+from clients import get_http_session, get_async_http_client
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+from audio_utils import (
+    stream_normalize, download_normalized, DownloadCancelled, AUDIO_FILENAME, REPORT_FILENAME, MAX_DOWNLOAD_BYTES
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Start yt-dlp alongside the EnsembleData download if that hasn't finished after this many seconds
+HEDGE_DELAY = float(os.getenv('TIKTOK_HEDGE_DELAY', '8'))
+# Threads for download attempts: up to two per download slot (see video_pipeline.DOWNLOAD_CONCURRENCY)
+HEDGE_WORKERS = int(os.getenv('TIKTOK_HEDGE_WORKERS', str(2 * int(os.getenv('DOWNLOAD_CONCURRENCY', '3')))))
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='tiktok-download')
+
 # Create downloads directory if it doesn't exist
 from utils import get_query_dir, DOWNLOADS_DIR
 DOWNLOADS_DIR.mkdir(exist_ok=True)
@@ -69,16 +80,24 @@ def download_audio(video_url, video_id, title, query_dir):
         query_dir (Path): Directory for the search query results
         
     Returns:
-        str: Path to the downloaded audio file or None if file is too large
+        str: Path to the normalized audio file or None if file is too large
     """
     video_dir = get_video_dir(video_id, title, query_dir)
-    audio_path = video_dir / 'audio.mp3'
+    audio_path = video_dir / AUDIO_FILENAME
     
     if audio_path.exists():
         logger.info(f"Audio already exists for video {video_id}")
         return str(audio_path)
     
-    def try_api_download():
+    # Reuse audio downloaded for an earlier query
+    cached_path = transcript_cache.get_audio('tiktok', video_id, audio_path)
+    if cached_path:
+        return cached_path
+    
+    # Set once a winner is in, to stop the other attempt
+    cancel = threading.Event()
+    
+    def try_api_download(dest):
         try:
             # Get video metadata using EnsembleData API
             api_key = os.getenv('ENSEMBLEDDATA_API_KEY')
@@ -90,7 +109,7 @@ def download_audio(video_url, video_id, title, query_dir):
                 "token": api_key
             }
             
-            response = requests.get(root + endpoint, params=params)
+            response = get_http_session().get(root + endpoint, params=params, timeout=15)
             response.raise_for_status()
             video_data = response.json()
             
@@ -99,44 +118,25 @@ def download_audio(video_url, video_id, title, query_dir):
                 if 'play_addr' in video_info and 'url_list' in video_info['play_addr']:
                     direct_url = video_info['play_addr']['url_list'][0]
                     
-                    # Download video using requests
-                    video_response = requests.get(direct_url, stream=True)
-                    video_response.raise_for_status()
-                    
-                    temp_video = video_dir / 'temp.mp4'
-                    with open(temp_video, 'wb') as f:
-                        for chunk in video_response.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                    
-                    # Convert to audio using ffmpeg
-                    import subprocess
-                    subprocess.run([
-                        'ffmpeg', '-i', str(temp_video),
-                        '-vn', '-acodec', 'libmp3lame', '-q:a', '4',
-                        str(audio_path)
-                    ], check=True, capture_output=True)
+                    # Pipe the video straight into ffmpeg, extracting and normalizing the audio
+                    dest.parent.mkdir(exist_ok=True)
+                    stream_normalize(direct_url, dest, cancel=cancel)
                     
-                    # Clean up temp file
-                    temp_video.unlink()
-                    
-                    return str(audio_path)
+                    return str(dest)
+            return None
+        except DownloadCancelled:
             return None
         except Exception as e:
             logger.error(f"API download failed: {str(e)}")
             return None
     
-    def try_yt_dlp_download():
+    def try_yt_dlp_download(dest):
         try:
             ydl_opts = {
                 'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'outtmpl': str(video_dir / 'audio.%(ext)s'),
-                'max_filesize': 10000000,  # 10MB limit
+                'outtmpl': str(dest.parent / 'source.%(ext)s'),
+                'max_filesize': MAX_DOWNLOAD_BYTES,
+                'buffersize': 1048576,
                 'quiet': True,
                 'no_warnings': True,
                 'nocheckcertificate': True,
@@ -152,40 +152,58 @@ def download_audio(video_url, video_id, title, query_dir):
                 }
             }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
-                return str(audio_path)
+            dest.parent.mkdir(exist_ok=True)
+            download_normalized(video_url, dest, ydl_opts, cancel=cancel)
+            return str(dest)
         except Exception as e:
-            logger.error(f"yt-dlp download failed: {str(e)}")
+            if not cancel.is_set():
+                logger.error(f"yt-dlp download failed: {str(e)}")
             return None
     
-    # Try API download first, then fall back to yt-dlp
-    result = try_api_download()
-    if result:
-        return result
+    # Try the API download first and hedge with yt-dlp if it fails or is slow.
+    # Each attempt works in its own directory, and the first to finish wins
+    attempt_dirs = [video_dir / 'api', video_dir / 'ytdlp']
+    attempts = [_hedge_pool.submit(try_api_download, attempt_dirs[0] / AUDIO_FILENAME)]
+    wait(attempts, timeout=HEDGE_DELAY)
+    if not (attempts[0].done() and attempts[0].result()):
+        logger.info("API download failed or is slow, racing yt-dlp against it...")
+        attempts.append(_hedge_pool.submit(try_yt_dlp_download, attempt_dirs[1] / AUDIO_FILENAME))
     
-    logger.info("API download failed, trying yt-dlp...")
-    return try_yt_dlp_download()
-
-"""
-Search for TikTok videos using EnsembleData API.
+    result = None
+    try:
+        for attempt in as_completed(attempts):
+            winner = attempt.result()
+            if winner:
+                os.replace(winner, audio_path)
+                report_path = Path(winner).with_name(REPORT_FILENAME)
+                if report_path.exists():
+                    os.replace(report_path, video_dir / REPORT_FILENAME)
+                result = str(audio_path)
+                break
+    finally:
+        # Stop the loser and wait for it, so it never outlives the caller's download slot
+        cancel.set()
+        wait(attempts)
+        for attempt_dir in attempt_dirs:
+            shutil.rmtree(attempt_dir, ignore_errors=True)
+    
+    if result:
+        transcript_cache.put_audio('tiktok', video_id, result)
+    return result
 
-Args:
-    query (str): Search query
-    max_results (int): Maximum number of results to return (default: 2)
-    query_dir (Path): Directory to save video data (default: None)
+def build_search_request(query):
+    """
+    Build the EnsembleData keyword search request.
     
-Returns:
-    list: List of video information dictionaries
-"""
-def search_videos(query, max_results=2, query_dir=None):
+    Args:
+        query (str): Search query
+        
+    Returns:
+        tuple: (url, params)
+    """
     # Load environment variables
     load_dotenv(override=True)
     
-    # If no query_dir provided, create a default one
-    if query_dir is None:
-        query_dir = get_query_dir(query)
-    
     # Load API key from environment
     api_key = os.getenv('ENSEMBLEDDATA_API_KEY')
     if not api_key:
@@ -207,90 +225,115 @@ def search_videos(query, max_results=2, query_dir=None):
         "get_author_stats": False,
         "token": api_key
     }
+    return root + endpoint, params
+
+def parse_search_results(search_results, max_results):
+    """
+    Turn an EnsembleData keyword search response into video information dicts.
+    
+    Args:
+        search_results (dict): Parsed response body
+        max_results (int): Maximum number of results to return
+        
+    Returns:
+        list: List of video information dictionaries
+    """
+    # The API returns a nested data structure
+    video_list = []
+    if isinstance(search_results, dict) and 'data' in search_results:
+        if isinstance(search_results['data'], dict) and 'data' in search_results['data']:
+            video_list = search_results['data']['data']
+    
+    print(f"Found {len(video_list)} videos")
+    
+    videos = []
+    for item in video_list[:max_results]:
+        # Parse the item data
+        try:
+            aweme_info = item.get('aweme_info', {})
+            author_info = aweme_info.get('author', {})
+            video_info = {
+                'video_id': str(aweme_info.get('aweme_id', '')),
+                'title': str(aweme_info.get('desc', '')),
+                'channel': str(author_info.get('nickname', 'TikTok Creator')),
+                'video_url': f"https://www.tiktok.com/@{author_info.get('unique_id', '')}/video/{aweme_info.get('aweme_id', '')}",
+                'duration': int(aweme_info.get('duration', 0)),
+                'view_count': int(aweme_info.get('statistics', {}).get('play_count', 0)),
+                'like_count': int(aweme_info.get('statistics', {}).get('digg_count', 0)),
+                'published_at': (
+                    datetime.fromtimestamp(int(aweme_info['create_time']), timezone.utc).isoformat()
+                    if aweme_info.get('create_time') else ''
+                ),
+                'platform': 'tiktok',
+                'caption': str(aweme_info.get('desc', '')),
+                # Language of the caption text; the closest thing TikTok reports to a spoken language
+                'language': str(aweme_info.get('desc_language') or ''),
+                'region': str(aweme_info.get('region') or ''),
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Error parsing video data: {str(e)}")
+            continue
+        
+        videos.append(video_info)
+    return videos
+
+"""
+Search for TikTok videos using EnsembleData API.
+
+Only video metadata is returned; downloading and transcribing the hits is
+left to video_pipeline.process_videos so every clip is enriched exactly once.
+
+Args:
+    query (str): Search query
+    max_results (int): Maximum number of results to return (default: 2)
+    
+Returns:
+    list: List of video information dictionaries
+"""
+def search_videos(query, max_results=2):
+    url, params = build_search_request(query)
     
     videos = []
     try:
         # Search for videos using EnsembleData API
         print(f"Searching TikTok for: {query}")
-        print(f"Using URL: {root + endpoint}")
+        print(f"Using URL: {url}")
         print(f"With params: {params}")
         
-        response = requests.get(root + endpoint, params=params)
+        response = get_http_session().get(url, params=params)
         print(f"Response status: {response.status_code}")
         print(f"Response headers: {response.headers}")
         print(f"Response text: {response.text[:500]}...")
         
         response.raise_for_status()
-        search_results = response.json()
-        
-        # The API returns a nested data structure
-        if isinstance(search_results, dict) and 'data' in search_results:
-            if isinstance(search_results['data'], dict) and 'data' in search_results['data']:
-                video_list = search_results['data']['data']
-            else:
-                video_list = []
-        
-        print(f"Found {len(video_list)} videos")
-            
-        for item in video_list[:max_results]:
-            # Parse the item data
-            try:
-                aweme_info = item.get('aweme_info', {})
-                author_info = aweme_info.get('author', {})
-                video_info = {
-                    'video_id': str(aweme_info.get('aweme_id', '')),
-                    'title': str(aweme_info.get('desc', '')),
-                    'channel': str(author_info.get('nickname', 'TikTok Creator')),
-                    'video_url': f"https://www.tiktok.com/@{author_info.get('unique_id', '')}/video/{aweme_info.get('aweme_id', '')}",
-                    'duration': int(aweme_info.get('duration', 0)),
-                    'view_count': int(aweme_info.get('statistics', {}).get('play_count', 0)),
-                    'platform': 'tiktok',
-                    'caption': str(aweme_info.get('desc', ''))
-                }
-            except (KeyError, TypeError, ValueError) as e:
-                logger.error(f"Error parsing video data: {str(e)}")
-                continue
-            
-            print(f"\nProcessing video: {video_info['title']}")
-            
-            # Download audio and get transcript
-            audio_path = download_audio(
-                    video_info['video_url'],
-                    video_info['video_id'],
-                    video_info['title'],
-                    query_dir
-                )
-                
-            if audio_path:
-                # Get transcript
-                result = transcribe_audio(audio_path)
-                if not result['available']:
-                    logger.error(f"Transcription failed: {result['error']}")
-                    continue
-                    
-                transcript = result['transcript']
-                logger.info(f"Got transcript: {transcript[:200]}...")
-                
-                is_english = is_english_text(transcript)
-                logger.info(f"Transcript is English: {is_english}")
-                
-                if transcript and is_english:
-                    video_info['transcript'] = transcript
-                    videos.append(video_info)
-                    
-                    # Save video data
-                    video_dir = get_video_dir(
-                        video_info['video_id'],
-                        video_info['title'],
-                        query_dir
-                    )
-                    save_video_data(video_dir, video_info, transcript)
+        videos = parse_search_results(response.json(), max_results)
     
     except Exception as e:
         logger.error(f"Error searching TikTok videos: {str(e)}")
     
     return videos
 
+async def search_videos_async(query, max_results=2):
+    """
+    Async variant of search_videos using the shared httpx.AsyncClient.
+    
+    Args:
+        query (str): Search query
+        max_results (int): Maximum number of results to return (default: 2)
+        
+    Returns:
+        list: List of video information dictionaries
+    """
+    url, params = build_search_request(query)
+    
+    try:
+        response = await get_async_http_client().get(url, params=params)
+        response.raise_for_status()
+        return parse_search_results(response.json(), max_results)
+    except Exception as e:
+        logger.error(f"Error searching TikTok videos: {str(e)}")
+        return []
+
 def main():
     """
     Test the TikTok search functionality
@@ -300,7 +343,12 @@ def main():
     print(f"Searching for: {query}")
     
     try:
+        # Imported here to avoid a circular import with video_pipeline
+        from video_pipeline import process_videos
+
+        query_dir = get_query_dir(query)
         videos = search_videos(query, max_results=20)
+        process_videos([('tiktok', video) for video in videos], query_dir)
         
         print(f"\nFound {len(videos)} videos:")
         for video in videos:
@@ -1,12 +1,14 @@
 """
-Utility functions for transcribing audio using OpenAI's Whisper API.
+Utility functions for transcribing audio with Whisper (see transcription_backends).
 """
 
 import os
 import logging
 from pathlib import Path
-from openai import OpenAI
 from langdetect import detect, DetectorFactory
+from audio_utils import probe_duration, extract_clip
+import transcription_backends
+import transcript_cache
 
 # Set seed for consistent language detection
 DetectorFactory.seed = 0
@@ -15,6 +17,31 @@ DetectorFactory.seed = 0
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Audio longer than twice this is language-checked on its opening seconds first (0 disables)
+LANGUAGE_PROBE_SECONDS = float(os.getenv('LANGUAGE_PROBE_SECONDS', '30'))
+
+# Language verdict cached for videos rejected on their opening seconds
+NON_ENGLISH = 'non-en'
+
+# Metadata codes that say nothing about the spoken language
+UNKNOWN_LANGUAGES = {'', 'un', 'und', 'zxx', 'mul'}
+
+def is_english_language(code):
+    """
+    Interpret a platform language code such as 'en-US' or 'es'.
+    
+    Args:
+        code (str): Language code from video metadata
+        
+    Returns:
+        bool: True/False for English/other, or None if the code is missing
+            or doesn't name a language
+    """
+    code = (code or '').strip().lower().replace('_', '-')
+    if code.split('-')[0] in UNKNOWN_LANGUAGES:
+        return None
+    return code.split('-')[0] == 'en'
+
 def is_english_text(text):
     """
     Check if the given text is in English.
@@ -32,12 +59,50 @@ def is_english_text(text):
     except:
         return False
 
-def transcribe_audio(audio_path):
+def probe_language(audio_path, platform=None):
+    """
+    Check whether long audio is in English by transcribing only its opening seconds.
+    
+    Args:
+        audio_path (str): Path to the audio file
+        platform (str): 'youtube' or 'tiktok' (optional)
+        
+    Returns:
+        str: The opening transcript if it isn't English, else None (also
+            returned when the audio is too short to be worth probing)
+    """
+    if not LANGUAGE_PROBE_SECONDS:
+        return None
+    duration = probe_duration(audio_path)
+    if duration is None or duration <= LANGUAGE_PROBE_SECONDS * 2:
+        return None
+    
+    probe_path = Path(audio_path).with_name(f'probe{Path(audio_path).suffix}')
+    try:
+        extract_clip(audio_path, probe_path, LANGUAGE_PROBE_SECONDS)
+        opening = transcription_backends.transcribe(str(probe_path), platform=platform)
+    finally:
+        probe_path.unlink(missing_ok=True)
+    
+    # Too little speech to judge; let the full transcript decide
+    if len(opening.split()) < 10 or is_english_text(opening):
+        return None
+    return opening
+
+def transcribe_audio(audio_path, platform=None, video_id=None, language_hint=None):
     """
-    Transcribe audio using OpenAI's Whisper API.
+    Transcribe audio with the backend routed for the clip.
+    
+    When platform and video_id are given the persistent transcript cache is
+    checked first and fresh transcripts are stored in it. Long audio is
+    rejected early if its opening isn't English (see probe_language),
+    unless its metadata already says it is.
     
     Args:
         audio_path (str): Path to the audio file
+        platform (str): 'youtube' or 'tiktok' (optional)
+        video_id (str): Platform video ID (optional)
+        language_hint (str): Language code from the video's metadata (optional)
         
     Returns:
         dict: Dictionary containing transcription info
@@ -49,28 +114,34 @@ def transcribe_audio(audio_path):
             }
     """
     try:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            return {
-                'available': False,
-                'transcript': None,
-                'transcript_path': None,
-                'error': "OPENAI_API_KEY not found in environment variables"
-            }
-        
-        client = OpenAI(api_key=api_key)
-
-        logger.info(f"Transcribing audio: {audio_path}")
+        transcript = transcript_cache.get_transcript(platform, video_id)
         
-        # Transcribe the audio
-        with open(audio_path, "rb") as audio_file:
-            response = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="text"
-            )
-            transcript = str(response) if response else ''
+        if transcript is None:
+            # Reject non-English videos before paying for the whole transcript
+            non_english = transcript_cache.get_language(platform, video_id) == NON_ENGLISH
+            # Metadata saying English makes the probe's extra ffmpeg pass and Whisper call pointless
+            probe = not non_english and not is_english_language(language_hint)
+            if probe and probe_language(audio_path, platform=platform) is not None:
+                logger.info(f"Opening of {audio_path} is not in English, skipping full transcription")
+                # Only the verdict is cached: the opening is no transcript
+                transcript_cache.put_language(platform, video_id, NON_ENGLISH)
+                non_english = True
+            if non_english:
+                return {
+                    'available': False,
+                    'transcript': None,
+                    'transcript_path': None,
+                    'error': 'Transcript is not in English'
+                }
+            
+            logger.info(f"Transcribing audio: {audio_path}")
+            
+            # Transcribe the audio
+            transcript = transcription_backends.transcribe(audio_path, platform=platform)
             logger.info(f"Raw transcription response: {transcript[:200]}...")
+            
+            # Cache before the language check so non-English videos aren't paid for twice either
+            transcript_cache.put_transcript(platform, video_id, transcript)
         
         # Check if transcript is in English
         if not is_english_text(transcript):
@@ -120,8 +191,11 @@ def save_video_data(video_dir, video_info, transcript):
         }
         
         output_path = video_dir / 'video_data.json'
-        with open(output_path, 'w', encoding='utf-8') as f:
+        # Written aside and renamed, so readers never load a half-written file
+        tmp_path = video_dir / 'video_data.json.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, output_path)
             
     except Exception as e:
         logger.error(f"Error saving video data: {str(e)}", exc_info=True)
@@ -0,0 +1,243 @@
+"""
+Persistent transcript and audio store shared across search queries.
+
+Entries are keyed by (platform, video_id) so the same review video is only
+downloaded and transcribed once no matter how many different queries it
+comes back for. Besides full transcripts and audio, an entry can hold a
+language verdict for a video rejected on its opening seconds. Entries
+expire after TRANSCRIPT_CACHE_TTL seconds and the least recently used
+ones are evicted once the store grows past TRANSCRIPT_CACHE_MAX_BYTES.
+"""
+
+import os
+import shutil
+import time
+import logging
+import threading
+from pathlib import Path
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(os.getenv('TRANSCRIPT_CACHE_DIR', 'cache/transcripts'))
+TTL_SECONDS = int(os.getenv('TRANSCRIPT_CACHE_TTL', str(30 * 24 * 3600)))
+MAX_BYTES = int(os.getenv('TRANSCRIPT_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+
+TRANSCRIPT_FILE = 'transcript.txt'
+LANGUAGE_FILE = 'language.txt'
+
+# Minimum number of seconds between automatic eviction sweeps
+EVICT_INTERVAL = 60
+
+_lock = threading.Lock()
+_last_evict = 0
+
+def _entry_dir(platform, video_id):
+    """
+    Get the directory holding the cached files for a video.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video_id (str): Platform video ID
+
+    Returns:
+        Path: Path to the entry's directory
+    """
+    safe_id = ''.join(c for c in str(video_id) if c.isalnum() or c in '-_')
+    return CACHE_DIR / platform.lower() / safe_id
+
+def _is_fresh(path):
+    return path.exists() and time.time() - path.stat().st_mtime < TTL_SECONDS
+
+def _touch(entry_dir):
+    # The entry directory's mtime doubles as its last-access time for LRU eviction
+    try:
+        os.utime(entry_dir)
+    except OSError:
+        pass
+
+def _get_text(platform, video_id, filename, kind):
+    if not platform or not video_id:
+        return None
+
+    entry_dir = _entry_dir(platform, video_id)
+    path = entry_dir / filename
+    try:
+        if not _is_fresh(path):
+            return None
+        text = path.read_text(encoding='utf-8')
+    except OSError as e:
+        logger.warning(f"Error reading cached {kind}: {str(e)}")
+        return None
+
+    _touch(entry_dir)
+    logger.info(f"{kind.capitalize()} cache hit for {platform} video {video_id}")
+    return text
+
+def _put_text(platform, video_id, filename, kind, text):
+    if not platform or not video_id or text is None:
+        return
+
+    entry_dir = _entry_dir(platform, video_id)
+    try:
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = entry_dir / f'{filename}.tmp'
+        tmp_path.write_text(text, encoding='utf-8')
+        tmp_path.replace(entry_dir / filename)
+    except OSError as e:
+        logger.warning(f"Error caching {kind}: {str(e)}")
+        return
+
+    _maybe_evict()
+
+def get_transcript(platform, video_id):
+    """
+    Look up a cached transcript.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video_id (str): Platform video ID
+
+    Returns:
+        str: Cached transcript or None if missing or expired
+    """
+    return _get_text(platform, video_id, TRANSCRIPT_FILE, 'transcript')
+
+def put_transcript(platform, video_id, transcript):
+    """
+    Store a full transcript in the cache.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video_id (str): Platform video ID
+        transcript (str): Transcript text
+    """
+    _put_text(platform, video_id, TRANSCRIPT_FILE, 'transcript', transcript)
+
+def get_language(platform, video_id):
+    """
+    Look up a cached language verdict.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video_id (str): Platform video ID
+
+    Returns:
+        str: Cached verdict such as 'non-en', or None if missing or expired
+    """
+    return _get_text(platform, video_id, LANGUAGE_FILE, 'language')
+
+def put_language(platform, video_id, language):
+    """
+    Store a language verdict in the cache.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video_id (str): Platform video ID
+        language (str): Verdict, e.g. 'non-en' for a video whose opening
+            isn't English
+    """
+    _put_text(platform, video_id, LANGUAGE_FILE, 'language', language)
+
+def get_audio(platform, video_id, dest_path):
+    """
+    Copy cached audio for a video to dest_path.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video_id (str): Platform video ID
+        dest_path (Path): Where the audio file should end up
+
+    Returns:
+        str: dest_path if the audio was cached, None otherwise
+    """
+    if not platform or not video_id:
+        return None
+
+    entry_dir = _entry_dir(platform, video_id)
+    cached_path = entry_dir / Path(dest_path).name
+    try:
+        if not _is_fresh(cached_path):
+            return None
+        shutil.copyfile(cached_path, dest_path)
+    except OSError as e:
+        logger.warning(f"Error reading cached audio: {str(e)}")
+        return None
+
+    _touch(entry_dir)
+    logger.info(f"Audio cache hit for {platform} video {video_id}")
+    return str(dest_path)
+
+def put_audio(platform, video_id, audio_path):
+    """
+    Store a copy of a downloaded audio file in the cache.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video_id (str): Platform video ID
+        audio_path (str): Path to the downloaded audio file
+    """
+    if not platform or not video_id or not audio_path or not Path(audio_path).exists():
+        return
+
+    entry_dir = _entry_dir(platform, video_id)
+    try:
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = entry_dir / f'{Path(audio_path).name}.tmp'
+        shutil.copyfile(audio_path, tmp_path)
+        tmp_path.replace(entry_dir / Path(audio_path).name)
+    except OSError as e:
+        logger.warning(f"Error caching audio: {str(e)}")
+        return
+
+    _maybe_evict()
+
+def _maybe_evict():
+    global _last_evict
+    if time.time() - _last_evict >= EVICT_INTERVAL:
+        _last_evict = time.time()
+        evict()
+
+def evict():
+    """
+    Remove expired entries, then the least recently used ones until the
+    cache fits in MAX_BYTES.
+
+    Returns:
+        int: Number of entries removed
+    """
+    if not CACHE_DIR.exists():
+        return 0
+
+    with _lock:
+        now = time.time()
+        entries = []
+        removed = 0
+
+        for entry_dir in CACHE_DIR.glob('*/*'):
+            if not entry_dir.is_dir():
+                continue
+            try:
+                files = [f for f in entry_dir.iterdir() if f.is_file()]
+                newest = max((f.stat().st_mtime for f in files), default=0)
+                if now - newest >= TTL_SECONDS:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    removed += 1
+                    continue
+                size = sum(f.stat().st_size for f in files)
+                entries.append((entry_dir.stat().st_mtime, size, entry_dir))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries, key=lambda entry: entry[0]):
+            if total <= MAX_BYTES:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} transcript cache entries")
+        return removed
@@ -0,0 +1,173 @@
+"""
+Cheap local condensation of transcripts before they are put into LLM prompts.
+
+Long reviews are cut down to the sentences most likely to matter for a
+written review: ones mentioning the product, pros/cons language and
+concrete details. Selected sentences keep their original order.
+"""
+
+import os
+import re
+import logging
+import threading
+from utils import estimate_tokens
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOKEN_BUDGET = int(os.getenv('TRANSCRIPT_TOKEN_BUDGET', '1500'))
+
+# Unpunctuated transcripts are split into pseudo-sentences of this many words
+MAX_SENTENCE_WORDS = 40
+
+CUE_WORDS = {
+    'pro', 'pros', 'con', 'cons', 'but', 'however', 'although', 'downside', 'upside',
+    'love', 'hate', 'like', 'dislike', 'worth', 'recommend', 'disappoint', 'impressed',
+    'problem', 'issue', 'broke', 'quality', 'price', 'cheap', 'expensive', 'value',
+    'battery', 'noise', 'loud', 'easy', 'hard', 'difficult', 'best', 'worst',
+    'better', 'worse', 'compared', 'versus', 'verdict', 'overall', 'honestly',
+}
+
+FILLER_PHRASES = (
+    'subscribe', 'like and', 'link in', 'in the description', 'sponsor', 'patreon',
+    'follow me', 'comment below', 'smash that', 'hit the bell', 'discount code',
+)
+
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'for', 'to', 'in', 'on', 'with', 'is', 'it',
+    'this', 'that', 'review', 'reviews',
+}
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+_metrics = {'transcripts': 0, 'condensed': 0, 'tokens_in': 0, 'tokens_out': 0}
+_metrics_lock = threading.Lock()
+
+def _stem(word):
+    # Crude plural folding so "blenders" matches "blender"
+    return word[:-1] if len(word) > 3 and word.endswith('s') else word
+
+def _terms(text):
+    return {_stem(word) for word in _WORD_RE.findall(text.lower()) if word not in STOPWORDS}
+
+def split_sentences(text):
+    """
+    Split a transcript into sentences.
+
+    Args:
+        text (str): Transcript text
+
+    Returns:
+        list: Sentences, with overly long runs broken into word chunks
+    """
+    sentences = []
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        words = sentence.split()
+        for i in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(' '.join(words[i:i + MAX_SENTENCE_WORDS]))
+    return sentences
+
+def score_sentence(sentence, query_terms):
+    """
+    Score how useful a sentence is for writing a review.
+
+    Args:
+        sentence (str): Sentence text
+        query_terms (set): Normalized query terms
+
+    Returns:
+        float: Relevance score (higher is better)
+    """
+    lower = sentence.lower()
+    words = [_stem(word) for word in _WORD_RE.findall(lower)]
+    if not words:
+        return 0.0
+
+    query_hits = sum(1 for word in words if word in query_terms)
+    cue_hits = sum(1 for word in words if word in CUE_WORDS)
+    score = 3.0 * query_hits / len(words) ** 0.5 + 1.0 * cue_hits
+    if any(char.isdigit() for char in lower):
+        # Specs, prices and durations are concrete details worth keeping
+        score += 0.5
+    if any(phrase in lower for phrase in FILLER_PHRASES):
+        score -= 3.0
+    return score
+
+def condense_transcript(transcript, query, token_budget=None):
+    """
+    Cap a transcript at a token budget, keeping its most relevant sentences.
+
+    Args:
+        transcript (str): Transcript text
+        query (str): Product query (or video title) used to judge relevance
+        token_budget (int): Maximum estimated tokens (default: TOKEN_BUDGET)
+
+    Returns:
+        str: The condensed transcript, or the original if it already fits
+    """
+    token_budget = token_budget or TOKEN_BUDGET
+    transcript = transcript or ''
+    tokens_in = estimate_tokens(transcript)
+
+    if tokens_in <= token_budget:
+        _record(tokens_in, tokens_in, condensed=False)
+        return transcript
+
+    query_terms = _terms(query or '')
+    sentences = split_sentences(transcript)
+    scores = [score_sentence(sentence, query_terms) for sentence in sentences]
+
+    # Sentences next to a product mention usually carry the verdict about it
+    for i, sentence in enumerate(sentences):
+        if query_terms & _terms(sentence):
+            for j in (i - 1, i + 1):
+                if 0 <= j < len(sentences):
+                    scores[j] += 0.5
+
+    selected = []
+    seen = []
+    used = 0
+    for i in sorted(range(len(sentences)), key=lambda i: (-scores[i], i)):
+        sentence = sentences[i]
+        tokens = estimate_tokens(sentence) + 1
+        if scores[i] < 0 or used + tokens > token_budget:
+            continue
+
+        # Skip repeats and near-duplicates of sentences already kept
+        words = _terms(sentence)
+        if any(words and len(words & other) / len(words | other) > 0.8 for other in seen):
+            continue
+
+        seen.append(words)
+        selected.append(i)
+        used += tokens
+
+    condensed = ' '.join(sentences[i] for i in sorted(selected))
+    tokens_out = estimate_tokens(condensed)
+    _record(tokens_in, tokens_out, condensed=True)
+    logger.info(
+        f'Condensed transcript from ~{tokens_in} to ~{tokens_out} tokens '
+        f'({len(selected)}/{len(sentences)} sentences kept)'
+    )
+    return condensed
+
+def _record(tokens_in, tokens_out, condensed):
+    with _metrics_lock:
+        _metrics['transcripts'] += 1
+        _metrics['condensed'] += int(condensed)
+        _metrics['tokens_in'] += tokens_in
+        _metrics['tokens_out'] += tokens_out
+
+def get_metrics():
+    """
+    Get cumulative condensation metrics for this process.
+
+    Returns:
+        dict: transcripts, condensed, tokens_in, tokens_out and tokens_saved
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics['tokens_saved'] = metrics['tokens_in'] - metrics['tokens_out']
+    return metrics
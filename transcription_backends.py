@@ -0,0 +1,246 @@
+"""
+Interchangeable speech-to-text backends and the rules for choosing one.
+
+Two backends are available: OpenAI's Whisper API, and a local CPU engine
+built on faster-whisper (CTranslate2, int8) that keeps its model loaded
+for the life of the process. select_backends() routes each clip by its
+duration, short clips to the local engine and long videos to the API,
+unless its platform is set to always use the local engine. The other
+backend is used as a fallback when the first one fails or is unavailable.
+"""
+
+import os
+import re
+import shutil
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from clients import get_openai_client
+from audio_utils import split_audio, probe_duration
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 'auto' applies the routing rules below; 'api' or 'local' forces one backend first
+TRANSCRIBE_BACKEND = os.getenv('TRANSCRIBE_BACKEND', 'auto').lower()
+# Clips no longer than LOCAL_MAX_SECONDS go to the local engine; platforms listed here always do
+LOCAL_PLATFORMS = {p.strip() for p in os.getenv('LOCAL_TRANSCRIBE_PLATFORMS', '').split(',') if p.strip()}
+LOCAL_MAX_SECONDS = float(os.getenv('LOCAL_TRANSCRIBE_MAX_SECONDS', '180'))
+
+LOCAL_WHISPER_MODEL = os.getenv('LOCAL_WHISPER_MODEL', 'small')
+LOCAL_WHISPER_WORKERS = int(os.getenv('LOCAL_WHISPER_WORKERS', '2'))
+LOCAL_WHISPER_THREADS = int(os.getenv('LOCAL_WHISPER_THREADS', '4'))
+
+# Split long audio into segments and transcribe them concurrently
+CHUNKED_TRANSCRIPTION = os.getenv('CHUNKED_TRANSCRIPTION', 'true').lower() in ('1', 'true', 'yes')
+SEGMENT_WORKERS = int(os.getenv('TRANSCRIBE_SEGMENT_WORKERS', '6'))
+# Longest run of words checked when removing text repeated across an overlap
+MAX_OVERLAP_WORDS = 30
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+def _normalize_word(word):
+    match = _WORD_RE.search(word.lower())
+    return match.group(0) if match else ''
+
+def stitch_transcripts(parts):
+    """
+    Join segment transcripts, dropping words repeated across overlapping cuts.
+
+    Args:
+        parts (list): (text, overlapped) tuples in playback order, where
+            overlapped means the segment repeats the end of the previous one
+
+    Returns:
+        str: The combined transcript
+    """
+    words = []
+    for text, overlapped in parts:
+        new_words = (text or '').split()
+        if overlapped and words:
+            tail = [_normalize_word(word) for word in words[-MAX_OVERLAP_WORDS:]]
+            head = [_normalize_word(word) for word in new_words[:MAX_OVERLAP_WORDS]]
+            # Longest run that ends the previous segment and starts this one
+            for size in range(min(len(tail), len(head)), 0, -1):
+                if tail[-size:] == head[:size]:
+                    new_words = new_words[size:]
+                    break
+        words.extend(new_words)
+    return ' '.join(words)
+
+class WhisperAPIBackend:
+    """
+    OpenAI's hosted whisper-1 model, with long audio split into segments
+    that are transcribed concurrently.
+    """
+
+    name = 'api'
+
+    def __init__(self):
+        # Shared by all transcriptions so a few long videos can't open unbounded API requests
+        self._segment_pool = ThreadPoolExecutor(max_workers=SEGMENT_WORKERS, thread_name_prefix='whisper-segment')
+
+    def is_available(self):
+        return get_openai_client() is not None
+
+    def _transcribe_file(self, path):
+        with open(path, "rb") as audio_file:
+            response = get_openai_client().audio.transcriptions.create(
+                model="whisper-1",
+                file=audio_file,
+                response_format="text"
+            )
+        return str(response).strip() if response else ''
+
+    def transcribe(self, audio_path):
+        """
+        Transcribe a file, splitting long audio unless CHUNKED_TRANSCRIPTION is off.
+
+        Args:
+            audio_path (str): Path to the normalized audio file
+
+        Returns:
+            str: Transcript text
+        """
+        if not CHUNKED_TRANSCRIPTION:
+            return self._transcribe_file(audio_path)
+
+        segment_dir = Path(audio_path).parent / 'segments'
+        try:
+            segments = split_audio(audio_path, segment_dir)
+            if len(segments) == 1:
+                return self._transcribe_file(segments[0]['path'])
+
+            texts = self._segment_pool.map(lambda segment: self._transcribe_file(segment['path']), segments)
+            return stitch_transcripts(
+                [(text, segment['overlapped']) for text, segment in zip(texts, segments)]
+            )
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+
+class LocalWhisperBackend:
+    """
+    faster-whisper on the CPU with int8 weights. The model is loaded once
+    per process and shared by up to LOCAL_WHISPER_WORKERS concurrent
+    transcriptions.
+    """
+
+    name = 'local'
+
+    def __init__(self):
+        self._model = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(LOCAL_WHISPER_WORKERS)
+
+    def is_available(self):
+        return WhisperModel is not None
+
+    def warm_up(self):
+        """
+        Load the model if it isn't loaded yet.
+
+        Returns:
+            WhisperModel: The process-wide model
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    logger.info(f"Loading local Whisper model '{LOCAL_WHISPER_MODEL}' (int8, CPU)")
+                    self._model = WhisperModel(
+                        LOCAL_WHISPER_MODEL,
+                        device='cpu',
+                        compute_type='int8',
+                        cpu_threads=LOCAL_WHISPER_THREADS,
+                        num_workers=LOCAL_WHISPER_WORKERS
+                    )
+        return self._model
+
+    def transcribe(self, audio_path):
+        """
+        Transcribe a file with the local model.
+
+        Args:
+            audio_path (str): Path to the audio file
+
+        Returns:
+            str: Transcript text
+        """
+        model = self.warm_up()
+        with self._slots:
+            segments, _ = model.transcribe(str(audio_path), beam_size=1, vad_filter=True)
+            # Segments are decoded lazily, so consume them while holding the slot
+            return ' '.join(segment.text.strip() for segment in segments).strip()
+
+BACKENDS = {
+    'api': WhisperAPIBackend(),
+    'local': LocalWhisperBackend(),
+}
+
+def select_backends(audio_path, platform=None):
+    """
+    Order the available backends for a clip, preferred backend first.
+
+    Args:
+        audio_path (str): Path to the audio file
+        platform (str): 'youtube' or 'tiktok' (optional)
+
+    Returns:
+        list: Available backends to try in order (may be empty)
+    """
+    if TRANSCRIBE_BACKEND in BACKENDS:
+        preferred = TRANSCRIBE_BACKEND
+    elif platform in LOCAL_PLATFORMS:
+        preferred = 'local'
+    else:
+        duration = probe_duration(audio_path)
+        preferred = 'local' if duration is not None and duration <= LOCAL_MAX_SECONDS else 'api'
+
+    order = [preferred] + [name for name in BACKENDS if name != preferred]
+    return [BACKENDS[name] for name in order if BACKENDS[name].is_available()]
+
+def transcribe(audio_path, platform=None):
+    """
+    Transcribe a clip with the routed backend, falling back to the others.
+
+    Args:
+        audio_path (str): Path to the audio file
+        platform (str): 'youtube' or 'tiktok' (optional)
+
+    Returns:
+        str: Transcript text
+
+    Raises:
+        RuntimeError: If no backend is available or every backend failed
+    """
+    backends = select_backends(audio_path, platform)
+    if not backends:
+        raise RuntimeError("No transcription backend available (set OPENAI_API_KEY or install faster-whisper)")
+
+    for i, backend in enumerate(backends):
+        try:
+            logger.info(f"Transcribing {audio_path} with the {backend.name} backend")
+            return backend.transcribe(audio_path)
+        except Exception as e:
+            if i == len(backends) - 1:
+                raise
+            logger.warning(f"{backend.name} transcription failed, falling back: {str(e)}")
+
+def warm_up():
+    """
+    Preload the local model in a long-lived process so the first clip
+    doesn't pay the load time. Does nothing if the local engine can't be
+    used under the current settings.
+    """
+    local = BACKENDS['local']
+    if local.is_available() and TRANSCRIBE_BACKEND in ('auto', 'local'):
+        try:
+            local.warm_up()
+        except Exception as e:
+            logger.warning(f"Error loading local Whisper model: {str(e)}")
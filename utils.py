@@ -1,3 +1,6 @@
+import time
+import threading
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 
@@ -20,3 +23,93 @@ def get_query_dir(query):
     query_dir = DOWNLOADS_DIR / f"{clean_query}-{timestamp}"
     query_dir.mkdir(parents=True, exist_ok=True)
     return query_dir
+
+def estimate_tokens(text):
+    """
+    Cheaply estimate the number of LLM tokens in a piece of text.
+    
+    Uses the ~4 characters per token rule of thumb for English text, which
+    is close enough for budgeting and rate limiting without a tokenizer.
+    
+    Args:
+        text (str): Text to measure
+        
+    Returns:
+        int: Estimated token count
+    """
+    return (len(text or '') + 3) // 4
+
+class RateLimiter:
+    """
+    Client-side limiter for requests-per-minute and tokens-per-minute quotas.
+    
+    Calls to acquire() block until the request fits in the trailing
+    60-second window.
+    """
+    
+    WINDOW = 60.0
+    
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._events = deque()
+        self._tokens = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens=0):
+        """
+        Wait for capacity and record a request.
+        
+        Args:
+            tokens (int): Estimated tokens the request will consume
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= self.WINDOW:
+                    self._tokens -= self._events.popleft()[1]
+                
+                fits_requests = len(self._events) < self.requests_per_minute
+                # A request bigger than the whole budget is let through on an empty window
+                fits_tokens = (
+                    not self.tokens_per_minute
+                    or not self._events
+                    or self._tokens + tokens <= self.tokens_per_minute
+                )
+                if fits_requests and fits_tokens:
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                
+                wait = self._events[0][0] + self.WINDOW - now
+            time.sleep(max(wait, 0.05))
+
+class Deadline:
+    """
+    A point in time by which some work should be finished.
+    
+    Deadlines nest: a stage's deadline is its own budget capped by the
+    deadline of the request it belongs to.
+    """
+    
+    def __init__(self, seconds=None, parent=None):
+        expires_at = time.monotonic() + seconds if seconds else None
+        if parent is not None and parent.expires_at is not None:
+            expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+    
+    def remaining(self):
+        """
+        Returns:
+            float: Seconds left (never negative), or None if there is no limit
+        """
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+    
+    def expired(self):
+        """
+        Returns:
+            bool: True once the deadline has passed
+        """
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
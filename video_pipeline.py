@@ -0,0 +1,279 @@
+"""
+Concurrent download -> transcribe -> persist stage for search results.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from youtube_search import (
+    download_audio as download_youtube_audio, get_video_dir as get_youtube_video_dir,
+    get_transcript as get_youtube_captions
+)
+from tiktok_search import download_audio as download_tiktok_audio, get_video_dir as get_tiktok_video_dir
+from transcribing_utils import transcribe_audio, is_english_text, is_english_language, save_video_data
+import transcript_cache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Concurrency limits (overridable from the environment)
+MAX_WORKERS = int(os.getenv('PIPELINE_MAX_WORKERS', '8'))
+DOWNLOAD_CONCURRENCY = int(os.getenv('DOWNLOAD_CONCURRENCY', '3'))
+TRANSCRIBE_CONCURRENCY = int(os.getenv('TRANSCRIBE_CONCURRENCY', '4'))
+
+# Slots are shared by every search in the process so concurrent requests
+# can't oversubscribe yt-dlp/ffmpeg or the Whisper API between them
+_download_slots = threading.BoundedSemaphore(DOWNLOAD_CONCURRENCY)
+_transcribe_slots = threading.BoundedSemaphore(TRANSCRIBE_CONCURRENCY)
+
+def build_youtube_video_info(video):
+    """
+    Build the video_data.json payload for a YouTube search result.
+
+    Args:
+        video (dict): Video information from youtube_search.search_videos
+
+    Returns:
+        dict: Video information to persist
+    """
+    return {
+        'video_id': video['video_id'],
+        'title': video['title'],
+        'description': video.get('description', ''),
+        'channel': video['channel'],
+        'publishedAt': video.get('published_at', ''),
+        'platform': 'youtube',
+        'statistics': {
+            'viewCount': str(video.get('view_count', 0)),
+            'likeCount': str(video.get('like_count', 0)),
+            'commentCount': str(video.get('comment_count', 0))
+        },
+        'video_url': video.get('video_url', ''),
+    }
+
+def build_tiktok_video_info(video):
+    """
+    Build the video_data.json payload for a TikTok search result.
+
+    Args:
+        video (dict): Video information from tiktok_search.search_videos
+
+    Returns:
+        dict: Video information to persist
+    """
+    return {
+        'video_id': video['video_id'],
+        'title': video['title'],
+        'channel': video['channel'],
+        'platform': 'tiktok',
+        'description': video.get('caption', ''),
+        'statistics': {
+            'viewCount': str(video.get('view_count', 0))
+        },
+        'video_url': video.get('video_url', ''),
+    }
+
+PLATFORMS = {
+    'youtube': {
+        'name': 'YouTube',
+        'get_captions': get_youtube_captions,
+        'download_audio': download_youtube_audio,
+        'get_video_dir': get_youtube_video_dir,
+        'build_video_info': build_youtube_video_info,
+    },
+    'tiktok': {
+        'name': 'TikTok',
+        'get_captions': None,
+        'download_audio': download_tiktok_audio,
+        'get_video_dir': get_tiktok_video_dir,
+        'build_video_info': build_tiktok_video_info,
+    },
+}
+
+def process_video(platform, video, query_dir):
+    """
+    Transcribe and save a single video, preferring existing captions.
+
+    The transcript is stored back on the video dict under 'transcript'; a
+    video that already carries one is persisted without being downloaded
+    or transcribed again. Failures are logged and reported as None so one
+    bad video never takes down the rest of the batch.
+
+    Args:
+        platform (str): 'youtube' or 'tiktok'
+        video (dict): Video information from the platform's search_videos
+        query_dir (Path): Directory for the search query results
+
+    Returns:
+        dict: Transcribed video summary, including the video_dir its
+            video_data.json was saved in, or None if any step failed
+    """
+    config = PLATFORMS[platform]
+    try:
+        logger.info(f'Processing {config["name"]} video: {video["title"]} (ID: {video["video_id"]})')
+        transcript = video.get('transcript')
+
+        if not transcript and is_english_language(video.get('language')) is False:
+            # Metadata already says it's not English: skip before any download
+            logger.info(f'Video language is {video["language"]}, skipping video')
+            return None
+
+        if not transcript:
+            # A transcript cached by an earlier query makes the download unnecessary
+            cached = transcript_cache.get_transcript(platform, video['video_id'])
+            if cached is not None:
+                if not is_english_text(cached):
+                    logger.info('Cached transcript is not in English, skipping video')
+                    return None
+                transcript = cached
+                video['transcript'] = transcript
+
+        if not transcript and config['get_captions']:
+            # Existing captions are far cheaper than downloading and transcribing
+            captions = config['get_captions'](video['video_id'], video['title'], query_dir)
+            if captions['available']:
+                logger.info('Using the video\'s own captions')
+                transcript = captions['transcript']
+                video['transcript'] = transcript
+            else:
+                logger.info(f'No usable captions ({captions["error"]}), falling back to Whisper')
+
+        if transcript:
+            # Handoff from an earlier stage: never pay for a second Whisper call
+            logger.info('Video already transcribed, skipping download and transcription')
+        else:
+            # Download audio and transcribe with Whisper
+            with _download_slots:
+                audio_path = config['download_audio'](video['video_url'], video['video_id'], video['title'], query_dir)
+            logger.info(f'Audio download result: {"Success" if audio_path else "Failed"}')
+
+            if not audio_path:
+                return None
+
+            logger.info(f'Audio downloaded successfully: {audio_path}')
+            with _transcribe_slots:
+                whisper_result = transcribe_audio(
+                    audio_path, platform=platform, video_id=video['video_id'], language_hint=video.get('language')
+                )
+
+            if not whisper_result['available']:
+                logger.warning(f'Whisper transcription failed: {whisper_result["error"]}')
+                return None
+
+            logger.info('Whisper transcription successful')
+            transcript = whisper_result['transcript']
+            video['transcript'] = transcript
+
+        # Save video data
+        video_dir = config['get_video_dir'](video['video_id'], video['title'], query_dir)
+        save_video_data(
+            video_dir=video_dir,
+            video_info=config['build_video_info'](video),
+            transcript=transcript
+        )
+
+        return {
+            'title': video['title'],
+            'url': video['video_url'],
+            'transcript': transcript,
+            'platform': platform,
+            'channel': video['channel'],
+            'video_dir': str(video_dir)
+        }
+    except Exception as e:
+        logger.error(f'Error processing {config["name"]} video: {str(e)}')
+        return None
+
+def process_videos(videos, query_dir, max_workers=None):
+    """
+    Run the download -> transcribe -> persist stage for many videos concurrently.
+
+    Args:
+        videos (list): List of (platform, video) tuples
+        query_dir (Path): Directory for the search query results
+        max_workers (int): Thread pool size (default: MAX_WORKERS)
+
+    Returns:
+        list: Transcribed video summaries for the videos that succeeded,
+            in the same order as the input
+    """
+    if not videos:
+        return []
+
+    workers = min(max_workers or MAX_WORKERS, len(videos))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='video') as executor:
+        results = list(executor.map(
+            lambda item: process_video(item[0], item[1], query_dir),
+            videos
+        ))
+
+    return [result for result in results if result]
+
+def process_ranked_videos(candidates, query_dir, targets, max_workers=None, deadline=None):
+    """
+    Process ranked candidates until each platform has enough transcripts.
+
+    Candidates are started best first, and only as many are in flight per
+    platform as are still needed, so failures are replaced by the next
+    candidate and nothing is downloaded once a platform reaches its target.
+
+    Args:
+        candidates (list): (platform, video) tuples, best first
+        query_dir (Path): Directory for the search query results
+        targets (dict): Transcripts wanted per platform
+        max_workers (int): Thread pool size (default: MAX_WORKERS)
+        deadline (Deadline): Return what has finished when it passes (optional)
+
+    Returns:
+        list: Transcribed video summaries for the videos that succeeded,
+            in candidate order
+    """
+    pending = {platform: [] for platform in targets}
+    for index, (platform, video) in enumerate(candidates):
+        if platform in pending:
+            pending[platform].append((index, video))
+
+    succeeded = {platform: 0 for platform in targets}
+    in_flight = {platform: 0 for platform in targets}
+    results = {}
+    futures = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS, thread_name_prefix='video')
+
+    def fill():
+        for platform, queue in pending.items():
+            while queue and succeeded[platform] + in_flight[platform] < targets[platform]:
+                index, video = queue.pop(0)
+                future = executor.submit(process_video, platform, video, query_dir)
+                futures[future] = (platform, index)
+                in_flight[platform] += 1
+
+    try:
+        fill()
+        while futures:
+            done, _ = wait(futures, timeout=deadline.remaining() if deadline else None, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.warning(f'Video processing deadline reached with {len(futures)} videos still in flight')
+                break
+            for future in done:
+                platform, index = futures.pop(future)
+                in_flight[platform] -= 1
+                result = future.result()
+                if result:
+                    succeeded[platform] += 1
+                    results[index] = result
+            fill()
+    finally:
+        # Videos still running finish in the background and land in the
+        # transcript cache; they aren't in the results, so review generation,
+        # which only reads the returned video_dirs, never sees them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for platform, target in targets.items():
+        logger.info(
+            f'{PLATFORMS[platform]["name"]}: {succeeded[platform]}/{target} transcripts, '
+            f'{len(pending[platform])} candidates left untouched'
+        )
+    return [results[index] for index in sorted(results)]
@@ -1,29 +1,20 @@
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
 from dotenv import load_dotenv
 import os
+import re
 import logging
 import yt_dlp
 from pathlib import Path
 import html
-import pickle
 from transcribing_utils import transcribe_audio, is_english_text, save_video_data
+import transcript_cache
+from clients import get_youtube_client, get_http_session
+from audio_utils import download_normalized, AUDIO_FILENAME, MAX_DOWNLOAD_BYTES
 from datetime import datetime
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# OAuth2 configuration
-SCOPES = [
-    'https://www.googleapis.com/auth/youtube.force-ssl',
-    'https://www.googleapis.com/auth/youtube.readonly'
-]
-TOKEN_FILE = 'token.pickle'
-CREDENTIALS_FILE = 'youtube_client_secrets.json'
-
 # Create downloads directory if it doesn't exist
 from utils import get_query_dir, DOWNLOADS_DIR
 DOWNLOADS_DIR.mkdir(exist_ok=True)
@@ -91,8 +82,8 @@ def search_videos(query, max_results=2, query_dir=None):
         logger.info(f"Trying API key: {current_key[-10:]}")
         
         try:
-            # Create YouTube API client with cache disabled
-            youtube = build('youtube', 'v3', developerKey=current_key, cache_discovery=False, static_discovery=False)
+            # Reuse the pooled YouTube API client for this key
+            youtube = get_youtube_client(current_key)
 
             review_query = f"{query} review"
             
@@ -116,7 +107,7 @@ def search_videos(query, max_results=2, query_dir=None):
             video_response = youtube.videos().list(
                 part='snippet,statistics,contentDetails',
                 id=','.join(video_ids),
-                fields='items(id,snippet(title,description,channelTitle,publishedAt,thumbnails/high/url),statistics,contentDetails/duration)'
+                fields='items(id,snippet(title,description,channelTitle,publishedAt,thumbnails/high/url,defaultAudioLanguage,defaultLanguage),statistics,contentDetails/duration)'
             ).execute()
             logger.info(f'Retrieved details for {len(video_response.get("items", []))} videos')
             
@@ -138,6 +129,7 @@ def search_videos(query, max_results=2, query_dir=None):
                     'like_count': int(stats.get('likeCount', 0)),
                     'comment_count': int(stats.get('commentCount', 0)),
                     'duration': duration,
+                    'language': snippet.get('defaultAudioLanguage') or snippet.get('defaultLanguage', ''),
                 }
 
                 logger.info(f'Processed video info:')
@@ -204,22 +196,23 @@ def download_audio(video_url, video_id, title, query_dir):
         query_dir (Path): Directory for the search query results
         
     Returns:
-        str: Path to the downloaded audio file or None if file is too large
+        str: Path to the normalized audio file or None if file is too large
     """
     try:
         video_dir = get_video_dir(video_id, title, query_dir)
+        audio_path = video_dir / AUDIO_FILENAME
+        
+        # Reuse audio downloaded for an earlier query
+        cached_path = transcript_cache.get_audio('youtube', video_id, audio_path)
+        if cached_path:
+            return cached_path
         
         # Configure options for smaller file size and download time
         ydl_opts = {
-            # Try to get lower quality audio first
+            # Try to get lower quality audio first; it is streamed into ffmpeg when possible
             'format': 'worstaudio/bestaudio',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '32',  # Lowest quality MP3 for testing
-            }],
-            'outtmpl': str(video_dir / 'audio.%(ext)s'),
-            'max_filesize': 10000000, # 10MB limit to prevent huge downloads
+            'outtmpl': str(video_dir / 'source.%(ext)s'),
+            'max_filesize': MAX_DOWNLOAD_BYTES,  # Long videos are split for transcription, not skipped
             'quiet': True,
             'no_warnings': True,
             'nocheckcertificate': True,
@@ -235,60 +228,110 @@ def download_audio(video_url, video_id, title, query_dir):
                 'Sec-Fetch-Site': 'none',
                 'Sec-Fetch-Dest': 'document'
             },
-            'http_chunk_size': 10485760  # 10MB chunks
+            'http_chunk_size': 10485760,  # 10MB chunks
+            'buffersize': 1048576
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            logger.info(f"Downloading audio from: {video_url}")
-            info = ydl.extract_info(video_url, download=True)
-            audio_path = video_dir / 'audio.mp3'
-            logger.info(f"Audio downloaded to: {audio_path}")
-            return str(audio_path)
+        logger.info(f"Downloading audio from: {video_url}")
+        download_normalized(video_url, audio_path, ydl_opts)
+        logger.info(f"Audio downloaded to: {audio_path}")
+        transcript_cache.put_audio('youtube', video_id, audio_path)
+        return str(audio_path)
             
     except Exception as e:
         logger.error(f"Error downloading audio: {str(e)}")
         return None
 
-def get_authenticated_service():
+# Caption formats in order of preference; json3 carries no rolling duplicates
+CAPTION_FORMATS = ('json3', 'vtt')
+ENGLISH_CAPTION_LANGUAGES = ('en', 'en-US', 'en-GB', 'en-CA', 'en-AU')
+
+_VTT_TAG_RE = re.compile(r'<[^>]+>')
+
+def parse_json3_captions(data):
     """
-    Get an authenticated YouTube service instance using OAuth2.
+    Flatten a YouTube json3 caption track into plain text.
+    
+    Args:
+        data (dict): Parsed json3 caption document
+        
+    Returns:
+        str: Caption text
     """
-    creds = None
+    # Segments carry their own leading spaces; events are separate lines
+    lines = [''.join(seg.get('utf8', '') for seg in event.get('segs') or []) for event in data.get('events', [])]
+    return html.unescape(' '.join(' '.join(lines).split()))
+
+def parse_vtt_captions(text):
+    """
+    Flatten a WebVTT caption track into plain text.
     
-    # Load existing credentials from token.pickle if it exists
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'rb') as token:
-            creds = pickle.load(token)
+    Auto-generated tracks repeat each line as it scrolls, so consecutive
+    duplicate lines are dropped.
     
-    # If credentials don't exist or are invalid, get new ones
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            if not os.path.exists(CREDENTIALS_FILE):
-                raise FileNotFoundError(
-                    f"'{CREDENTIALS_FILE}' not found. Please download it from Google Cloud Console "
-                    "and save it in the project directory."
-                )
-            
-            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
-            creds = flow.run_local_server(port=0)
-            
-        # Save credentials for future use
-        with open(TOKEN_FILE, 'wb') as token:
-            pickle.dump(creds, token)
+    Args:
+        text (str): WebVTT document
+        
+    Returns:
+        str: Caption text
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        # Skip the header, cue settings, timestamps and cue numbers
+        if (not line or '-->' in line or line.isdigit()
+                or line.startswith(('WEBVTT', 'Kind:', 'Language:', 'NOTE'))):
+            continue
+        line = html.unescape(_VTT_TAG_RE.sub('', line)).strip()
+        if line and (not lines or lines[-1] != line):
+            lines.append(line)
+    return ' '.join(lines)
+
+def select_caption_track(info):
+    """
+    Pick the best English caption track from yt-dlp video info.
+    
+    Manual subtitles win over automatic captions. Automatic captions are
+    only used when they were generated from English speech, since YouTube
+    also offers machine translations of foreign-language videos.
     
-    return build('youtube', 'v3', credentials=creds)
+    Args:
+        info (dict): yt-dlp info dict (extracted without downloading)
+        
+    Returns:
+        dict: Track format entry with 'url' and 'ext', or None
+    """
+    subtitles = info.get('subtitles') or {}
+    automatic = info.get('automatic_captions') or {}
+    language = (info.get('language') or '').lower()
+
+    candidates = [subtitles.get(lang) for lang in ENGLISH_CAPTION_LANGUAGES]
+    if 'en-orig' in automatic or language.startswith('en'):
+        candidates += [automatic.get('en-orig'), automatic.get('en')]
+
+    for formats in candidates:
+        if not formats:
+            continue
+        for ext in CAPTION_FORMATS:
+            for track in formats:
+                if track.get('ext') == ext and track.get('url'):
+                    return track
+    return None
 
 def get_transcript(video_id, title, query_dir):
     """
-    Get the transcript of a YouTube video.
+    Get the transcript of a YouTube video from its existing captions.
+    
+    Uses yt-dlp to list the caption tracks without downloading any media,
+    so no OAuth credentials are needed.
     
     Args:
         video_id (str): YouTube video ID
+        title (str): Video title
+        query_dir (Path): Directory for the search query results
         
     Returns:
-        dict: Dictionary containing transcript info or None if not available
+        dict: Dictionary containing transcript info
             {
                 'available': bool,
                 'transcript': str or None,
@@ -304,63 +347,48 @@ def get_transcript(video_id, title, query_dir):
     }
     
     try:
-        youtube = get_authenticated_service()
+        ydl_opts = {
+            'skip_download': True,
+            'quiet': True,
+            'no_warnings': True,
+            'socket_timeout': 10,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=False)
+        
+        track = select_caption_track(info)
+        if not track:
+            result['error'] = "No English captions available"
+            return result
         
-        # Get caption tracks
-        captions_response = youtube.captions().list(
-            part='snippet',
-            videoId=video_id
-        ).execute()
+        response = get_http_session().get(track['url'], timeout=15)
+        response.raise_for_status()
+        if track['ext'] == 'json3':
+            transcript = parse_json3_captions(response.json())
+        else:
+            transcript = parse_vtt_captions(response.text)
         
-        if not captions_response.get('items'):
-            result['error'] = "No captions available"
+        if not transcript:
+            result['error'] = "Captions are empty"
             return result
-            
-        # Get the first available caption track (usually the automatic captions)
-        caption_id = captions_response['items'][0]['id']
         
-        try:
-            # Try to download the caption track
-            caption = youtube.captions().download(
-                id=caption_id,
-                tfmt='srt'
-            ).execute()
-            
-            # Parse and clean up the transcript
-            transcript = ""
-            for line in caption.decode('utf-8').split('\n'):
-                # Skip timestamp lines and empty lines
-                if not line.strip() or '-->' in line or line.strip().isdigit():
-                    continue
-                # Unescape HTML entities and add to transcript
-                transcript += html.unescape(line.strip()) + " "
-            
-            # Check if transcript is in English
-            if not is_english_text(transcript):
-                result.update({
-                    'available': False,
-                    'transcript': None,
-                    'transcript_path': None,
-                    'error': 'Transcript is not in English'
-                })
-            else:
-                # Save transcript to file
-                video_dir = get_video_dir(video_id, title, query_dir)
-                transcript_path = video_dir / 'transcript.txt'
-                transcript_path.write_text(transcript)
-                logger.info(f"Transcript saved to: {transcript_path}")
-                
-                result.update({
-                    'available': True,
-                    'transcript': transcript,
-                    'transcript_path': str(transcript_path)
-                })
-            
-        except Exception as e:
-            if 'insufficient' in str(e) or 'forbidden' in str(e):
-                result['error'] = "Transcript not publicly available"
-            else:
-                result['error'] = str(e)
+        # Guard against tracks mislabelled as English
+        if not is_english_text(transcript):
+            result['error'] = 'Transcript is not in English'
+            return result
+        
+        # Save transcript to file
+        video_dir = get_video_dir(video_id, title, query_dir)
+        transcript_path = video_dir / 'transcript.txt'
+        transcript_path.write_text(transcript, encoding='utf-8')
+        logger.info(f"Transcript saved to: {transcript_path}")
+        transcript_cache.put_transcript('youtube', video_id, transcript)
+        
+        result.update({
+            'available': True,
+            'transcript': transcript,
+            'transcript_path': str(transcript_path)
+        })
             
     except Exception as e:
         result['error'] = str(e)
@@ -387,56 +415,60 @@ def main():
             print(f"\nProcessing video: {video['title']}")
             video_id = video['video_id']
             
-            # # Try to get transcript first – skip for now to avoid high cost API queries
-            # print("Checking YouTube transcript availability...")
-            # transcript_result = get_transcript(video_id, video['title'], query_dir)
-            
-            # if transcript_result['available']:
-            #     print("YouTube transcript available! Downloading...")
-            #     print(f"Transcript saved to: {transcript_result['transcript_path']}")
-            #     print(f"Preview (first 200 chars):\n{transcript_result['transcript'][:200]}...")
-            # else:
-            #     print(f"YouTube transcript not available: {transcript_result['error']}")
-            print("Downloading audio for Whisper transcription...")
+            # Try the video's own captions first
+            print("Checking YouTube caption availability...")
+            transcript_result = get_transcript(video_id, video['title'], query_dir)
             
-            # Download audio and transcribe with Whisper
-            audio_path = download_audio(video['video_url'], video['video_id'], video['title'], query_dir)
-            if audio_path is None:
-                print("Skipping transcription: Audio file too large or unavailable")
-            elif audio_path:
-                print(f"Audio downloaded successfully to: {audio_path}")
-                print("Transcribing with Whisper...")
-                whisper_result = transcribe_audio(audio_path)
+            if transcript_result['available']:
+                print("YouTube captions available!")
+                print(f"Transcript saved to: {transcript_result['transcript_path']}")
+                print(f"Preview (first 200 chars):\n{transcript_result['transcript'][:200]}...")
+                transcript = transcript_result['transcript']
+            else:
+                print(f"YouTube captions not available: {transcript_result['error']}")
+                print("Downloading audio for Whisper transcription...")
+                transcript = None
                 
-                if whisper_result['available']:
-                    print("Whisper transcription successful!")
-                    print(f"Transcript saved to: {whisper_result['transcript_path']}")
-                    print(f"Preview (first 200 chars):\n{whisper_result['transcript'][:200]}...")
+                # Download audio and transcribe with Whisper
+                audio_path = download_audio(video['video_url'], video['video_id'], video['title'], query_dir)
+                if audio_path is None:
+                    print("Skipping transcription: Audio file too large or unavailable")
+                else:
+                    print(f"Audio downloaded successfully to: {audio_path}")
+                    print("Transcribing with Whisper...")
+                    whisper_result = transcribe_audio(
+                        audio_path, platform='youtube', video_id=video_id, language_hint=video.get('language')
+                    )
                     
-                    # Save all video data to JSON
-                    video_dir = get_video_dir(video['video_id'], video['title'], query_dir)
-                    save_video_data(
-                        video_dir=video_dir,
-                        video_info={
-                            'title': video['title'],
-                            'description': video.get('description', ''),
-                            'channel': video['channel'],
-                            'publishedAt': video.get('published_at', ''),
-                            'platform': 'YouTube',
-                            'statistics': {
-                                'viewCount': str(video.get('view_count', 0)),
-                                'likeCount': str(video.get('like_count', 0)),
-                                'commentCount': str(video.get('comment_count', 0))
-                            },
-                            'video_url': video.get('video_url', ''),
+                    if whisper_result['available']:
+                        print("Whisper transcription successful!")
+                        print(f"Transcript saved to: {whisper_result['transcript_path']}")
+                        print(f"Preview (first 200 chars):\n{whisper_result['transcript'][:200]}...")
+                        transcript = whisper_result['transcript']
+                    else:
+                        print(f"Whisper transcription failed: {whisper_result['error']}")
+            
+            if transcript:
+                # Save all video data to JSON
+                video_dir = get_video_dir(video['video_id'], video['title'], query_dir)
+                save_video_data(
+                    video_dir=video_dir,
+                    video_info={
+                        'title': video['title'],
+                        'description': video.get('description', ''),
+                        'channel': video['channel'],
+                        'publishedAt': video.get('published_at', ''),
+                        'platform': 'YouTube',
+                        'statistics': {
+                            'viewCount': str(video.get('view_count', 0)),
+                            'likeCount': str(video.get('like_count', 0)),
+                            'commentCount': str(video.get('comment_count', 0))
                         },
-                        transcript=whisper_result['transcript']
-                    )
-                    print(f"Video data saved to: {video_dir / 'video_data.json'}")
-                else:
-                    print(f"Whisper transcription failed: {whisper_result['error']}")
-            else:
-                print("Failed to download audio")
+                        'video_url': video.get('video_url', ''),
+                    },
+                    transcript=transcript
+                )
+                print(f"Video data saved to: {video_dir / 'video_data.json'}")
             
             print("---")
     